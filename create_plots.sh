@@ -35,34 +35,26 @@ fi
 
 mkdir -p -v "figures"
 
-if test "$what_to_plot" == "all" || test "$what_to_plot" == "osu"; then
-    python pytools/plot_osu.py $enable_latex --dirname osu/ --plot-type bandwidth-put --output-dir figures
-    python pytools/plot_osu.py $enable_latex --dirname osu/ --plot-type bandwidth-get --output-dir figures
-    python pytools/plot_osu.py $enable_latex --dirname osu/ --plot-type latency-put --output-dir figures
-    python pytools/plot_osu.py $enable_latex --dirname osu/ --plot-type latency-get --output-dir figures
-    python pytools/plot_osu.py $enable_latex --dirname osu/ --plot-type mpi-p2p --output-dir figures
+figures="random read-early read-late osu rayleigh-taylor"
+if test "$what_to_plot" != "all"; then
+    figures="$what_to_plot"
 fi
 
-for benchmark in "random" "read-early" "read-late"; do
-    if test "$benchmark" == "random"; then
-        nruns=10
-    else
-        nruns=5
-    fi
-    if test "$what_to_plot" == "all" || test "$what_to_plot" == "$benchmark"; then
-        for s in "" "--use-subcomm"; do
-            python pytools/plot_scaling.py --compiler-suites 'cray' 'gnu' \
-                                           $enable_latex $s \
-                                           --test-case "$benchmark" \
-                                           --path ./ \
-                                           --plot weak-strong-scaling \
-                                           --output-dir figures \
-                                           --nruns $nruns
-        done
-    fi
-done
+if test "$what_to_plot" != "osu" && test "$what_to_plot" != "rayleigh-taylor"; then
+    python pytools/timing_store.py --path ./ --store timings.feather
+fi
 
-if test "$what_to_plot" == "all" || test "$what_to_plot" == "rayleigh-taylor"; then
-    python pytools/plot_rayleigh_taylor.py  --path rayleigh_taylor \
-                                            --output-dir figures $enable_latex
+if test "$what_to_plot" == "all" || test "$what_to_plot" == "osu"; then
+    python pytools/osu.py --dirname osu/ --store osu.feather
 fi
+
+# all figures are created in a single process (see pytools/__main__.py)
+python pytools all --figures $figures \
+                   $enable_latex \
+                   --compiler-suites 'cray' 'gnu' \
+                   --path ./ \
+                   --store timings.feather \
+                   --osu-dir osu/ \
+                   --osu-store osu.feather \
+                   --rt-path rayleigh_taylor \
+                   --output-dir figures
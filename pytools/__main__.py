@@ -0,0 +1,218 @@
+import argparse
+import importlib
+import os
+import sys
+
+#
+# Single entry point of the plotting scripts, e.g.
+#   python pytools scaling --test-case random --store timings.feather
+#   python pytools osu --dirname osu --output-dir figures
+#   python pytools all --store timings.feather --output-dir figures
+# The command 'all' creates every figure of create_plots.sh in a single process
+# where each data set (timing store, OSU data) is read once and the figures are
+# rendered by a pool of processes (see render.py). The scripts are only imported
+# when their command is run, hence 'python pytools --help' does not load pandas,
+# matplotlib or netCDF4.
+#
+
+# command: script
+commands = {
+    'scaling':          'plot_scaling',
+    'osu':              'plot_osu',
+    'rayleigh-taylor':  'plot_rayleigh_taylor'
+}
+
+figures = ['random', 'read-early', 'read-late', 'osu', 'rayleigh-taylor']
+
+# number of runs used by the scaling figures of each test case
+nruns = {
+    'random':       10,
+    'read-early':   5,
+    'read-late':    5
+}
+
+
+def get_parser():
+    parser = argparse.ArgumentParser(
+            prog='pytools all',
+            description="Generate all figures in a single process."
+    )
+
+    parser.add_argument(
+        "--figures",
+        type=str,
+        nargs='+',
+        default=figures,
+        choices=figures,
+        help="Figures to create. Default: all",
+    )
+
+    parser.add_argument(
+        "--path",
+        type=str,
+        default='.',
+        help="Data directory.",
+    )
+
+    parser.add_argument(
+        "--store",
+        type=str,
+        default=None,
+        help="Read the timing data from the store written by timing_store.py " + \
+             "instead of the data directory."
+    )
+
+    parser.add_argument(
+        "--osu-dir",
+        type=str,
+        default='osu',
+        help="Root directory of OSU micro benchmark data."
+    )
+
+    parser.add_argument(
+        "--osu-store",
+        type=str,
+        default=None,
+        help="Read the OSU data from the store written by osu.py (updated if needed) " + \
+             "instead of parsing all files."
+    )
+
+    parser.add_argument(
+        "--rt-path",
+        type=str,
+        default='rayleigh_taylor',
+        help="Data directory of the Rayleigh-Taylor runs."
+    )
+
+    parser.add_argument(
+        "--compiler-suites",
+        type=str,
+        nargs='+',
+        default=['cray', 'gnu'],
+        help="Compiler environment",
+    )
+
+    parser.add_argument(
+        "--nthreads",
+        type=int,
+        default=8,
+        help="Number of threads reading the CSV files. Default: 8"
+    )
+
+    parser.add_argument(
+        "--nprocs",
+        type=int,
+        default=None,
+        help="Number of processes rendering the figures. Default: number of available cores"
+    )
+
+    parser.add_argument(
+        "--rebuild",
+        action='store_true',
+        help="Render all figures, also the unchanged ones of the figure cache."
+    )
+
+    parser.add_argument(
+        "--enable-latex",
+        action='store_true',
+        help="Use LateX for plot labels."
+    )
+
+    parser.add_argument(
+        "--output-dir",
+        type=str,
+        default=".",
+        help="Figure save directory."
+    )
+
+    return parser
+
+
+def plot_all(args):
+    render = importlib.import_module('render')
+
+    latex = []
+    if args.enable_latex:
+        latex = ['--enable-latex']
+
+    nprocs = args.nprocs
+    if nprocs is None:
+        nprocs = render.default_nprocs
+
+    # figures of all scripts are rendered by the same pool
+    tasks = []
+
+    if 'osu' in args.figures:
+        plot_osu = importlib.import_module('plot_osu')
+        store = []
+        if not args.osu_store is None:
+            store = ['--store', args.osu_store]
+        tasks += plot_osu.get_tasks(plot_osu.get_parser().parse_args(
+            ['--dirname', args.osu_dir, '--output-dir', args.output_dir] + store + latex))
+
+    test_cases = [f for f in args.figures if f in nruns.keys()]
+    if not test_cases == []:
+        plot_scaling = importlib.import_module('plot_scaling')
+        timing_store = importlib.import_module('timing_store')
+
+        # all scaling figures share the timing data
+        if args.store is None:
+            data = timing_store.ingest(args.path, subdirs=test_cases, nthreads=args.nthreads)
+        else:
+            data = timing_store.load(args.store)
+
+        # all scaling figures share the index of the run artefacts
+        discover = importlib.import_module('discover')
+        index, _ = discover.update(args.path, test_cases, nthreads=args.nthreads)
+
+        parser = plot_scaling.get_parser()
+        for test_case in test_cases:
+            for subcomm in [[], ['--use-subcomm']]:
+                tasks += plot_scaling.get_tasks(parser.parse_args(
+                    ['--compiler-suites'] + args.compiler_suites + \
+                    ['--test-case', test_case,
+                     '--path', args.path,
+                     '--plot', 'weak-strong-scaling',
+                     '--output-dir', args.output_dir,
+                     '--nruns', str(nruns[test_case])] + subcomm + latex), data, index)
+
+    render.render(tasks, nprocs, os.path.join(args.output_dir, render.default_cache), args.rebuild)
+
+    if 'rayleigh-taylor' in args.figures:
+        plot_rayleigh_taylor = importlib.import_module('plot_rayleigh_taylor')
+        plot_rayleigh_taylor.main(plot_rayleigh_taylor.get_parser().parse_args(
+            ['--path', args.rt_path, '--output-dir', args.output_dir] + latex))
+
+
+if __name__ == '__main__':
+    try:
+        parser = argparse.ArgumentParser(
+                prog='pytools',
+                description="Generate the benchmark figures."
+        )
+
+        parser.add_argument(
+            "command",
+            type=str,
+            choices=list(commands.keys()) + ['all'],
+            help="Figures to create. Use 'python pytools <command> --help' " + \
+                 "for the arguments of a command."
+        )
+
+        # only the command is parsed here, the remaining arguments belong to the command
+        args = parser.parse_args(sys.argv[1:2])
+        argv = sys.argv[2:]
+
+        # the scripts import each other as top-level modules
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+        if args.command == 'all':
+            plot_all(get_parser().parse_args(argv))
+        else:
+            script = importlib.import_module(commands[args.command])
+            script_parser = script.get_parser()
+            script_parser.prog = 'pytools ' + args.command
+            script.main(script_parser.parse_args(argv))
+
+    except Exception as ex:
+        print(ex, flush=True)
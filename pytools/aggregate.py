@@ -0,0 +1,158 @@
+import pandas as pd
+import numpy as np
+import argparse
+import timing_store
+import discover
+
+#
+# Summary statistics of all timers of a store (see timing_store.py) in a single
+# grouped pass. The summary has one row per configuration and timer, i.e. it is
+# indexed by the columns in 'group_columns' and 'timer'.
+#
+
+group_columns = [c for c in timing_store.index_columns if not c in ['run', 'fname']]
+
+default_quantiles = [0.25, 0.75]
+
+comms = ['p2p', 'rma', 'shmem']
+
+# titles of the communication layers in the figures
+comm_titles = {
+    'p2p':   r'MPI P2P + MPI P2P',
+    'rma':   r'MPI P2P + MPI-3 RMA',
+    'shmem': r'MPI P2P + SHMEM'
+}
+
+
+def describe(row):
+    return row['machine'] + '-' + row['compiler'] + '-' + row['comm'] + '-' + \
+           row['test_case'] + '-' + row['grid'] + '-nodes-' + str(row['nodes']) + \
+           ' (' + row['kind'] + ', ' + row['directory'] + ')'
+
+
+def get_quantile_name(q):
+    return 'q' + format(100.0 * q, 'g')
+
+
+# Keep the last nruns runs of each configuration. Default: -1 (keep all runs)
+def trim_runs(df, nruns=-1):
+    if nruns == -1:
+        return df
+
+    if nruns < 1:
+        raise RuntimeError("Number of runs must be positive or -1.")
+
+    grouped = df.groupby(group_columns, observed=True)['run']
+    size = grouped.transform('size')
+
+    too_few = size < nruns
+    if too_few.any():
+        row = df[too_few].iloc[0]
+        raise RuntimeError("Only " + str(size[too_few].iloc[0]) + " runs available for " + \
+                           describe(row) + ".")
+
+    rank = grouped.rank(method='first', ascending=False)
+    return df[rank <= nruns]
+
+
+# Long format with one row per configuration, run and timer.
+def to_long(df, timers=None):
+    if timers is None:
+        timers = timing_store.get_timers(df)
+
+    for timer in timers:
+        if not timer in df.columns:
+            raise RuntimeError("Data '" + timer + "' not in data set.")
+
+    long = df.melt(id_vars=group_columns + ['run'],
+                   value_vars=timers,
+                   var_name='timer',
+                   value_name='value')
+
+    # timers of other communication layers are not available
+    return long.dropna(subset=['value'])
+
+
+def summarise(df, timers=None, nruns=-1, quantiles=default_quantiles):
+    long = to_long(trim_runs(df, nruns), timers)
+
+    grouped = long.groupby(group_columns + ['timer'], observed=True)['value']
+
+    # standard deviation with ddof = 0 as numpy
+    summary = pd.DataFrame({
+        'count':  grouped.count(),
+        'mean':   grouped.mean(),
+        'std':    grouped.std(ddof=0),
+        'min':    grouped.min(),
+        'max':    grouped.max(),
+        'median': grouped.median()
+    })
+
+    if len(quantiles) > 0:
+        q = grouped.quantile(quantiles).unstack()
+        q.columns = [get_quantile_name(c) for c in q.columns]
+        summary = summary.join(q)
+
+    return summary.reset_index()
+
+
+if __name__ == '__main__':
+    try:
+        parser = argparse.ArgumentParser(
+                description="Write summary statistics of all timers to a CSV file."
+        )
+
+        parser.add_argument(
+            "--store",
+            type=str,
+            default=timing_store.default_store,
+            help="Store written by timing_store.py. Default: '" + timing_store.default_store + "'",
+        )
+
+        parser.add_argument(
+            "--compiler-suites",
+            type=str,
+            nargs='+',
+            default=['cray', 'gnu'],
+            help="Compiler environment",
+        )
+
+        parser.add_argument(
+            "--nruns",
+            type=int,
+            default=-1,
+            help="Number of runs to use. Default: -1 (use all available)"
+        )
+
+        parser.add_argument(
+            "--quantiles",
+            type=float,
+            nargs='*',
+            default=default_quantiles,
+            help="Quantiles to compute in addition to the median."
+        )
+
+        parser.add_argument(
+            "--output",
+            type=str,
+            default='summary.csv',
+            help="Output CSV file."
+        )
+
+        args = parser.parse_args()
+
+        store = timing_store.load(args.store)
+
+        selected = []
+        for test_case in store['test_case'].astype(str).unique():
+            directories = discover.get_directories(store, test_case, args.compiler_suites)
+            selected.append(discover.select_runs(store, test_case, directories))
+        df = pd.concat(selected)
+
+        summary = summarise(df, nruns=args.nruns, quantiles=args.quantiles)
+        summary.to_csv(args.output, index=False)
+
+        print("Wrote", len(summary), "rows to '" + args.output + "'.")
+
+    except Exception as ex:
+        print(ex, flush=True)
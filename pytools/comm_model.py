@@ -0,0 +1,201 @@
+import pandas as pd
+import numpy as np
+import os
+import argparse
+import timing_store
+import aggregate
+import discover
+import osu
+
+#
+# Communication cost model: the mean number of calls per rank (*-ncalls.csv)
+# times the OSU latency of the corresponding operation at the message size.
+# For every call the model also splits the time into a latency part (the
+# latency at the smallest message size) and a bandwidth part (message size
+# divided by the OSU bandwidth), and calls a configuration latency-bound if the
+# former dominates. The prediction is compared with the measured timer of the
+# same name (e.g. 'SHMEM put' or 'MPI allreduce').
+#
+# Runs on a single node use the intra-node OSU data, all other runs the
+# inter-node data. There is no OSU test of the synchronisation of MPI P2P and
+# MPI-3 RMA, hence the latency of a small allreduce is used instead.
+#
+
+# call: (latency test, bandwidth test)
+call_tests = {
+    'MPI P2P put':   ('osu_latency', 'osu_bw'),
+    'MPI P2P get':   ('osu_latency', 'osu_bw'),
+    'MPI P2P sync':  ('osu_allreduce', None),
+    'MPI RMA put':   ('osu_put_latency_<sync>', 'osu_put_bw_<sync>'),
+    'MPI RMA get':   ('osu_get_latency_<sync>', 'osu_get_bw_<sync>'),
+    'MPI RMA sync':  ('osu_allreduce', None),
+    'SHMEM put':     ('osu_oshm_put', 'osu_oshm_put_bw'),
+    'SHMEM get':     ('osu_oshm_get', 'osu_oshm_get_bw'),
+    'SHMEM sync':    ('osu_oshm_barrier', None),
+    'MPI allreduce': ('osu_allreduce', None)
+}
+
+# size (B) of the synchronisation proxy (a single integer)
+sync_size = 4
+
+default_message_size = 8
+
+
+def get_tests(call, rma_sync):
+    lat_test, bw_test = call_tests[call]
+    lat_test = lat_test.replace('<sync>', rma_sync)
+    if not bw_test is None:
+        bw_test = bw_test.replace('<sync>', rma_sync)
+    return lat_test, bw_test
+
+
+# Predicted time (s) per rank of all calls of the summary of the call counts.
+def predict(ncalls, osu_data, message_size=default_message_size, rma_sync='flush'):
+    df = ncalls[ncalls['timer'].isin(call_tests.keys())].copy()
+    df['locality'] = np.where(df['nodes'] == 1, 'intra', 'inter')
+
+    df['latency'] = np.nan
+    df['latency_time'] = np.nan
+    df['bandwidth_time'] = 0.0
+
+    for (machine, locality, call), group in df.groupby(['machine', 'locality', 'timer'],
+                                                         observed=True):
+        lat_test, bw_test = get_tests(call, rma_sync)
+
+        size = message_size
+        if bw_test is None:
+            size = sync_size
+
+        lat = osu.interpolate(osu_data, machine, locality, lat_test, [size, 1])
+        count = group['mean'].to_numpy()
+
+        # OSU latency in us, bandwidth in MB/s
+        df.loc[group.index, 'latency'] = lat[0]
+        df.loc[group.index, 'latency_time'] = count * lat[1] * 1.0e-6
+        if not bw_test is None:
+            bw = osu.interpolate(osu_data, machine, locality, bw_test, [size])[0]
+            df.loc[group.index, 'bandwidth_time'] = count * size / (bw * 1.0e6)
+
+    df['predicted'] = df['mean'] * df['latency'] * 1.0e-6
+    df['bound'] = np.where(df['latency_time'] >= df['bandwidth_time'], 'latency', 'bandwidth')
+    return df.rename(columns={'mean': 'ncalls'})
+
+
+# Join the prediction with the mean of the measured timers.
+def compare(prediction, timings):
+    keys = [c for c in aggregate.group_columns if not c == 'kind'] + ['timer']
+    measured = timings[keys + ['mean']].rename(columns={'mean': 'measured'})
+    df = prediction.drop(columns=['kind']).merge(measured, on=keys, how='left')
+    df['ratio'] = df['predicted'] / df['measured']
+    return df
+
+
+if __name__ == '__main__':
+    try:
+        parser = argparse.ArgumentParser(
+                description="Predict the communication time from the call counts " + \
+                            "and the OSU Micro-Benchmarks."
+        )
+
+        parser.add_argument(
+            "--store",
+            type=str,
+            default=timing_store.default_store,
+            help="Store written by timing_store.py. Default: '" + timing_store.default_store + "'",
+        )
+
+        parser.add_argument(
+            "--osu-dir",
+            type=str,
+            default='osu',
+            help="Directory of the OSU Micro-Benchmark runs.",
+        )
+
+        parser.add_argument(
+            "--compiler-suites",
+            type=str,
+            nargs='+',
+            default=['cray', 'gnu'],
+            help="Compiler environment",
+        )
+
+        parser.add_argument(
+            "--test-case",
+            type=str,
+            default="random",
+            choices=['random', 'read-early', 'read-late'],
+            help="Test case to analyse.",
+        )
+
+        parser.add_argument(
+            "--message-size",
+            type=int,
+            default=default_message_size,
+            help="Message size (B) of a put or get. Default: " + str(default_message_size),
+        )
+
+        parser.add_argument(
+            "--rma-sync",
+            type=str,
+            default='flush',
+            choices=['flush', 'lock'],
+            help="Synchronisation of the OSU MPI-3 RMA tests.",
+        )
+
+        parser.add_argument(
+            "--nruns",
+            type=int,
+            default=-1,
+            help="Number of runs to use. Default: -1 (use all available)"
+        )
+
+        parser.add_argument(
+            "--osu-store",
+            type=str,
+            default=None,
+            help="Cache the parsed OSU data in this store (see osu.py). Default: parse all files"
+        )
+
+        parser.add_argument(
+            "--output",
+            type=str,
+            default='comm-model.csv',
+            help="Output CSV file."
+        )
+
+        args = parser.parse_args()
+
+        df = timing_store.load(args.store)
+        directories = discover.get_directories(df, args.test_case, args.compiler_suites)
+        df = discover.select_runs(df, args.test_case, directories)
+
+        if len(df) == 0:
+            raise RuntimeError("No benchmark data of '" + args.test_case + "' found.")
+
+        calls = list(call_tests.keys())
+        ncalls = aggregate.summarise(df[df['kind'] == 'ncalls'], timers=[c for c in calls if c in df],
+                                     nruns=args.nruns, quantiles=[])
+        timings = aggregate.summarise(df[df['kind'] == 'timings'], timers=[c for c in calls if c in df],
+                                      nruns=args.nruns, quantiles=[])
+
+        osu_data = osu.load(args.osu_dir, store=args.osu_store)
+        prediction = predict(ncalls, osu_data, args.message_size, args.rma_sync)
+        result = compare(prediction, timings)
+
+        result.to_csv(args.output, index=False)
+        print("Wrote", len(result), "rows to '" + args.output + "'.")
+
+        # communication time of all calls per configuration
+        keys = ['machine', 'compiler', 'comm', 'subcomm']
+        total = result.groupby(keys + ['grid', 'nodes'], observed=True)[
+                ['latency_time', 'bandwidth_time', 'predicted', 'measured']].sum()
+        total = total.groupby(keys, observed=True).mean()
+        total['bound'] = np.where(total['latency_time'] >= total['bandwidth_time'],
+                                  'latency', 'bandwidth')
+        total['ratio'] = total['predicted'] / total['measured']
+        print()
+        print("Average over all grids and nodes of the communication time per rank (s):")
+        print(total.reset_index().to_string(index=False))
+
+    except Exception as ex:
+        print(ex, flush=True)
@@ -0,0 +1,67 @@
+import pandas as pd
+import numpy as np
+import aggregate
+
+#
+# Communication volume of the call counts (*-ncalls.csv), which are counted per
+# rank. For every configuration, number of nodes and operation (put, get, sync
+# and allreduce) the volume is given
+#   - per rank (as measured),
+#   - in total (per rank times the number of ranks) and
+#   - per merge (per rank divided by the number of calls of the parcel merge).
+#
+# The growth exponent of the total volume between two successive numbers of
+# ranks r_1 < r_2 is
+#   g = log(total_2 / total_1) / log(r_2 / r_1)
+# where g > 1 means that the total number of calls grows faster than the number
+# of ranks (superlinear growth), i.e. the calls per rank increase with the ranks.
+#
+
+operations = ['put', 'get', 'sync', 'allreduce']
+
+merge_timer = 'parcel merge (total)'
+
+# tolerance of the growth exponent before growth is called superlinear
+default_tolerance = 0.05
+
+
+def get_operation(call):
+    if call == 'MPI allreduce':
+        return 'allreduce'
+    op = call.split(' ')[-1]
+    if op in operations:
+        return op
+    return None
+
+
+# 'ntasks_per_node' maps each machine to its number of ranks per node.
+def volume(ncalls, ntasks_per_node, tolerance=default_tolerance):
+    calls = [c for c in ncalls['timer'].unique() if not get_operation(c) is None]
+
+    merges = ncalls[ncalls['timer'] == merge_timer]
+    keys = [c for c in aggregate.group_columns if not c == 'kind']
+    merges = merges[keys + ['mean']].rename(columns={'mean': 'merges'})
+
+    df = ncalls[ncalls['timer'].isin(calls)].drop(columns=['kind'])
+    df = df.merge(merges, on=keys, how='left')
+
+    df['operation'] = df['timer'].map(get_operation)
+    df['ranks'] = df['nodes'] * df['machine'].astype(str).map(ntasks_per_node).astype(np.int64)
+    df['per_rank'] = df['mean']
+    df['total'] = df['mean'] * df['ranks']
+    df['per_merge'] = df['mean'] / df['merges']
+
+    # growth with respect to the next smaller number of ranks of the same grid
+    series = [c for c in keys if not c == 'nodes'] + ['timer']
+    df = df.sort_values(series + ['nodes']).reset_index(drop=True)
+    grouped = df.groupby(series, observed=True)
+    prev_total = grouped['total'].shift(1)
+    prev_ranks = grouped['ranks'].shift(1)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        df['growth'] = np.log(df['total'] / prev_total) / np.log(df['ranks'] / prev_ranks)
+
+    df['superlinear'] = df['growth'] > 1.0 + tolerance
+
+    return df[series + ['operation', 'nodes', 'ranks', 'merges', 'per_rank',
+                        'total', 'per_merge', 'growth', 'superlinear']]
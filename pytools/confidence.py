@@ -0,0 +1,259 @@
+import pandas as pd
+import numpy as np
+import argparse
+from scipy.special import ndtr, ndtri
+import timing_store
+import aggregate
+import discover
+
+#
+# Bootstrap confidence intervals of the mean run time of all configurations and
+# a report of the configurations that need more runs to reach a target width.
+#
+# All configurations with the same number of runs n share the resampling: each
+# bootstrap sample b is a vector of counts c_b (how often each of the n runs is
+# drawn), and the means of all configurations are given by X @ C^T / n where
+# X holds the runs of one configuration per row.
+#
+
+default_timers = ['parcel merge (total)', 'find nearest', 'build graphs', 'resolve graphs']
+
+# maximum number of (configuration, sample) pairs evaluated at once
+block_size = 2 ** 22
+
+
+def _get_bounds(boot, theta, jack, level, method):
+    nboot = boot.shape[1]
+    boot = np.sort(boot, axis=1)
+
+    alpha = 0.5 * (1.0 - level)
+    z = ndtri(np.array([alpha, 1.0 - alpha]))
+
+    if method == 'percentile':
+        a1 = np.full(len(theta), alpha)
+        a2 = np.full(len(theta), 1.0 - alpha)
+    elif method == 'bca':
+        # bias correction
+        prop = (boot < theta[:, None]).sum(axis=1) / nboot
+        prop = np.clip(prop, 1.0 / (nboot + 1), nboot / (nboot + 1))
+        z0 = ndtri(prop)
+
+        # acceleration (jackknife)
+        d = jack.mean(axis=1)[:, None] - jack
+        num = (d ** 3).sum(axis=1)
+        den = 6.0 * (d ** 2).sum(axis=1) ** 1.5
+        acc = np.zeros(len(theta))
+        np.divide(num, den, out=acc, where=(den > 0))
+
+        a1 = ndtr(z0 + (z0 + z[0]) / (1.0 - acc * (z0 + z[0])))
+        a2 = ndtr(z0 + (z0 + z[1]) / (1.0 - acc * (z0 + z[1])))
+    else:
+        raise RuntimeError("Only 'percentile' or 'bca' method.")
+
+    i1 = np.clip(np.round(a1 * (nboot - 1)).astype(np.int64), 0, nboot - 1)
+    i2 = np.clip(np.round(a2 * (nboot - 1)).astype(np.int64), 0, nboot - 1)
+    lower = np.take_along_axis(boot, i1[:, None], axis=1)[:, 0]
+    upper = np.take_along_axis(boot, i2[:, None], axis=1)[:, 0]
+    return lower, upper
+
+
+def _bootstrap_runs(x, nboot, level, method, rng):
+    ngroups, n = x.shape
+
+    theta = x.mean(axis=1)
+
+    # leave-one-out means
+    jack = (x.sum(axis=1)[:, None] - x) / (n - 1)
+
+    counts = rng.multinomial(n, np.full(n, 1.0 / n), size=nboot).astype(np.float64)
+
+    lower = np.zeros(ngroups)
+    upper = np.zeros(ngroups)
+    step = max(1, block_size // nboot)
+    for i in range(0, ngroups, step):
+        j = min(i + step, ngroups)
+        boot = x[i:j] @ counts.T / n
+        lower[i:j], upper[i:j] = _get_bounds(boot, theta[i:j], jack[i:j], level, method)
+
+    # constant data, e.g. call counts
+    const = x.min(axis=1) == x.max(axis=1)
+    lower[const] = theta[const]
+    upper[const] = theta[const]
+
+    return theta, lower, upper
+
+
+def bootstrap(df, timers=default_timers, nruns=-1, nboot=10000, level=0.95,
+              method='bca', seed=42):
+    long = aggregate.to_long(aggregate.trim_runs(df, nruns), timers)
+    long = long.sort_values('run')
+
+    keys = aggregate.group_columns + ['timer']
+    grouped = long.groupby(keys, observed=True)['value']
+    runs = grouped.agg(list)
+    n = runs.map(len)
+
+    rng = np.random.default_rng(seed)
+
+    frames = []
+    for size in sorted(n.unique()):
+        sel = runs[n == size]
+        if size < 2:
+            raise RuntimeError("At least two runs are needed for a confidence interval.")
+        x = np.array(sel.tolist(), dtype=np.float64)
+        theta, lower, upper = _bootstrap_runs(x, nboot, level, method, rng)
+        frames.append(pd.DataFrame({'n':     size,
+                                    'mean':  theta,
+                                    'lower': lower,
+                                    'upper': upper}, index=sel.index))
+
+    ci = pd.concat(frames).sort_index()
+    ci['width'] = ci['upper'] - ci['lower']
+    ci['rel_width'] = ci['width'] / ci['mean']
+    return ci.reset_index()
+
+
+# Percentile bootstrap confidence interval of the ratio mean(a) / mean(b) of
+# two independent samples, e.g. the runs of two variants of a configuration.
+# Returns the ratio and the lower and upper bound.
+def bootstrap_ratio(a, b, nboot=10000, level=0.95, rng=None):
+    a = np.asarray(a, dtype=np.float64)
+    b = np.asarray(b, dtype=np.float64)
+    if len(a) < 2 or len(b) < 2:
+        raise RuntimeError("At least two runs are needed for a confidence interval.")
+
+    if rng is None:
+        rng = np.random.default_rng(42)
+
+    ca = rng.multinomial(len(a), np.full(len(a), 1.0 / len(a)), size=nboot)
+    cb = rng.multinomial(len(b), np.full(len(b), 1.0 / len(b)), size=nboot)
+    boot = (ca @ a / len(a)) / (cb @ b / len(b))
+
+    alpha = 0.5 * (1.0 - level)
+    lower, upper = np.quantile(boot, [alpha, 1.0 - alpha])
+    return a.mean() / b.mean(), lower, upper
+
+
+# The width of a confidence interval of the mean decreases with 1 / sqrt(n), hence
+# a configuration with n runs and relative width w needs n * (w / target)^2 runs.
+def sufficiency(ci, target):
+    if target <= 0.0:
+        raise RuntimeError("Target width must be positive.")
+
+    report = ci[ci['rel_width'] > target].copy()
+    report['required'] = np.ceil(report['n'] * (report['rel_width'] / target) ** 2).astype(np.int64)
+    report['additional'] = report['required'] - report['n']
+    return report.sort_values(['machine', 'comm', 'nodes', 'additional'])
+
+
+if __name__ == '__main__':
+    try:
+        parser = argparse.ArgumentParser(
+                description="Bootstrap confidence intervals of the mean run time and " + \
+                            "report configurations that need more runs."
+        )
+
+        parser.add_argument(
+            "--store",
+            type=str,
+            default=timing_store.default_store,
+            help="Store written by timing_store.py. Default: '" + timing_store.default_store + "'",
+        )
+
+        parser.add_argument(
+            "--compiler-suites",
+            type=str,
+            nargs='+',
+            default=['cray', 'gnu'],
+            help="Compiler environment",
+        )
+
+        parser.add_argument(
+            "--test-case",
+            type=str,
+            default="random",
+            choices=['random', 'read-early', 'read-late'],
+            help="Test case to analyse.",
+        )
+
+        parser.add_argument(
+            "--timings",
+            type=str,
+            nargs='+',
+            default=default_timers,
+            help="Timer data to analyse.",
+        )
+
+        parser.add_argument(
+            "--nruns",
+            type=int,
+            default=-1,
+            help="Number of runs to use. Default: -1 (use all available)"
+        )
+
+        parser.add_argument(
+            "--nboot",
+            type=int,
+            default=10000,
+            help="Number of bootstrap samples."
+        )
+
+        parser.add_argument(
+            "--level",
+            type=float,
+            default=0.95,
+            help="Confidence level."
+        )
+
+        parser.add_argument(
+            "--method",
+            type=str,
+            default='bca',
+            choices=['bca', 'percentile'],
+            help="Bootstrap confidence interval method."
+        )
+
+        parser.add_argument(
+            "--target-width",
+            type=float,
+            default=0.05,
+            help="Target width of the confidence interval relative to the mean."
+        )
+
+        parser.add_argument(
+            "--output",
+            type=str,
+            default='confidence.csv',
+            help="Output CSV file of all confidence intervals."
+        )
+
+        args = parser.parse_args()
+
+        df = timing_store.load(args.store)
+        df = df[df['kind'] == 'timings']
+        directories = discover.get_directories(df, args.test_case, args.compiler_suites)
+        df = discover.select_runs(df, args.test_case, directories)
+
+        if len(df) == 0:
+            raise RuntimeError("No benchmark data of '" + args.test_case + "' found.")
+
+        ci = bootstrap(df,
+                       timers=args.timings,
+                       nruns=args.nruns,
+                       nboot=args.nboot,
+                       level=args.level,
+                       method=args.method)
+        ci.to_csv(args.output, index=False)
+        print("Wrote", len(ci), "confidence intervals to '" + args.output + "'.")
+
+        report = sufficiency(ci, args.target_width)
+        if len(report) == 0:
+            print("All configurations reach the target width.")
+        else:
+            print(len(report), "configuration(s) need more runs:")
+            columns = ['machine', 'compiler', 'comm', 'grid', 'nodes', 'subcomm', 'timer',
+                       'n', 'rel_width', 'required', 'additional']
+            print(report[columns].to_string(index=False))
+
+    except Exception as ex:
+        print(ex, flush=True)
@@ -0,0 +1,371 @@
+import pandas as pd
+import numpy as np
+import os
+import re
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pyarrow as pa
+import pyarrow.feather as feather
+import timing_store
+import job_log
+
+#
+# Discovery of all run artefacts below one or more roots of the data directory:
+#   csv:    the timings and call counts (*-timings.csv, *-ncalls.csv),
+#   submit: the submission scripts (submit_*.sh),
+#   log:    the SLURM output (*.o<jobid>).
+# The directories are walked level by level with os.scandir where the
+# directories of a level are scanned by a pool of threads. Every artefact is
+# kept with the metadata of its file name (and the number of tasks per node of
+# a submission script) in an index, which may be saved as a feather file.
+# Updating a saved index only reads the submission scripts that were added or
+# changed since. The directories are relative to the data directory, hence an
+# artefact reached from several (nested) roots is indexed once.
+#
+# Runs can also be found in more than one place, e.g. a campaign copied to a
+# second root. See deduplicate().
+#
+
+submit_pattern = re.compile(r"submit_(\w+?)_(random|read_early|read_late)_" + \
+                            r"nx_(\d+)_ny_(\d+)_nz_(\d+)_nodes_(\d+)\.sh$")
+
+ntasks_pattern = re.compile(r"#SBATCH --n?tasks-per-node=(\d+)")
+
+default_index = 'index.feather'
+
+index_columns = ['root', 'directory', 'fname', 'artefact', 'size', 'mtime', 'machine', 'compiler',
+                 'comm', 'test_case', 'grid', 'nx', 'ny', 'nz', 'nodes', 'subcomm', 'kind',
+                 'jobid', 'ntasks_per_node']
+
+int_columns = ['nx', 'ny', 'nz', 'nodes', 'jobid', 'ntasks_per_node']
+
+
+def parse_submit_fname(fname):
+    m = re.match(submit_pattern, fname)
+    if m is None:
+        return None
+    return {
+        'machine':   m.group(1),
+        'test_case': m.group(2).replace('_', '-'),
+        'nx':        int(m.group(3)),
+        'ny':        int(m.group(4)),
+        'nz':        int(m.group(5)),
+        'grid':      'nx-' + m.group(3) + '-ny-' + m.group(4) + '-nz-' + m.group(5),
+        'nodes':     int(m.group(6))
+    }
+
+
+def parse_fname(fname):
+    meta = timing_store.parse_fname(fname)
+    if not meta is None:
+        return 'csv', meta
+
+    meta = parse_submit_fname(fname)
+    if not meta is None:
+        return 'submit', meta
+
+    meta = job_log.parse_fname(fname)
+    if not meta is None:
+        return 'log', meta
+
+    return None, None
+
+
+def read_ntasks_per_node(fname):
+    with open(fname) as lines:
+        for line in lines:
+            m = re.match(ntasks_pattern, line)
+            if not m is None:
+                return int(m.group(1))
+    return None
+
+
+# Files (name, size, modification time) and sub-directories of a directory.
+def scan_dir(path):
+    files = []
+    subdirs = []
+    with os.scandir(path) as entries:
+        for entry in entries:
+            if entry.name.startswith('.') or entry.name == '__pycache__':
+                continue
+            if entry.is_dir(follow_symlinks=False):
+                subdirs.append(entry.path)
+            elif entry.is_file():
+                st = entry.stat()
+                files.append((entry.name, st.st_size, st.st_mtime_ns))
+    return files, subdirs
+
+
+# Returns a list of (root, directory, fname, size, mtime) of all files below
+# the roots. The directories are relative to path.
+def walk(path, roots=['.'], nthreads=timing_store.default_nthreads):
+    if nthreads < 1:
+        raise RuntimeError("Number of threads must be positive.")
+
+    found = []
+    with ThreadPoolExecutor(max_workers=nthreads) as executor:
+        for root in roots:
+            top = os.path.join(path, root)
+            if not os.path.exists(top):
+                raise RuntimeError("Path '" + top + "' does not exist. Exiting.")
+
+            level = [top]
+            while not level == []:
+                subdirs = []
+                for dirpath, (files, dirs) in zip(level, executor.map(scan_dir, level)):
+                    directory = os.path.normpath(os.path.relpath(dirpath, path))
+                    for fname, size, mtime in files:
+                        found.append((root, directory, fname, size, mtime))
+                    subdirs += sorted(dirs)
+                level = subdirs
+    return found
+
+
+# Index of all artefacts below the roots. The number of tasks per node of the
+# submission scripts is taken from the old index if the script is unchanged.
+def update(path, roots=['.'], index=None, nthreads=timing_store.default_nthreads):
+    rows = []
+    for root, directory, fname, size, mtime in walk(path, roots, nthreads):
+        artefact, meta = parse_fname(fname)
+        if artefact is None:
+            continue
+        row = dict(meta)
+        row.update({'root': root, 'directory': directory, 'fname': fname,
+                    'artefact': artefact, 'size': size, 'mtime': mtime})
+        rows.append(row)
+
+    df = pd.DataFrame(rows, columns=index_columns)
+
+    # reached from more than one root
+    df = df.drop_duplicates(['directory', 'fname']).reset_index(drop=True)
+
+    submit = df[df['artefact'] == 'submit']
+    known = {}
+    if not index is None:
+        old = index[index['artefact'] == 'submit']
+        for row in old.itertuples():
+            known[(row.directory, row.fname, row.size, row.mtime)] = row.ntasks_per_node
+
+    keys = list(zip(submit['directory'], submit['fname'], submit['size'], submit['mtime']))
+    to_read = [i for i, key in zip(submit.index, keys) if not key in known.keys()]
+
+    with ThreadPoolExecutor(max_workers=nthreads) as executor:
+        fnames = [os.path.join(path, df.at[i, 'directory'], df.at[i, 'fname']) for i in to_read]
+        ntasks = dict(zip(to_read, executor.map(read_ntasks_per_node, fnames)))
+
+    df.loc[submit.index, 'ntasks_per_node'] = [ntasks[i] if i in ntasks.keys() else known[key]
+                                               for i, key in zip(submit.index, keys)]
+
+    for c in int_columns:
+        df[c] = df[c].astype('Int64')
+    df['subcomm'] = df['subcomm'].astype('boolean')
+
+    return df, len(to_read)
+
+
+def save(df, fname):
+    feather.write_feather(pa.Table.from_pandas(df, preserve_index=False), fname,
+                          compression='uncompressed')
+
+
+def load(fname):
+    if not os.path.exists(fname):
+        raise RuntimeError("Index '" + fname + "' does not exist. " + \
+                           "Please run 'python pytools/discover.py' first.")
+    return feather.read_table(fname).to_pandas()
+
+
+# Artefacts of the index below the given roots, in the order of the roots.
+def select(index, roots):
+    frames = []
+    for root in roots:
+        root = os.path.normpath(root)
+        if root == '.':
+            frames.append(index)
+        else:
+            directory = index['directory']
+            frames.append(index[(directory == root) | directory.str.startswith(root + os.sep)])
+    return pd.concat(frames).drop_duplicates(['directory', 'fname'])
+
+
+# Returns the list of (directory, fname, meta) of the CSV files of the index
+# as used by timing_store.read_files().
+def get_files(index):
+    csv = index[index['artefact'] == 'csv']
+    files = []
+    for row in csv.itertuples():
+        meta = {}
+        for c in ['machine', 'compiler', 'comm', 'test_case', 'grid', 'nx', 'ny', 'nz',
+                  'nodes', 'subcomm', 'kind']:
+            meta[c] = getattr(row, c)
+            if c in int_columns:
+                meta[c] = int(meta[c])
+            elif c == 'subcomm':
+                meta[c] = bool(meta[c])
+        files.append((row.directory, row.fname, meta))
+    return files
+
+
+# Number of tasks per node of every machine (of the submission scripts in the
+# given directories, otherwise of all submission scripts).
+def get_ntasks_per_node(index, directories=None):
+    submit = index[(index['artefact'] == 'submit') & index['ntasks_per_node'].notna()]
+    ntasks = {}
+    if not directories is None:
+        sel = submit[submit['directory'].isin(directories)]
+        ntasks = sel.groupby('machine')['ntasks_per_node'].first().to_dict()
+    for machine, n in submit.groupby('machine')['ntasks_per_node'].first().items():
+        if not machine in ntasks.keys():
+            ntasks[machine] = n
+    return dict((machine, int(n)) for machine, n in ntasks.items())
+
+
+# Removes runs of the timing store that were found in more than one place:
+#   - a run that is identical (configuration, run number and all timers) to a
+#     run of another directory, e.g. a copied CSV file,
+#   - all runs of a configuration that was also run in a directory that comes
+#     first in 'directories' (e.g. an earlier root), such that every
+#     configuration is taken from a single directory.
+# Returns the remaining runs and the number of runs removed for either reason.
+def deduplicate(df, directories):
+    configs = [c for c in timing_store.index_columns if not c in ['run', 'directory', 'fname']]
+    timers = timing_store.get_timers(df)
+
+    order = df['directory'].astype(str).map(dict((d, i) for i, d in enumerate(directories)))
+    df = df.assign(order=order.to_numpy()).sort_values(['order', 'fname', 'run'], kind='stable')
+
+    n = len(df)
+    df = df.drop_duplicates(configs + ['run'] + timers)
+    nidentical = n - len(df)
+
+    first = df.groupby(configs, observed=True)['order'].transform('min')
+    df = df[df['order'] == first]
+    nshadowed = n - nidentical - len(df)
+
+    return df.drop(columns=['order']).sort_index(), nidentical, nshadowed
+
+
+# Assigns the runs of a nested directory to the outermost directory of
+# 'directories' that contains it (e.g. random/gnu/cirrus-72-144-32 to
+# random/gnu), i.e. to the series of that directory. Call after deduplicate()
+# such that every configuration is taken from a single directory.
+def fold(df, directories):
+    outer = {}
+    for directory in directories:
+        outer[directory] = directory
+        for other in directories:
+            if directory.startswith(other + os.sep) and len(other) < len(outer[directory]):
+                outer[directory] = other
+
+    directory = df['directory'].astype(str)
+    return df.assign(directory=directory.map(outer).fillna(directory).astype('category'))
+
+
+# Directories of the runs of the store of a test case and the compiler suites
+# below the roots (default: the test case directory) in order of the roots.
+def get_directories(df, test_case, compiler_suites, roots=None):
+    if roots is None:
+        roots = [test_case]
+
+    sel = (df['test_case'] == test_case) & df['compiler'].isin(compiler_suites)
+    found = sorted(df.loc[sel, 'directory'].astype(str).unique())
+
+    directories = []
+    for root in roots:
+        root = os.path.normpath(root)
+        for directory in found:
+            if directory in directories:
+                continue
+            if root == '.' or directory == root or directory.startswith(root + os.sep):
+                directories.append(directory)
+    return directories
+
+
+# Runs of a test case in the directories (see get_directories) without the
+# runs found in more than one place (see deduplicate) and with the nested
+# directories folded (see fold). All analyses select their runs this way,
+# only job_log.py and provenance.py match the job logs to the runs of every
+# directory.
+def select_runs(df, test_case, directories, subcomm=None):
+    sel = (df['test_case'] == test_case) & df['directory'].astype(str).isin(directories)
+    if not subcomm is None:
+        sel = sel & (df['subcomm'] == subcomm)
+
+    df, nidentical, nshadowed = deduplicate(df[sel], directories)
+    if nidentical + nshadowed > 0:
+        print("Removed", nidentical, "run(s) found in more than one directory and",
+              nshadowed, "run(s) of configurations of a preceding directory.")
+
+    return fold(df, directories)
+
+
+if __name__ == '__main__':
+    try:
+        parser = argparse.ArgumentParser(
+                description="Index all run artefacts (CSV files, submission scripts " + \
+                            "and SLURM output) below the given roots."
+        )
+
+        parser.add_argument(
+            "--path",
+            type=str,
+            default='.',
+            help="Data directory.",
+        )
+
+        parser.add_argument(
+            "--roots",
+            type=str,
+            nargs='+',
+            default=['.'],
+            help="Sub-directories of the data directory to search.",
+        )
+
+        parser.add_argument(
+            "--index",
+            type=str,
+            default=default_index,
+            help="Output file of the index. Default: '" + default_index + "'",
+        )
+
+        parser.add_argument(
+            "--nthreads",
+            type=int,
+            default=timing_store.default_nthreads,
+            help="Number of threads scanning the directories. Default: " + \
+                 str(timing_store.default_nthreads),
+        )
+
+        parser.add_argument(
+            "--rebuild",
+            action='store_true',
+            help="Read all submission scripts again instead of only new or changed ones.",
+        )
+
+        args = parser.parse_args()
+
+        index = None
+        if os.path.exists(args.index) and not args.rebuild:
+            index = load(args.index)
+
+        start = time.perf_counter()
+        index, nread = update(args.path, args.roots, index, args.nthreads)
+        elapsed = time.perf_counter() - start
+
+        print("Found", len(index), "artefacts in", index['directory'].nunique(),
+              "directories (" + str(nread) + " submission script(s) read) in",
+              round(elapsed, 3), "s.")
+        print(index.groupby(['artefact', 'machine']).size().unstack('artefact').fillna(0).astype(int).to_string())
+
+        save(index, args.index)
+        print("Wrote the index to '" + args.index + "'.")
+
+        # runs of the same CSV file name in several directories
+        csv = index[index['artefact'] == 'csv']
+        counts = csv.groupby('fname')['directory'].nunique()
+        print()
+        print(int((counts > 1).sum()), "CSV file name(s) found in more than one directory.")
+
+    except Exception as ex:
+        print(ex, flush=True)
@@ -0,0 +1,293 @@
+import pandas as pd
+import numpy as np
+import os
+import matplotlib.pyplot as plt
+import argparse
+import timing_store
+import aggregate
+import discover
+
+#
+# Parallel efficiency of the mean run time of a timer (see aggregate.py).
+#
+# Strong scaling (fixed grid), with p = nodes / nodes_0 relative to the
+# smallest number of nodes nodes_0 of a grid:
+#   S(p) = T(nodes_0) / T(nodes)
+#   E(p) = S(p) / p
+#   e(p) = (1 / S(p) - 1 / p) / (1 - 1 / p)     (Karp-Flatt serial fraction)
+#
+# Weak scaling (fixed work per node, i.e. nx * ny * nz / nodes, e.g. the
+# random test case with nx-256-ny-512 on 1 node, nx-512-ny-512 on 2 nodes and
+# nx-1024-ny-1024 on 8 nodes):
+#   E(p) = T(nodes_0) / T(nodes)
+#
+
+# columns identifying a scaling series apart from the grid
+series_columns = [c for c in aggregate.group_columns if not c in ['grid', 'nx', 'ny', 'nz', 'nodes']]
+
+
+def karp_flatt(speedup, p):
+    e = np.full(len(p), np.nan)
+    valid = p > 1
+    e[valid] = (1.0 / speedup[valid] - 1.0 / p[valid]) / (1.0 - 1.0 / p[valid])
+    return e
+
+
+# Speedup, efficiency and Karp-Flatt serial fraction of
+# run times t measured on (ascending) numbers of nodes.
+def strong_efficiency(nodes, t):
+    nodes = np.asarray(nodes, dtype=np.float64)
+    t = np.asarray(t, dtype=np.float64)
+    p = nodes / nodes[0]
+    speedup = t[0] / t
+    return speedup, speedup / p, karp_flatt(speedup, p)
+
+
+def _get_timer(summary, timer):
+    df = summary[summary['timer'] == timer]
+    if len(df) == 0:
+        raise RuntimeError("Data '" + timer + "' not in data set.")
+    return df
+
+
+# Relative to the smallest number of nodes of each series,
+# series with a single node count are dropped.
+def _add_reference(df, keys):
+    df = df.sort_values(keys + ['nodes'])
+    grouped = df.groupby(keys, observed=True)
+    df = df.assign(ref_nodes=grouped['nodes'].transform('first'),
+                   ref_mean=grouped['mean'].transform('first'),
+                   npoints=grouped['nodes'].transform('size'))
+    return df[df['npoints'] > 1].drop(columns='npoints')
+
+
+def strong_scaling(summary, timer):
+    keys = series_columns + ['grid']
+    df = _add_reference(_get_timer(summary, timer), keys)
+
+    p = (df['nodes'] / df['ref_nodes']).to_numpy(dtype=np.float64)
+    speedup = (df['ref_mean'] / df['mean']).to_numpy(dtype=np.float64)
+
+    df = df.assign(p=p,
+                   speedup=speedup,
+                   efficiency=speedup / p,
+                   serial_fraction=karp_flatt(speedup, p))
+
+    return df[keys + ['nx', 'ny', 'nz', 'nodes', 'mean', 'p',
+                      'speedup', 'efficiency', 'serial_fraction']].reset_index(drop=True)
+
+
+def weak_scaling(summary, timer):
+    df = _get_timer(summary, timer)
+    df = df.assign(work=df['nx'] * df['ny'] * df['nz'] // df['nodes'])
+
+    keys = series_columns + ['work']
+    df = _add_reference(df, keys)
+
+    df = df.assign(p=df['nodes'] / df['ref_nodes'],
+                   efficiency=df['ref_mean'] / df['mean'])
+
+    return df[keys + ['grid', 'nodes', 'mean', 'p', 'efficiency']].reset_index(drop=True)
+
+
+# Communication layer with the highest efficiency at the largest number of
+# nodes measured by all communication layers of a series.
+def rank_comms(table, series):
+    keys = [c for c in series_columns if not c == 'comm'] + [series]
+
+    last = table.groupby(keys + ['comm'], observed=True)['nodes'].max()
+    last = last.groupby(keys, observed=True).min().rename('last_nodes').reset_index()
+
+    df = table.merge(last, on=keys)
+    df = df[df['nodes'] == df['last_nodes']].reset_index(drop=True)
+
+    ncomms = df.groupby(keys, observed=True)['comm'].transform('size')
+    df = df[ncomms > 1]
+
+    best = df.loc[df.groupby(keys, observed=True)['efficiency'].idxmax()]
+    return best[keys + ['nodes', 'comm', 'efficiency']].reset_index(drop=True)
+
+
+# :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+
+def plot_efficiency(strong, weak, fname, args):
+    titles = aggregate.comm_titles
+    cmap = plt.get_cmap(args.colour_map)
+
+    fig, axs = plt.subplots(nrows=1, ncols=3, sharex=True, figsize=(13.5, 4.25), dpi=400)
+
+    panels = [
+        (axs[0], strong, 'grid', 'efficiency', 'strong parallel efficiency'),
+        (axs[1], weak, 'work', 'efficiency', 'weak parallel efficiency'),
+        (axs[2], strong, 'grid', 'serial_fraction', 'Karp-Flatt serial fraction')
+    ]
+
+    for ax, table, series, column, ylabel in panels:
+        ax.grid(which='both', linestyle='dashed', linewidth=0.25)
+
+        values = sorted(table[series].unique(), key=lambda v: table[table[series] == v]['nodes'].min())
+        if len(values) > len(args.markers):
+            raise RuntimeError('Not enough markers. ' + \
+                'Please add more to the command line with --markers')
+
+        for i, comm in enumerate(aggregate.comms):
+            for j, value in enumerate(values):
+                data = table[(table['comm'] == comm) & (table[series] == value)]
+                data = data.dropna(subset=[column])
+                if len(data) == 0:
+                    continue
+
+                label = None
+                if j == 0:
+                    label = titles[comm]
+
+                ax.plot(data['nodes'],
+                        data[column],
+                        color=cmap(i),
+                        linewidth=1,
+                        marker=args.markers[j],
+                        markersize=5,
+                        label=label)
+
+        if column == 'efficiency':
+            ax.axhline(y=1, linestyle='solid', color='black', linewidth=0.75)
+
+        ax.set_xscale('log', base=2)
+        ax.set_xlabel('number of nodes')
+        ax.set_ylabel(ylabel)
+
+    axs[0].legend(loc='lower left')
+
+    plt.tight_layout()
+    plt.savefig(fname, bbox_inches='tight')
+    plt.close()
+
+
+if __name__ == '__main__':
+    try:
+        parser = argparse.ArgumentParser(
+                description="Strong and weak parallel efficiency and Karp-Flatt serial fraction."
+        )
+
+        parser.add_argument(
+            "--store",
+            type=str,
+            default=timing_store.default_store,
+            help="Store written by timing_store.py. Default: '" + timing_store.default_store + "'",
+        )
+
+        parser.add_argument(
+            "--compiler-suites",
+            type=str,
+            nargs='+',
+            default=['cray', 'gnu'],
+            help="Compiler environment",
+        )
+
+        parser.add_argument(
+            "--test-case",
+            type=str,
+            default="random",
+            choices=['random', 'read-early', 'read-late'],
+            help="Test case to analyse.",
+        )
+
+        parser.add_argument(
+            "--timing",
+            type=str,
+            default='parcel merge (total)',
+            help="Timer data to analyse.",
+        )
+
+        parser.add_argument(
+            "--nruns",
+            type=int,
+            default=-1,
+            help="Number of runs to use. Default: -1 (use all available)"
+        )
+
+        parser.add_argument(
+            "--use-subcomm",
+            action='store_true',
+            help="Use sub-communicator data."
+        )
+
+        parser.add_argument(
+            "--colour-map",
+            type=str,
+            default='tab10',
+            help="Colour map for plotting."
+        )
+
+        parser.add_argument(
+            "--markers",
+            type=str,
+            nargs='+',
+            default=['o', 's', 'D', '^', 'v', 'P', 'X'],
+            help="Markers for line plot."
+        )
+
+        parser.add_argument(
+            "--enable-latex",
+            action='store_true',
+            help="Use LateX for plot labels."
+        )
+
+        parser.add_argument(
+            "--output-dir",
+            type=str,
+            default=".",
+            help="Table and figure save directory."
+        )
+
+        args = parser.parse_args()
+
+        plt.rcParams['font.family'] = 'sans'
+        plt.rcParams['font.size'] = 12
+        plt.rcParams['text.usetex'] = args.enable_latex
+
+        df = timing_store.load(args.store)
+        df = df[df['kind'] == 'timings']
+        directories = discover.get_directories(df, args.test_case, args.compiler_suites)
+        df = discover.select_runs(df, args.test_case, directories, args.use_subcomm)
+
+        if len(df) == 0:
+            raise RuntimeError("No benchmark data of '" + args.test_case + "' found.")
+
+        summary = aggregate.summarise(df, timers=[args.timing], nruns=args.nruns, quantiles=[])
+        strong = strong_scaling(summary, args.timing)
+        weak = weak_scaling(summary, args.timing)
+
+        if not os.path.exists(args.output_dir):
+            os.makedirs(args.output_dir)
+
+        tf = args.timing.replace(' ', '-')
+        for c in ['(', ')']:
+            tf = tf.replace(c, '')
+
+        tag = args.test_case
+        if args.use_subcomm:
+            tag = tag + '-subcomm'
+
+        for name, table in [('strong', strong), ('weak', weak)]:
+            fname = os.path.join(args.output_dir, tag + '-' + tf + '-' + name + '-efficiency.csv')
+            table.to_csv(fname, index=False)
+            print("Wrote", len(table), "rows to '" + fname + "'.")
+
+        for (machine, compiler), data in strong.groupby(['machine', 'compiler'], observed=True):
+            sel = (weak['machine'] == machine) & (weak['compiler'] == compiler)
+            fname = os.path.join(args.output_dir, machine + '-' + compiler + '-' + tag + \
+                                 '-' + tf + '-efficiency.pdf')
+            plot_efficiency(data, weak[sel], fname, args)
+            print("Created '" + fname + "'.")
+
+        columns = ['machine', 'compiler']
+        print()
+        print("Highest strong efficiency at the largest number of nodes:")
+        print(rank_comms(strong, 'grid')[columns + ['grid', 'nodes', 'comm', 'efficiency']].to_string(index=False))
+        print()
+        print("Highest weak efficiency at the largest number of nodes:")
+        print(rank_comms(weak, 'work')[columns + ['work', 'nodes', 'comm', 'efficiency']].to_string(index=False))
+
+    except Exception as ex:
+        print(ex, flush=True)
@@ -0,0 +1,357 @@
+import pandas as pd
+import numpy as np
+import os
+import re
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import timing_store
+import aggregate
+
+#
+# Parser of the SLURM output (*.o<jobid>) of the benchmarks. Every call of a
+# benchmark prints its settings, ending with the ASCII file name of its CSV
+# files, then the parcel counts of every merge step (the read benchmark also
+# prints the parcel file of the step) and finally the merge statistics of the
+# call. Each call appends one line (run) to its CSV files, hence the calls of
+# a CSV file are numbered in the order of the job ids.
+#
+# The logs are parsed line by line such that large logs are never held in
+# memory. The result are three tables:
+#   runs:  one row per call with the settings and the merge statistics,
+#   steps: one row per merge step with the parcel counts,
+#   logs:  one row per log with the loaded modules and the module changes
+#          (e.g. 'cce/15.0.0 => cce/16.0.1') of the job.
+#
+
+log_pattern = re.compile(r"(\w*)-(\w*)-(random|read)\.o(\d+)$")
+
+# Each line is split into a key and a value, either at the first colon
+# (e.g. 'Number of MPI ranks:  64') or at the last space (e.g. 'niter  100').
+
+# settings printed before the ASCII file name
+header_keys = {
+    'dirname':                  'dirname',
+    'basename':                 'basename',
+    'number of files':          'nfiles',
+    'niter':                    'niter',
+    'enabled subcommunicator':  'subcomm',
+    'comm-type':                'comm',
+    'comm type':                'comm'
+}
+
+fname_key = 'ASCII file name'
+
+read_key = 'Read'
+
+step_keys = {
+    'Number of parcels before merging': 'before',
+    'Fraction of small parcels':        'small',
+    'Number of parcels after merging':  'after',
+    'Fraction of merged parcels':       'merged'
+}
+
+summary_keys = {
+    'Number of MPI ranks':          'ranks',
+    'Total number of merges':       'merges',
+    'Number of close big parcels':  'close_big'
+}
+
+nway_pattern = re.compile(r"Number of (\d+)-way mergers")
+
+# printed before the first call, e.g. '  2) cce/15.0.0 => cce/16.0.1'
+module_pattern = re.compile(r"^\s*\d+\)\s+(\S+?)(?:\(default\))?(?:\s+=>\s+(\S+))?\s*$")
+
+loaded_pattern = re.compile(r"^Currently Loaded Module")
+
+switch_patterns = [
+    re.compile(r"^Switching to (\S+)\.$"),
+    re.compile(r"^Lmod is automatically replacing \"(\S+)\" with \"(\S+)\""),
+]
+
+
+def parse_fname(fname):
+    m = re.match(log_pattern, fname)
+    if m is None:
+        return None
+    return {
+        'machine':  m.group(1),
+        'compiler': m.group(2),
+        'jobid':    int(m.group(4))
+    }
+
+
+def find_logs(root, subdirs=['.']):
+    found = []
+    for subdir in subdirs:
+        path = os.path.join(root, subdir)
+        if not os.path.exists(path):
+            raise RuntimeError("Path '" + path + "' does not exist. Exiting.")
+
+        for dirpath, dirnames, fnames in os.walk(path):
+            directory = os.path.normpath(os.path.relpath(dirpath, root))
+            for fname in fnames:
+                meta = parse_fname(fname)
+                if not meta is None:
+                    found.append((directory, fname, meta))
+
+    found.sort(key=lambda f: (f[0], f[2]['jobid']))
+    return found
+
+
+def _to_value(key, value):
+    if key == 'subcomm':
+        return value == 'T'
+    if key in ['small', 'merged']:
+        return float(value.rstrip('%'))
+    if key in ['dirname', 'basename', 'comm']:
+        return value
+    return int(value)
+
+
+def split_line(line):
+    if ':' in line:
+        key, value = line.split(':', 1)
+    else:
+        parts = line.rsplit(None, 1)
+        if len(parts) < 2:
+            return None, None
+        key, value = parts
+    return ' '.join(key.split()), value.strip()
+
+
+def parse_log(fname):
+    runs = []
+    steps = []
+
+    header = {}
+    run = None
+    path = None
+    step = {}
+
+    loaded = []
+    swaps = []
+    in_list = False
+
+    with open(fname, errors='replace') as lines:
+        for line in lines:
+            if run is None and len(header) == 0:
+                if not re.match(loaded_pattern, line) is None:
+                    in_list = True
+                    continue
+
+                m = re.match(module_pattern, line)
+                if not m is None:
+                    if not m.group(2) is None:
+                        swaps.append(m.group(1) + ' => ' + m.group(2))
+                    elif in_list:
+                        loaded.append(m.group(1))
+                    continue
+
+                for pat in switch_patterns:
+                    m = re.match(pat, line)
+                    if not m is None:
+                        swaps.append(' => '.join(m.groups()))
+
+            key, value = split_line(line)
+            if key is None:
+                continue
+
+            if key in step_keys.keys():
+                if run is None:
+                    continue
+                field = step_keys[key]
+                step[field] = _to_value(field, value)
+                if len(step) == len(step_keys):
+                    step['call'] = run['call']
+                    step['step'] = run.get('nsteps', 0)
+                    step['file'] = path
+                    run['nsteps'] = step['step'] + 1
+                    steps.append(step)
+                    step = {}
+            elif key == read_key:
+                path = value
+            elif key == fname_key:
+                run = dict(header)
+                run['ascii'] = value
+                run['call'] = len(runs)
+                runs.append(run)
+                header = {}
+                path = None
+            elif key in header_keys.keys():
+                field = header_keys[key]
+                header[field] = _to_value(field, value)
+            elif run is None:
+                continue
+            elif key in summary_keys.keys():
+                field = summary_keys[key]
+                run[field] = _to_value(field, value)
+            else:
+                m = re.match(nway_pattern, key)
+                if not m is None:
+                    run['merges_' + m.group(1) + '_way'] = int(value)
+
+    modules = {
+        'modules': ' '.join(sorted(loaded)),
+        'swaps':   '; '.join(swaps)
+    }
+
+    return runs, steps, modules
+
+
+def read_log(root, directory, fname, meta):
+    runs, steps, modules = parse_log(os.path.join(root, directory, fname))
+
+    runs = pd.DataFrame(runs)
+    steps = pd.DataFrame(steps)
+    log = pd.DataFrame([dict(meta, **modules)])
+    for df in [runs, steps, log]:
+        df.insert(0, 'log', fname)
+        if not 'jobid' in df.columns:
+            df.insert(0, 'jobid', meta['jobid'])
+        df.insert(0, 'directory', directory)
+    return runs, steps, log
+
+
+# Returns the runs, steps and logs of all logs. The runs are numbered per
+# directory and CSV file in the order of the job ids and calls.
+def ingest(root, subdirs=['.'], nthreads=timing_store.default_nthreads):
+    logs = find_logs(root, subdirs)
+    if logs == []:
+        raise RuntimeError("No job logs found.")
+
+    with ThreadPoolExecutor(max_workers=nthreads) as executor:
+        results = list(executor.map(lambda f: read_log(root, *f), logs))
+
+    runs = pd.concat([r for r, s, l in results if len(r) > 0], ignore_index=True)
+    steps = pd.concat([s for r, s, l in results if len(s) > 0], ignore_index=True)
+    logs = pd.concat([l for r, s, l in results], ignore_index=True)
+
+    runs = runs.sort_values(['directory', 'jobid', 'call'])
+    runs['run'] = runs.groupby(['directory', 'ascii']).cumcount()
+    runs['fname'] = runs['ascii'] + '-timings.csv'
+
+    # parcels removed by merging
+    steps['removed'] = steps['before'] - steps['after']
+
+    keys = ['directory', 'jobid', 'call']
+    steps = steps.merge(runs[keys + ['ascii', 'run']], on=keys)
+    return runs.reset_index(drop=True), steps, logs
+
+
+# Number of runs found in the logs and in the store of each CSV file.
+def check_runs(runs, df):
+    logged = runs.groupby(['directory', 'fname']).size().rename('logged')
+    stored = df[df['kind'] == 'timings'].groupby(['directory', 'fname'], observed=True).size()
+    stored.index = stored.index.set_levels([l.astype(str) for l in stored.index.levels])
+    counts = pd.concat([logged, stored.rename('stored')], axis=1, join='inner')
+    return counts.reset_index()
+
+
+# Runs of the timing store joined with the given columns of their calls in
+# the logs. Some CSV files hold fewer runs than their logs (e.g. the CSV file
+# was restarted) or more (e.g. a log was removed). As runs are appended, the
+# last run of a CSV file is the last call in the logs, i.e. the runs are
+# matched counting from the end.
+def match_runs(runs, df, columns):
+    timings = df[df['kind'] == 'timings'].copy()
+    for c in ['directory', 'fname']:
+        timings[c] = timings[c].astype(str)
+
+    keys = ['directory', 'fname']
+    stored = timings.groupby(keys)['run'].transform('size')
+    logged = runs.groupby(keys)['run'].transform('size')
+
+    runs = runs.assign(last=logged - 1 - runs['run'])
+    timings['last'] = stored - 1 - timings['run']
+
+    df = timings.merge(runs[keys + ['last'] + columns], on=keys + ['last'])
+    return df.drop(columns=['last'])
+
+
+# Parcels merged per second per core of every run:
+#   merges / (time of the parcel merge * number of ranks)
+def throughput(runs, df, timer='parcel merge (total)'):
+    df = match_runs(runs, df, ['ranks', 'merges'])
+    df = df[[c for c in aggregate.group_columns if not c in ['kind']] + \
+            ['fname', 'run', timer, 'ranks', 'merges']]
+    df['throughput'] = df['merges'] / (df[timer] * df['ranks'])
+    return df
+
+
+if __name__ == '__main__':
+    try:
+        parser = argparse.ArgumentParser(
+                description="Parse the SLURM output of the benchmarks and compute " + \
+                            "the number of parcels merged per second and core."
+        )
+
+        parser.add_argument(
+            "--path",
+            type=str,
+            default='.',
+            help="Data directory.",
+        )
+
+        parser.add_argument(
+            "--subdirs",
+            type=str,
+            nargs='+',
+            default=['read-early', 'read-late', 'hotlum'],
+            help="Sub-directories of the data directory to search for logs.",
+        )
+
+        parser.add_argument(
+            "--store",
+            type=str,
+            default=timing_store.default_store,
+            help="Store written by timing_store.py. Default: '" + timing_store.default_store + "'",
+        )
+
+        parser.add_argument(
+            "--nthreads",
+            type=int,
+            default=timing_store.default_nthreads,
+            help="Number of threads reading the logs. Default: " + str(timing_store.default_nthreads),
+        )
+
+        parser.add_argument(
+            "--output-dir",
+            type=str,
+            default=".",
+            help="Output directory of the tables."
+        )
+
+        args = parser.parse_args()
+
+        runs, steps, logs = ingest(args.path, args.subdirs, args.nthreads)
+
+        if not os.path.exists(args.output_dir):
+            os.makedirs(args.output_dir)
+
+        for name, table in [('runs', runs), ('steps', steps), ('logs', logs)]:
+            fname = os.path.join(args.output_dir, 'log-' + name + '.csv')
+            table.to_csv(fname, index=False)
+            print("Wrote", len(table), "rows to '" + fname + "'.")
+
+        df = timing_store.load(args.store)
+
+        counts = check_runs(runs, df)
+        mismatch = counts[counts['logged'] != counts['stored']]
+        if len(mismatch) > 0:
+            print("The number of runs in the logs and in the store differ for " + \
+                  "(the runs are matched from the last run):")
+            print(mismatch.to_string(index=False))
+
+        result = throughput(runs, df)
+        fname = os.path.join(args.output_dir, 'throughput.csv')
+        result.to_csv(fname, index=False)
+        print("Wrote", len(result), "rows to '" + fname + "'.")
+
+        keys = ['machine', 'compiler', 'comm', 'test_case', 'grid', 'subcomm']
+        table = result.groupby(keys + ['nodes'], observed=True)['throughput'].mean().unstack('nodes')
+        print()
+        print("Mean number of parcels merged per second and core:")
+        print(table.to_string(float_format=lambda v: format(v, '.4g')))
+
+    except Exception as ex:
+        print(ex, flush=True)
@@ -0,0 +1,331 @@
+import pandas as pd
+import numpy as np
+import os
+import matplotlib.pyplot as plt
+import argparse
+import timing_store
+import aggregate
+import discover
+import job_log
+
+#
+# Comparison of all machines of a test case in one long-format table with one
+# row per configuration (see aggregate.py). The machines differ in the number
+# of cores per node (e.g. 128 on ARCHER2, 36 on Cirrus), hence the runs are
+# compared by the number of cores
+#
+#       cores = nodes * tasks per node (of the submission scripts, see discover.py)
+#
+# instead of the number of nodes. As the test cases do not run the same number
+# of merge steps on all machines, the run time of the timer is divided by its
+# number of calls (steps). The table holds
+#   time_per_step:   mean run time per step (s), i.e. the time-to-solution,
+#   core_seconds:    time_per_step * cores,
+#   cells_per_core:  nx * ny * nz / cores,
+#   cell_throughput: cells updated per second and core, i.e.
+#                    nx * ny * nz / core_seconds,
+# and with the job logs (see job_log.py)
+#   parcels:          mean number of parcels before merging,
+#   parcels_per_core: parcels / cores,
+#   merges:           mean number of merges of a run,
+#   merge_throughput: mean number of parcels merged per second and core of
+#                     the runs (see job_log.throughput).
+#
+
+config_columns = [c for c in aggregate.group_columns if not c in ['kind', 'directory']]
+
+
+# Mean number of parcels before merging of every run of the job logs.
+def get_parcels(runs, steps):
+    keys = ['directory', 'log', 'call']
+    parcels = steps.groupby(keys)['before'].mean().rename('parcels').reset_index()
+    return runs.merge(parcels, on=keys, how='left')
+
+
+# One row per configuration of the runs of kind 'timings' and 'ncalls' of the
+# timer. The parcels and merges are added if the runs of the job logs are given.
+def compare(df, ntasks_per_node, timer='parcel merge (total)', nruns=-1, runs=None):
+    for machine in df['machine'].astype(str).unique():
+        if not machine in ntasks_per_node.keys():
+            raise RuntimeError("No submission script found for " + machine + ".")
+
+    summaries = []
+    for kind, name in [('timings', 'time'), ('ncalls', 'nsteps')]:
+        summary = aggregate.summarise(df[df['kind'] == kind], timers=[timer],
+                                      nruns=nruns, quantiles=[])
+        summary = summary.groupby(config_columns, observed=True)['mean'].mean()
+        summaries.append(summary.rename(name))
+
+    table = pd.concat(summaries, axis=1, join='inner').reset_index()
+    if len(table) == 0:
+        raise RuntimeError("No data of '" + timer + "' found.")
+
+    for c in ['machine', 'compiler', 'comm', 'test_case', 'grid']:
+        table[c] = table[c].astype(str)
+
+    cells = table['nx'] * table['ny'] * table['nz']
+    table['ntasks_per_node'] = table['machine'].map(ntasks_per_node).astype(np.int64)
+    table['cores'] = table['nodes'] * table['ntasks_per_node']
+    table['time_per_step'] = table['time'] / table['nsteps']
+    table['core_seconds'] = table['time_per_step'] * table['cores']
+    table['cells_per_core'] = cells / table['cores']
+    table['cell_throughput'] = cells / table['core_seconds']
+
+    if not runs is None:
+        timings = aggregate.trim_runs(df[df['kind'] == 'timings'], nruns)
+        keys = ['directory', 'fname', 'run']
+        parcels = job_log.match_runs(runs, timings, ['parcels'])[keys + ['parcels']]
+        logged = job_log.throughput(runs, timings, timer).merge(parcels, on=keys)
+        logged = logged.groupby(config_columns, observed=True)
+        logged = logged[['parcels', 'merges', 'throughput']].mean().reset_index()
+        logged = logged.rename(columns={'throughput': 'merge_throughput'})
+        for c in ['machine', 'compiler', 'comm', 'test_case', 'grid']:
+            logged[c] = logged[c].astype(str)
+        table = table.merge(logged, on=config_columns, how='left')
+        table['parcels_per_core'] = table['parcels'] / table['cores']
+
+    return table.sort_values(['comm', 'machine', 'compiler', 'nx', 'ny', 'nz', 'nodes']).reset_index(drop=True)
+
+
+# Median and best per-core throughput and the shortest time per step of every
+# machine and compiler per communication layer, best machine first.
+def rank(table, throughput='cell_throughput'):
+    keys = ['comm', 'machine', 'compiler']
+    ranking = table.groupby(keys).agg(configs=('cores', 'size'),
+                                      median_throughput=(throughput, 'median'),
+                                      best_throughput=(throughput, 'max'),
+                                      best_time_per_step=('time_per_step', 'min'))
+    ranking = ranking.reset_index()
+    return ranking.sort_values(['comm', 'median_throughput'], ascending=[True, False])
+
+
+# Time per step and per-core throughput against the number of cores, one row
+# of panels per communication layer. The colour marks the machine and compiler,
+# the marker the grid (in order of the number of cells of the machine).
+def plot_comparison(table, fname, throughput, args):
+    titles = aggregate.comm_titles
+    cmap = plt.get_cmap(args.colour_map)
+
+    layers = [c for c in aggregate.comms if c in table['comm'].unique()]
+    series = table[['machine', 'compiler']].drop_duplicates().sort_values(['machine', 'compiler'])
+    series = list(series.itertuples(index=False, name=None))
+
+    ylabels = {
+        'cell_throughput':   'cells per second and core',
+        'merge_throughput':  'parcels merged per second and core'
+    }
+
+    fig, axs = plt.subplots(nrows=len(layers), ncols=2, sharex=True, squeeze=False,
+                            figsize=(9, 3.5*len(layers)), dpi=400)
+
+    for i, comm in enumerate(layers):
+        for k, (machine, compiler) in enumerate(series):
+            data = table[(table['comm'] == comm) &
+                         (table['machine'] == machine) &
+                         (table['compiler'] == compiler)]
+
+            grids = data[['grid', 'nx', 'ny', 'nz']].drop_duplicates()
+            grids = grids.assign(cells=grids['nx'] * grids['ny'] * grids['nz'])
+            grids = list(grids.sort_values(['cells', 'nx', 'ny'])['grid'])
+            if len(grids) > len(args.markers):
+                raise RuntimeError('Not enough markers. ' + \
+                    'Please add more to the command line with --markers')
+
+            for j, grid in enumerate(grids):
+                d = data[data['grid'] == grid].sort_values('cores')
+
+                label = None
+                if j == 0:
+                    label = machine + ' (' + compiler + ', ' + \
+                            str(d['ntasks_per_node'].iloc[0]) + ' cores/node)'
+
+                for ax, column in zip(axs[i], ['time_per_step', throughput]):
+                    ax.plot(d['cores'],
+                            d[column],
+                            color=cmap(k),
+                            marker=args.markers[j],
+                            markersize=5,
+                            linewidth=1,
+                            label=label)
+
+        axs[i, 0].set_ylabel('time per step (s)')
+        axs[i, 1].set_ylabel(ylabels[throughput])
+        for ax in axs[i]:
+            ax.set_title(titles[comm])
+            ax.set_xscale('log', base=2)
+            ax.set_yscale('log', base=10)
+            ax.grid(which='both', linestyle='dashed', linewidth=0.25)
+
+    for ax in axs[-1]:
+        ax.set_xlabel('number of cores')
+
+    handles, labels = axs[0, 0].get_legend_handles_labels()
+    fig.legend(handles, labels, loc='upper center', ncols=min(len(series), 3),
+               bbox_to_anchor=(0.5, 1.04))
+
+    plt.tight_layout()
+    plt.savefig(fname, bbox_inches='tight')
+    plt.close()
+
+
+if __name__ == '__main__':
+    try:
+        parser = argparse.ArgumentParser(
+                description="Compare all machines by the number of cores: time-to-solution " + \
+                            "and per-core throughput."
+        )
+
+        parser.add_argument(
+            "--store",
+            type=str,
+            default=timing_store.default_store,
+            help="Store written by timing_store.py. Default: '" + timing_store.default_store + "'",
+        )
+
+        parser.add_argument(
+            "--path",
+            type=str,
+            default='.',
+            help="Data directory (submission scripts and job logs).",
+        )
+
+        parser.add_argument(
+            "--compiler-suites",
+            type=str,
+            nargs='+',
+            default=['cray', 'gnu'],
+            help="Compiler environment",
+        )
+
+        parser.add_argument(
+            "--test-case",
+            type=str,
+            default="random",
+            choices=['random', 'read-early', 'read-late'],
+            help="Test case to analyse.",
+        )
+
+        parser.add_argument(
+            "--timing",
+            type=str,
+            default='parcel merge (total)',
+            help="Timer data to analyse.",
+        )
+
+        parser.add_argument(
+            "--nruns",
+            type=int,
+            default=-1,
+            help="Number of runs to use. Default: -1 (use all available)"
+        )
+
+        parser.add_argument(
+            "--use-subcomm",
+            action='store_true',
+            help="Use sub-communicator data."
+        )
+
+        parser.add_argument(
+            "--parcels",
+            action='store_true',
+            help="Add the parcels and merges of the job logs (see job_log.py) and compare " + \
+                 "the number of parcels merged per second and core."
+        )
+
+        parser.add_argument(
+            "--subdirs",
+            type=str,
+            nargs='+',
+            default=['random', 'read-early', 'read-late', 'hotlum'],
+            help="Sub-directories of the data directory to search for logs.",
+        )
+
+        parser.add_argument(
+            "--nthreads",
+            type=int,
+            default=timing_store.default_nthreads,
+            help="Number of threads reading the logs. Default: " + str(timing_store.default_nthreads),
+        )
+
+        parser.add_argument(
+            "--colour-map",
+            type=str,
+            default='tab10',
+            help="Colour map for plotting."
+        )
+
+        parser.add_argument(
+            "--markers",
+            type=str,
+            nargs='+',
+            default=['o', 's', 'D', '^', 'v', 'P', 'X'],
+            help="Markers for line plot."
+        )
+
+        parser.add_argument(
+            "--enable-latex",
+            action='store_true',
+            help="Use LateX for plot labels."
+        )
+
+        parser.add_argument(
+            "--output-dir",
+            type=str,
+            default=".",
+            help="Table and figure save directory."
+        )
+
+        args = parser.parse_args()
+
+        plt.rcParams['font.family'] = 'sans'
+        plt.rcParams['font.size'] = 12
+        plt.rcParams['text.usetex'] = args.enable_latex
+
+        store = timing_store.load(args.store)
+        directories = discover.get_directories(store, args.test_case, args.compiler_suites)
+        df = discover.select_runs(store, args.test_case, directories, args.use_subcomm)
+
+        if len(df) == 0:
+            raise RuntimeError("No benchmark data of '" + args.test_case + "' found.")
+
+        # The job logs are matched to the runs by their own directory (see
+        # job_log.match_runs), the configurations are grouped without it.
+        df = store.loc[df.index]
+
+        index, _ = discover.update(args.path, ['.'], nthreads=args.nthreads)
+        ntasks_per_node = discover.get_ntasks_per_node(index)
+
+        runs = None
+        throughput = 'cell_throughput'
+        if args.parcels:
+            runs, steps, _ = job_log.ingest(args.path, args.subdirs, args.nthreads)
+            runs = get_parcels(runs, steps)
+            throughput = 'merge_throughput'
+
+        table = compare(df, ntasks_per_node, args.timing, args.nruns, runs)
+
+        if args.parcels and table['parcels'].isna().any():
+            print("No parcel counts found for", table['parcels'].isna().sum(), "configuration(s).")
+
+        if not os.path.exists(args.output_dir):
+            os.makedirs(args.output_dir)
+
+        tag = args.test_case
+        if args.use_subcomm:
+            tag = tag + '-subcomm'
+
+        fname = os.path.join(args.output_dir, tag + '-machine-comparison.csv')
+        table.to_csv(fname, index=False)
+        print("Wrote", len(table), "rows to '" + fname + "'.")
+
+        fname = os.path.join(args.output_dir, tag + '-machine-comparison.pdf')
+        plot_comparison(table, fname, throughput, args)
+        print("Created '" + fname + "'.")
+
+        pd.set_option('display.width', 200)
+        print()
+        print("Per-core throughput (" + throughput + ") and time per step (s):")
+        print(rank(table, throughput).to_string(index=False))
+
+    except Exception as ex:
+        print(ex, flush=True)
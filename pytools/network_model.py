@@ -0,0 +1,219 @@
+import pandas as pd
+import numpy as np
+import argparse
+from scipy.optimize import nnls
+import osu
+
+#
+# Hockney model of the OSU Micro-Benchmarks per machine, locality (intra- or
+# inter-node) and test: the time of a message of m bytes is
+#
+#       t(m) = alpha + beta * m
+#
+# with the latency alpha (us) and the inverse bandwidth beta (us/B), i.e. the
+# bandwidth 1/beta (MB/s). The latency tests measure t(m) directly, the
+# bandwidth tests the time per message m / bw(m) of a stream of messages, where
+# alpha is the gap between messages (g in LogGP) and 1/beta the bandwidth of
+# large messages (1/G).
+#
+# The switch from the eager to the rendezvous protocol shows as a second line
+# with a larger latency. Hence the data is also fitted by two lines split at
+# every message size. The split with the smallest error is used if it reduces
+# the error by at least 'min_gain'; the crossover is then the smallest message
+# size of the second line. Both fits are non-negative least squares of the
+# relative error.
+#
+
+default_min_gain = 4.0
+
+# minimum number of message sizes of a line
+min_points = 3
+
+columns = ['machine', 'network', 'locality', 'test', 'kind', 'npoints', 'alpha', 'beta',
+           'bandwidth', 'crossover', 'alpha_large', 'beta_large', 'bandwidth_large', 'rms']
+
+# tests of the summary: (latency test, bandwidth test)
+summary_tests = {
+    'MPI P2P':          ('osu_latency', 'osu_bw'),
+    'MPI-3 RMA put':    ('osu_put_latency_flush', 'osu_put_bw_flush'),
+    'MPI-3 RMA get':    ('osu_get_latency_flush', 'osu_get_bw_flush'),
+    'OpenSHMEM put':    ('osu_oshm_put', 'osu_oshm_put_bw'),
+    'OpenSHMEM get':    ('osu_oshm_get', 'osu_oshm_get_bw')
+}
+
+
+# Returns alpha, beta and the sum of the squared relative errors.
+def fit_line(sizes, times):
+    w = 1.0 / times
+    (alpha, beta), _ = nnls(np.column_stack([w, w * sizes]), np.ones(len(sizes)))
+    residual = (alpha + beta * sizes - times) / times
+    return alpha, beta, np.sum(residual ** 2)
+
+
+def get_bandwidth(beta):
+    if beta > 0.0:
+        return 1.0 / beta
+    return np.inf
+
+
+# Fit of one curve: a dictionary of the parameters (see columns).
+def fit(sizes, times, min_gain=default_min_gain):
+    order = np.argsort(sizes)
+    sizes = sizes[order]
+    times = times[order]
+    n = len(sizes)
+
+    if n < 2:
+        raise RuntimeError("At least 2 message sizes are required.")
+
+    alpha, beta, error = fit_line(sizes, times)
+    result = {'npoints': n, 'alpha': alpha, 'beta': beta, 'bandwidth': get_bandwidth(beta),
+              'crossover': np.nan, 'alpha_large': np.nan, 'beta_large': np.nan,
+              'bandwidth_large': np.nan, 'rms': np.sqrt(error / n)}
+
+    best = None
+    for k in range(min_points, n - min_points + 1):
+        small = fit_line(sizes[:k], times[:k])
+        large = fit_line(sizes[k:], times[k:])
+        if best is None or small[2] + large[2] < best[1][2] + best[2][2]:
+            best = (k, small, large)
+
+    if not best is None and (best[1][2] + best[2][2]) * min_gain < error:
+        k, small, large = best
+        result.update({'alpha': small[0], 'beta': small[1], 'bandwidth': get_bandwidth(small[1]),
+                       'crossover': sizes[k], 'alpha_large': large[0], 'beta_large': large[1],
+                       'bandwidth_large': get_bandwidth(large[1]),
+                       'rms': np.sqrt((small[2] + large[2]) / n)})
+    return result
+
+
+# Parameters of all tests of the OSU entries (see osu.load_entries) without
+# the missing entries.
+def fit_all(entries, machines=None, tests=None, min_gain=default_min_gain):
+    rows = []
+    for row in entries[~entries['missing']].itertuples():
+        if not machines is None and not row.machine in machines:
+            continue
+        if not tests is None and not row.test in tests:
+            continue
+
+        result = {'machine':  row.machine,
+                  'network':  osu.networks.get(row.machine),
+                  'locality': row.locality,
+                  'test':     row.test}
+
+        if len(row.sizes) == 0:
+            # no message size, e.g. osu_oshm_barrier
+            result.update({'kind': 'scalar', 'npoints': len(row.values),
+                           'alpha': np.mean(row.values)})
+        else:
+            # time (us) per message of the bandwidth (MB/s = B/us) tests
+            sel = row.sizes > 0
+            sizes = row.sizes[sel]
+            times = row.values[sel]
+            result['kind'] = 'latency'
+            if '_bw' in row.test:
+                result['kind'] = 'bandwidth'
+                times = sizes / times
+            result.update(fit(sizes, times, min_gain))
+        rows.append(result)
+
+    if rows == []:
+        raise RuntimeError("No OSU data to fit.")
+
+    return pd.DataFrame(rows, columns=columns)
+
+
+# Latency of the latency test and bandwidth of large messages of the bandwidth
+# test per machine and locality, and the ratio of inter- to intra-node.
+def summarise(params):
+    rows = []
+    for operation, (lat_test, bw_test) in summary_tests.items():
+        lat = params[params['test'] == lat_test]
+        bw = params[params['test'] == bw_test]
+        for machine in lat['machine'].unique():
+            row = {'operation': operation, 'machine': machine}
+            for locality in ['intra', 'inter']:
+                l = lat[(lat['machine'] == machine) & (lat['locality'] == locality)]
+                b = bw[(bw['machine'] == machine) & (bw['locality'] == locality)]
+                row[locality + '_latency'] = l['alpha'].iloc[0] if len(l) > 0 else np.nan
+                row[locality + '_crossover'] = l['crossover'].iloc[0] if len(l) > 0 else np.nan
+                bandwidth = np.nan
+                if len(b) > 0:
+                    bandwidth = b['bandwidth_large'].iloc[0]
+                    if np.isnan(bandwidth):
+                        bandwidth = b['bandwidth'].iloc[0]
+                row[locality + '_bandwidth'] = bandwidth
+            row['latency_ratio'] = row['inter_latency'] / row['intra_latency']
+            row['bandwidth_ratio'] = row['inter_bandwidth'] / row['intra_bandwidth']
+            rows.append(row)
+    return pd.DataFrame(rows)
+
+
+if __name__ == '__main__':
+    try:
+        parser = argparse.ArgumentParser(
+                description="Fit latency and bandwidth to the OSU Micro-Benchmarks " + \
+                            "per machine and locality."
+        )
+
+        parser.add_argument(
+            "--osu-dir",
+            type=str,
+            default='osu',
+            help="Directory of the OSU Micro-Benchmark runs.",
+        )
+
+        parser.add_argument(
+            "--osu-store",
+            type=str,
+            default=None,
+            help="Cache the parsed OSU data in this store (see osu.py). Default: parse all files"
+        )
+
+        parser.add_argument(
+            "--machines",
+            type=str,
+            nargs='+',
+            default=None,
+            help="Computing systems. Default: all",
+        )
+
+        parser.add_argument(
+            "--tests",
+            type=str,
+            nargs='+',
+            default=None,
+            help="OSU tests to fit. Default: all",
+        )
+
+        parser.add_argument(
+            "--min-gain",
+            type=float,
+            default=default_min_gain,
+            help="Minimum reduction of the error to split a curve at the eager/rendezvous " + \
+                 "crossover. Default: " + str(default_min_gain),
+        )
+
+        parser.add_argument(
+            "--output",
+            type=str,
+            default='network-model.csv',
+            help="Output CSV file."
+        )
+
+        args = parser.parse_args()
+
+        entries = osu.load_entries(args.osu_dir, args.osu_store)
+        params = fit_all(entries, args.machines, args.tests, args.min_gain)
+
+        params.to_csv(args.output, index=False)
+        print("Wrote", len(params), "rows to '" + args.output + "'.")
+
+        pd.set_option('display.width', 200)
+        print()
+        print("Latency (us), eager/rendezvous crossover (B) and bandwidth of large messages (MB/s):")
+        print(summarise(params).round(3).to_string(index=False))
+
+    except Exception as ex:
+        print(ex, flush=True)
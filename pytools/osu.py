@@ -0,0 +1,337 @@
+import pandas as pd
+import numpy as np
+import os
+import re
+import argparse
+import json
+import warnings
+import pyarrow as pa
+import pyarrow.feather as feather
+
+#
+# Reader of the OSU Micro-Benchmark results in osu/<machine>-osu-runs. Each file
+# <machine>-nodes-<1|2>-<test> holds the latency (us) or bandwidth (MB/s) per
+# message size (B), or a single latency for tests without message size (e.g.
+# osu_oshm_barrier). With 1 node both processes share a node (intra-node), with
+# 2 nodes they do not (inter-node).
+#
+# Every file is parsed once into an entry (one row per machine, node count and
+# test) with the header metadata (title, OSU version, datatype, unit) and the
+# curve as two arrays (message sizes and values; no sizes for scalar tests). A
+# file that cannot be parsed or holds no valid values is kept as an explicit
+# missing entry with the reason. The entries can be cached in a store (feather
+# file) with the size and modification time of every file (the manifest), as
+# in timing_store.py, such that only added or changed files are parsed again.
+#
+
+pattern = re.compile(r"(\w*)-nodes-(\d*)-(osu_\w*)$")
+
+title_pattern = re.compile(r"#\s*(OSU .*?)\s+v(\d[\w.]*)\s*$")
+
+datatype_pattern = re.compile(r"#\s*Datatype:\s*(\w+)")
+
+unit_pattern = re.compile(r"#.*\((\w+/?\w*)\)\s*$")
+
+localities = {
+    1: 'intra',
+    2: 'inter'
+}
+
+networks = {
+    'archer2': r'AMD Rome / SS10',
+    'hotlum':  r'AMD Milan / SS200',
+    'cirrus':  r'Intel Broadwell / IB'
+}
+
+entry_columns = ['machine', 'nodes', 'locality', 'test', 'title', 'version', 'datatype', 'unit',
+                 'missing', 'reason', 'sizes', 'values', 'directory', 'fname']
+
+default_store = 'osu.feather'
+
+
+def parse_fname(fname):
+    m = re.match(pattern, fname)
+    if m is None:
+        return None
+    return m.group(1), int(m.group(2)), m.group(3)
+
+
+# Title, version, datatype and unit of the comment lines of a file.
+def parse_header(lines):
+    header = {'title': None, 'version': None, 'datatype': None, 'unit': None}
+    for line in lines:
+        if not line.startswith('#'):
+            continue
+        m = re.match(title_pattern, line)
+        if not m is None:
+            header['title'] = m.group(1)
+            header['version'] = m.group(2)
+            continue
+        m = re.match(datatype_pattern, line)
+        if not m is None:
+            header['datatype'] = m.group(1)
+            continue
+        m = re.match(unit_pattern, line)
+        if not m is None:
+            header['unit'] = m.group(1)
+    return header
+
+
+def read_file(fname):
+    dset = np.loadtxt(fname=fname, comments='#', ndmin=2)
+    if dset.shape[1] == 1:
+        return np.full(len(dset), np.nan), dset[:, 0]
+    return dset[:, 0], dset[:, 1]
+
+
+# Returns the list of (directory, fname, meta) of all OSU files below dirname.
+def find_files(dirname):
+    if not os.path.exists(dirname):
+        raise RuntimeError("Path '" + dirname + "' does not exist. Exiting.")
+
+    files = []
+    for entry in sorted(os.listdir(dirname)):
+        directory = os.path.join(dirname, entry)
+        if not (os.path.isdir(directory) and entry.endswith('-osu-runs')):
+            continue
+
+        for fname in sorted(os.listdir(directory)):
+            meta = parse_fname(fname)
+            if not meta is None:
+                files.append((entry, fname, meta))
+    return files
+
+
+def read_entry(dirname, directory, fname, meta):
+    machine, nodes, test = meta
+    path = os.path.join(dirname, directory, fname)
+
+    entry = {'machine': machine, 'nodes': nodes, 'locality': localities.get(nodes), 'test': test,
+             'missing': False, 'reason': None, 'directory': directory, 'fname': fname}
+
+    with open(path) as f:
+        entry.update(parse_header(f.readlines()))
+
+    try:
+        # an empty file is reported as missing entry below
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', UserWarning)
+            sizes, values = read_file(path)
+    except ValueError as err:
+        sizes, values = [], []
+        entry['reason'] = 'unreadable (' + str(err) + ')'
+
+    if entry['reason'] is None and len(values) == 0:
+        entry['reason'] = 'no values'
+    elif entry['reason'] is None and not np.isfinite(values).all():
+        entry['reason'] = 'invalid values'
+
+    if not entry['reason'] is None:
+        entry['missing'] = True
+        sizes, values = [], []
+    elif np.isnan(sizes).all():
+        sizes = []
+
+    entry['sizes'] = np.asarray(sizes, dtype=np.float64)
+    entry['values'] = np.asarray(values, dtype=np.float64)
+    return entry
+
+
+def to_frame(entries):
+    df = pd.DataFrame(entries, columns=entry_columns)
+    df['nodes'] = df['nodes'].astype(np.int64)
+    df['missing'] = df['missing'].astype(bool)
+    return df.sort_values(['machine', 'nodes', 'test']).reset_index(drop=True)
+
+
+def get_manifest_key(directory, fname):
+    return os.path.join(directory, fname)
+
+
+# Returns the updated entries and manifest, and the number of added, changed,
+# removed and unchanged files. Only added or changed files are parsed.
+def update(dirname, df=None, manifest={}):
+    files = find_files(dirname)
+
+    current = {}
+    for directory, fname, meta in files:
+        st = os.stat(os.path.join(dirname, directory, fname))
+        current[get_manifest_key(directory, fname)] = [st.st_size, st.st_mtime_ns]
+
+    counts = {'added': 0, 'changed': 0, 'removed': 0, 'unchanged': 0}
+
+    old = {}
+    if not df is None:
+        for row in df.to_dict('records'):
+            old[get_manifest_key(row['directory'], row['fname'])] = row
+
+    entries = []
+    for directory, fname, meta in files:
+        key = get_manifest_key(directory, fname)
+        if not key in manifest.keys():
+            counts['added'] += 1
+        elif not manifest[key] == current[key] or not key in old.keys():
+            counts['changed'] += 1
+        else:
+            counts['unchanged'] += 1
+            entries.append(old[key])
+            continue
+        entries.append(read_entry(dirname, directory, fname, meta))
+
+    for key in manifest.keys():
+        if not key in current.keys():
+            counts['removed'] += 1
+
+    if entries == []:
+        raise RuntimeError("No OSU benchmark data found in '" + dirname + "'.")
+
+    return to_frame(entries), current, counts
+
+
+def save(df, fname, manifest={}):
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    metadata = dict(table.schema.metadata)
+    metadata[b'manifest'] = json.dumps(manifest).encode()
+    table = table.replace_schema_metadata(metadata)
+    feather.write_feather(table, fname, compression='uncompressed')
+
+
+# Returns the entries and the manifest of a store.
+def load_store(fname):
+    if not os.path.exists(fname):
+        raise RuntimeError("Store '" + fname + "' does not exist. " + \
+                           "Please run 'python pytools/osu.py' first.")
+    table = feather.read_table(fname)
+    manifest = {}
+    if not table.schema.metadata is None and b'manifest' in table.schema.metadata:
+        manifest = json.loads(table.schema.metadata[b'manifest'])
+    df = table.to_pandas()
+    for c in ['sizes', 'values']:
+        df[c] = [np.asarray(a, dtype=np.float64) for a in df[c]]
+    return df, manifest
+
+
+# Entries of all files below dirname. With a store, only added or changed files
+# are parsed and the store is written if anything changed.
+def load_entries(dirname, store=None):
+    df = None
+    manifest = {}
+    if not store is None and os.path.exists(store):
+        df, manifest = load_store(store)
+
+    df, manifest, counts = update(dirname, df, manifest)
+
+    if not store is None and counts['added'] + counts['changed'] + counts['removed'] > 0:
+        save(df, store, manifest)
+
+    return df
+
+
+def get_missing(df):
+    return df[df['missing']]
+
+
+# Long format with one row per machine, node count, test and message size
+# (without the missing entries). Scalar tests have no message size (NaN).
+def to_long(df, machines=None):
+    frames = []
+    for row in df[~df['missing']].itertuples():
+        if not machines is None and not row.machine in machines:
+            continue
+        sizes = row.sizes
+        if len(sizes) == 0:
+            sizes = np.full(len(row.values), np.nan)
+        frames.append(pd.DataFrame({'machine':  row.machine,
+                                    'nodes':    row.nodes,
+                                    'locality': row.locality,
+                                    'test':     row.test,
+                                    'size':     sizes,
+                                    'value':    row.values}))
+
+    if frames == []:
+        raise RuntimeError("No OSU benchmark data of the machines " + str(machines) + ".")
+
+    return pd.concat(frames, ignore_index=True)
+
+
+def load(dirname, machines=None, store=None):
+    return to_long(load_entries(dirname, store), machines)
+
+
+# Value of a test at the given message sizes, interpolated linearly in log-log
+# space and constant beyond the measured sizes.
+def interpolate(osu, machine, locality, test, sizes):
+    data = osu[(osu['machine'] == machine) &
+               (osu['locality'] == locality) &
+               (osu['test'] == test)]
+
+    if len(data) == 0:
+        raise RuntimeError("No OSU data of '" + test + "' for " + machine + \
+                           " (" + locality + "-node).")
+
+    sizes = np.asarray(sizes, dtype=np.float64)
+
+    if data['size'].isna().all():
+        return np.full(len(sizes), data['value'].mean())
+
+    data = data.sort_values('size')
+    x = np.log(data['size'].to_numpy(dtype=np.float64))
+    y = np.log(data['value'].to_numpy(dtype=np.float64))
+    return np.exp(np.interp(np.log(sizes), x, y))
+
+
+if __name__ == '__main__':
+    try:
+        parser = argparse.ArgumentParser(
+                description="Collect all OSU micro benchmark results into a single store."
+        )
+
+        parser.add_argument(
+            "--dirname",
+            type=str,
+            default='osu',
+            help="Root directory of OSU micro benchmark data.",
+        )
+
+        parser.add_argument(
+            "--store",
+            type=str,
+            default=default_store,
+            help="Output file of the store. Default: '" + default_store + "'",
+        )
+
+        parser.add_argument(
+            "--rebuild",
+            action='store_true',
+            help="Parse all files again instead of only new or changed files.",
+        )
+
+        args = parser.parse_args()
+
+        df = None
+        manifest = {}
+        if os.path.exists(args.store) and not args.rebuild:
+            df, manifest = load_store(args.store)
+
+        df, manifest, counts = update(args.dirname, df, manifest)
+
+        print("Files added:", counts['added'], "\tchanged:", counts['changed'],
+              "\tremoved:", counts['removed'], "\tunchanged:", counts['unchanged'])
+
+        if counts['added'] + counts['changed'] + counts['removed'] > 0:
+            save(df, args.store, manifest)
+            print("Wrote", len(df), "entries to '" + args.store + "'.")
+        else:
+            print("Store '" + args.store + "' is up to date.")
+
+        print()
+        print(df.groupby(['version', 'datatype'], dropna=False).size().to_string())
+
+        missing = get_missing(df)
+        print()
+        print(len(missing), "missing entries.")
+        if len(missing) > 0:
+            print(missing[['machine', 'nodes', 'test', 'reason']].to_string(index=False))
+
+    except Exception as ex:
+        print(ex, flush=True)
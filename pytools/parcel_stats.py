@@ -0,0 +1,103 @@
+import numpy as np
+import netCDF4 as nc
+import threading
+
+#
+# Streaming reader of the EPIC parcel statistics (epic_*_parcel_stats.nc). The
+# time series are read in chunks of 'chunk_size' time steps and reduced on the
+# fly, hence the memory does not grow with the length of the run:
+#   - the total number of parcels, the number of small parcels and their
+#     fraction (%),
+#   - the cumulative sum of the n-way mergers (column i: (i+2)-way mergers),
+#   - the total number of n-way mergers, i.e. their fractions.
+# The series are sampled every 'stride' time steps such that at most
+# 'max_points' values are kept (all of them for runs of up to 'max_points'
+# steps). The sums are taken over all time steps.
+#
+
+default_chunk_size = 4096
+
+default_max_points = 100000
+
+
+def get_stride(nt, max_points=default_max_points):
+    if max_points < 1:
+        raise RuntimeError("Maximum number of points must be positive.")
+    return max(1, -(-nt // max_points))
+
+
+# The netCDF-C library is not thread-safe, hence all its calls are serialised
+# when files are read by several threads (the reductions are not).
+lock = threading.Lock()
+
+
+def read_chunk(variable, k0, k1):
+    with lock:
+        return variable[k0:k1, ...]
+
+
+# Returns a dictionary of the reductions of the variables present in the file.
+def read(fname, chunk_size=default_chunk_size, max_points=default_max_points):
+    if chunk_size < 1:
+        raise RuntimeError("Chunk size must be positive.")
+
+    with lock:
+        ncfile = nc.Dataset(fname, "r", format="NETCDF4")
+        ncfile.set_auto_mask(False)
+        variables = ncfile.variables
+        nt = variables['t'].shape[0]
+        has_parcels = 'n_parcels' in variables.keys() and 'n_small_parcel' in variables.keys()
+        has_mergers = 'n_way_merging' in variables.keys()
+        if has_mergers:
+            nways = variables['n_way_merging'].shape[1]
+
+    try:
+        if nt == 0:
+            raise RuntimeError("No time steps in '" + fname + "'.")
+        stride = get_stride(nt, max_points)
+
+        t = []
+        n_parcels = []
+        n_small_parcels = []
+        n_way_cumsum = []
+        n_way_total = None
+        if has_mergers:
+            n_way_total = np.zeros(nways)
+
+        for k0 in range(0, nt, chunk_size):
+            k1 = min(k0 + chunk_size, nt)
+
+            # sampled time steps of this chunk (relative to k0)
+            sel = np.arange(-k0 % stride, k1 - k0, stride)
+
+            t.append(read_chunk(variables['t'], k0, k1)[sel])
+
+            if has_parcels:
+                n_parcels.append(read_chunk(variables['n_parcels'], k0, k1)[sel])
+                n_small_parcels.append(read_chunk(variables['n_small_parcel'], k0, k1)[sel])
+
+            if has_mergers:
+                cumsum = n_way_total + np.cumsum(read_chunk(variables['n_way_merging'], k0, k1), axis=0)
+                n_way_cumsum.append(cumsum[sel, :])
+                n_way_total = cumsum[-1, :]
+    finally:
+        with lock:
+            ncfile.close()
+
+    stats = {
+        'nt':       nt,
+        'stride':   stride,
+        't':        np.concatenate(t)
+    }
+
+    if has_parcels:
+        stats['n_parcels'] = np.concatenate(n_parcels)
+        stats['n_small_parcels'] = np.concatenate(n_small_parcels)
+        stats['small_fraction'] = stats['n_small_parcels'] / stats['n_parcels'] * 100.0
+
+    if has_mergers:
+        stats['n_way_cumsum'] = np.concatenate(n_way_cumsum)
+        stats['n_way_total'] = n_way_total
+        stats['n_way_percent'] = n_way_total / n_way_total.sum() * 100.0
+
+    return stats
@@ -0,0 +1,278 @@
+import pandas as pd
+import numpy as np
+import os
+import matplotlib.pyplot as plt
+from matplotlib.patches import Patch
+import argparse
+import timing_store
+import aggregate
+import discover
+
+#
+# Decomposition of the time of 'parcel merge (total)' of every run into
+#   communication: the timers of the communication layer (e.g. 'MPI P2P put'),
+#   compute:       the nearest search ('find nearest') without communication,
+#   unaccounted:   the merge time outside of the nearest search.
+# The parts are computed per run and then averaged per configuration (see
+# aggregate.py); the fractions are relative to the mean merge time.
+#
+# The timers are not exclusive, e.g. the communication timers of a run can
+# add up to more than 'find nearest' they are called from. The communication
+# is then clipped to 'find nearest' and the clipped time is reported as
+# 'overlap'. A configuration whose overlap exceeds 'max_overlap' of the merge
+# time cannot be decomposed reliably; it is marked as such (column 'reliable'),
+# hatched in the figures and left out of the summary.
+#
+
+total_timer = 'parcel merge (total)'
+
+envelope_timer = 'find nearest'
+
+comm_timers = {
+    'p2p':   ['MPI allreduce', 'MPI P2P put', 'MPI P2P get', 'MPI P2P sync', 'MPI graph info'],
+    'rma':   ['MPI allreduce', 'MPI RMA put', 'MPI RMA get', 'MPI RMA sync'],
+    'shmem': ['MPI allreduce', 'SHMEM put', 'SHMEM get', 'SHMEM sync']
+}
+
+parts = ['compute', 'communication', 'unaccounted']
+
+default_max_overlap = 0.1
+
+
+# The parts of every run of kind 'timings'.
+def decompose_runs(df):
+    for timer in [total_timer, envelope_timer]:
+        if not timer in df.columns:
+            raise RuntimeError("Data '" + timer + "' not in data set.")
+
+    total = df[total_timer].to_numpy()
+    envelope = df[envelope_timer].to_numpy()
+
+    comm = np.zeros(len(df))
+    layers = df['comm'].astype(str).to_numpy()
+    for layer, timers in comm_timers.items():
+        sel = layers == layer
+        timers = [t for t in timers if t in df.columns]
+        comm[sel] = df.loc[sel, timers].fillna(0.0).sum(axis=1).to_numpy()
+
+    runs = df[aggregate.group_columns + ['run']].copy()
+    runs['total'] = total
+    runs['communication'] = np.minimum(comm, envelope)
+    runs['compute'] = envelope - runs['communication']
+    runs['unaccounted'] = np.maximum(total - envelope, 0.0)
+    runs['overlap'] = np.maximum(comm - envelope, 0.0) + np.maximum(envelope - total, 0.0)
+    return runs
+
+
+# One row per configuration with the mean time (s) of every part over its
+# runs, their fractions of the mean merge time and whether the overlap of the
+# timers is small enough to trust the decomposition.
+def decompose(df, nruns=-1, max_overlap=default_max_overlap):
+    runs = decompose_runs(aggregate.trim_runs(df, nruns))
+
+    grouped = runs.groupby(aggregate.group_columns, observed=True)
+    table = grouped[['total'] + parts + ['overlap']].mean()
+    table.insert(0, 'nruns', grouped.size())
+    table = table.reset_index()
+
+    for part in parts + ['overlap']:
+        table[part + '_fraction'] = table[part] / table['total']
+    table['reliable'] = table['overlap_fraction'] <= max_overlap
+
+    return table.sort_values(['machine', 'compiler', 'comm', 'nx', 'ny', 'nz', 'nodes']).reset_index(drop=True)
+
+
+# Fractions at the smallest and largest number of nodes of every grid, and the
+# part with the largest fraction at the largest number of nodes.
+def get_growth(table):
+    rows = []
+    keys = ['machine', 'compiler', 'comm', 'grid']
+    for key, data in table.groupby(keys, observed=True):
+        data = data.sort_values('nodes')
+        first = data.iloc[0]
+        last = data.iloc[-1]
+        row = dict(zip(keys, key))
+        row['nodes'] = str(first['nodes']) + '-' + str(last['nodes'])
+        for part in parts:
+            row[part] = format(first[part + '_fraction'], '.2f') + ' -> ' + \
+                        format(last[part + '_fraction'], '.2f')
+        row['largest'] = max(parts, key=lambda p: last[p + '_fraction'])
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+# Stacked fractions per number of nodes, one row of panels per grid and one
+# column per communication layer.
+def plot_breakdown(table, fname, args):
+    titles = aggregate.comm_titles
+    cmap = plt.get_cmap(args.colour_map)
+
+    grids = sorted(table['grid'].unique(), key=lambda g: table[table['grid'] == g]['nodes'].min())
+
+    fig, axs = plt.subplots(nrows=len(grids), ncols=len(aggregate.comms), sharey=True, squeeze=False,
+                            figsize=(4.5*len(aggregate.comms), 3.25*len(grids)), dpi=400)
+
+    for i, grid in enumerate(grids):
+        for j, comm in enumerate(aggregate.comms):
+            ax = axs[i, j]
+            data = table[(table['grid'] == grid) & (table['comm'] == comm)].sort_values('nodes')
+
+            if i == 0:
+                ax.set_title(titles[comm])
+
+            if len(data) == 0:
+                ax.set_axis_off()
+                continue
+
+            # configurations with too much overlap of the timers are hatched
+            x = np.arange(len(data))
+            reliable = data['reliable'].to_numpy()
+            bottom = np.zeros(len(data))
+            for k, part in enumerate(parts):
+                values = data[part + '_fraction'].to_numpy()
+                ax.bar(x[reliable], values[reliable], bottom=bottom[reliable], width=0.7,
+                       color=cmap(k), label=part)
+                ax.bar(x[~reliable], values[~reliable], bottom=bottom[~reliable], width=0.7,
+                       color=cmap(k), alpha=0.4, hatch='///', edgecolor='white', linewidth=0)
+                bottom += values
+
+            ax.set_xticks(x)
+            ax.set_xticklabels([str(n) for n in data['nodes']])
+            ax.set_ylim([0, 1])
+            ax.grid(axis='y', linestyle='dashed', linewidth=0.25)
+            ax.set_xlabel('number of nodes (' + grid + ')')
+            if j == 0:
+                ax.set_ylabel('fraction of merge time')
+
+    handles, labels = [], []
+    for ax in axs.flat:
+        handles, labels = ax.get_legend_handles_labels()
+        if len(handles) > 0:
+            break
+    handles.append(Patch(facecolor='lightgray', hatch='///', edgecolor='white'))
+    labels.append('overlap > ' + format(args.max_overlap * 100.0, 'g') + '%')
+    fig.legend(handles, labels, loc='upper center', ncols=len(parts) + 1,
+               bbox_to_anchor=(0.5, 1.03))
+
+    plt.tight_layout()
+    plt.savefig(fname, bbox_inches='tight')
+    plt.close()
+
+
+if __name__ == '__main__':
+    try:
+        parser = argparse.ArgumentParser(
+                description="Decompose the parcel merge time into compute, communication " + \
+                            "and unaccounted time."
+        )
+
+        parser.add_argument(
+            "--store",
+            type=str,
+            default=timing_store.default_store,
+            help="Store written by timing_store.py. Default: '" + timing_store.default_store + "'",
+        )
+
+        parser.add_argument(
+            "--compiler-suites",
+            type=str,
+            nargs='+',
+            default=['cray', 'gnu'],
+            help="Compiler environment",
+        )
+
+        parser.add_argument(
+            "--test-case",
+            type=str,
+            default="random",
+            choices=['random', 'read-early', 'read-late'],
+            help="Test case to analyse.",
+        )
+
+        parser.add_argument(
+            "--nruns",
+            type=int,
+            default=-1,
+            help="Number of runs to use. Default: -1 (use all available)"
+        )
+
+        parser.add_argument(
+            "--use-subcomm",
+            action='store_true',
+            help="Use sub-communicator data."
+        )
+
+        parser.add_argument(
+            "--max-overlap",
+            type=float,
+            default=default_max_overlap,
+            help="Largest overlap of the timers (fraction of the merge time) of a reliable " + \
+                 "decomposition. Default: " + str(default_max_overlap)
+        )
+
+        parser.add_argument(
+            "--colour-map",
+            type=str,
+            default='tab10',
+            help="Colour map for plotting."
+        )
+
+        parser.add_argument(
+            "--enable-latex",
+            action='store_true',
+            help="Use LateX for plot labels."
+        )
+
+        parser.add_argument(
+            "--output-dir",
+            type=str,
+            default=".",
+            help="Table and figure save directory."
+        )
+
+        args = parser.parse_args()
+
+        plt.rcParams['font.family'] = 'sans'
+        plt.rcParams['font.size'] = 12
+        plt.rcParams['text.usetex'] = args.enable_latex
+
+        df = timing_store.load(args.store)
+        df = df[df['kind'] == 'timings']
+        directories = discover.get_directories(df, args.test_case, args.compiler_suites)
+        df = discover.select_runs(df, args.test_case, directories, args.use_subcomm)
+
+        if len(df) == 0:
+            raise RuntimeError("No benchmark data of '" + args.test_case + "' found.")
+
+        table = decompose(df, args.nruns, args.max_overlap)
+
+        if not os.path.exists(args.output_dir):
+            os.makedirs(args.output_dir)
+
+        tag = args.test_case
+        if args.use_subcomm:
+            tag = tag + '-subcomm'
+
+        fname = os.path.join(args.output_dir, tag + '-phase-breakdown.csv')
+        table.to_csv(fname, index=False)
+        print("Wrote", len(table), "rows to '" + fname + "'.")
+
+        for (machine, compiler), data in table.groupby(['machine', 'compiler'], observed=True):
+            fname = os.path.join(args.output_dir, machine + '-' + compiler + '-' + tag + \
+                                 '-phase-breakdown.pdf')
+            plot_breakdown(data, fname, args)
+            print("Created '" + fname + "'.")
+
+        print()
+        print("Fraction of the merge time from the smallest to the largest number of nodes:")
+        print(get_growth(table[table['reliable']]).to_string(index=False))
+
+        overlap = table['overlap_fraction']
+        print()
+        print("Overlap of the timers: median", round(overlap.median() * 100.0, 1),
+              "%, maximum", round(overlap.max() * 100.0, 1), "% of the merge time.")
+        print((~table['reliable']).sum(), "of", len(table), "configuration(s) overlap by more than",
+              round(args.max_overlap * 100.0, 1), "% and are not decomposed reliably.")
+
+    except Exception as ex:
+        print(ex, flush=True)
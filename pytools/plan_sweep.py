@@ -0,0 +1,412 @@
+import pandas as pd
+import numpy as np
+import os
+import re
+import argparse
+import timing_store
+import confidence
+import discover
+
+#
+# Propose the next benchmark submissions of a scaling study from the existing
+# timings instead of re-running the full sweep of run_random.sh or run_read.sh:
+#
+#   * The mean run time of each grid and communication method is fitted with
+#     T(p) = a + b / p (Amdahl's law). Fits to run times drawn from the bootstrap
+#     confidence intervals give the range of node counts where the parallel
+#     efficiency E(p) = T(p0) p0 / (T(p) p) drops below the threshold (the knee).
+#     Unmeasured node counts (powers of two from the smallest measured count)
+#     within a factor of two of this range are proposed.
+#   * Measured node counts whose confidence interval is wider than the target
+#     are proposed again with the number of additional repetitions needed.
+#   * All other node counts are considered converged and skipped.
+#
+# The submission scripts are created from template/ in the same way as
+# run_random.sh and run_read.sh do. Parameters that are not part of the
+# timings (e.g. domain extent, binary directory) are taken from the existing
+# submission script of the same grid with the closest number of nodes.
+#
+
+# Placeholders in the order of replacement in run_random.sh and run_read.sh
+# with the regular expression to obtain the value from an existing script.
+substitutions = {
+    'random': [
+        ('JOBNAME',                                 None),
+        ('COMPILER',                                None),
+        ('MACHINE',                                 None),
+        ('NREPEAT',                                 None),
+        ('NODES',                                   None),
+        ('--ntasks=NTASKS',                         None),
+        ('-np NTASKS',                              None),
+        ('--niter NITER',                           r'--niter (\S+)'),
+        ('NX',                                      None),
+        ('NY',                                      None),
+        ('NZ',                                      None),
+        ('--lx LX',                                 r'--lx (\S+)'),
+        ('--ly LY',                                 r'--ly (\S+)'),
+        ('--lz LZ',                                 r'--lz (\S+)'),
+        ('--small-parcel-fraction SMALL_PARCEL_FRACTION', r'--small-parcel-fraction (\S+)'),
+        ('BIN_DIR',                                 r'bin_dir=(\S+)'),
+        ('SUBCOMM',                                 r'if test "(\w*)" = "true"')
+    ],
+    'read': [
+        ('JOBNAME',                                 None),
+        ('COMPILER',                                None),
+        ('MACHINE',                                 None),
+        ('NAMETAG',                                 None),
+        ('--time=TIMELIMIT',                        r'#SBATCH --time=(\S+)'),
+        ('NX',                                      None),
+        ('NY',                                      None),
+        ('NZ',                                      None),
+        ('#SBATCH --ntasks-per-node=NTASKS_PER_NODE', r'#SBATCH --n?tasks-per-node=(\d+)'),
+        ('NREPEAT',                                 None),
+        ('NODES',                                   None),
+        ('--ntasks=NTASKS',                         None),
+        ('-np NTASKS',                              None),
+        ('--niter NITER',                           r'--niter (\S+)'),
+        ('--dirname DIRNAME',                       r'--dirname (\S+)'),
+        ('--ncbasename NC_BASENAME',                r'--ncbasename (\S+)'),
+        ('--offset OFFSET',                         r'--offset (\S+)'),
+        ('--nfiles NFILES',                         r'--nfiles (\S+)'),
+        ('--size-factor SIZE_FACTOR',               r'--size-factor (\S+)'),
+        ('BIN_DIR',                                 r'bin_dir=(\S+)'),
+        ('SUBCOMM',                                 r'if test "(\w*)" = "true"')
+    ]
+}
+
+
+def get_benchmark(test_case):
+    if test_case == 'random':
+        return 'random', ''
+    name_tag = test_case.replace('read-', '')
+    return 'read', name_tag
+
+
+def get_submit_fname(machine, test_case, nx, ny, nz, nodes):
+    benchmark, name_tag = get_benchmark(test_case)
+    if benchmark == 'read':
+        benchmark = benchmark + '_' + name_tag
+    return 'submit_' + machine + '_' + benchmark + '_nx_' + str(nx) + '_ny_' + str(ny) + \
+           '_nz_' + str(nz) + '_nodes_' + str(nodes) + '.sh'
+
+
+# Values of all placeholders of an existing submission script.
+def parse_submit_script(fname, test_case):
+    benchmark, name_tag = get_benchmark(test_case)
+
+    with open(fname) as f:
+        content = f.read()
+
+    values = {}
+    for placeholder, regex in substitutions[benchmark]:
+        if regex is None:
+            continue
+        m = re.search(regex, content)
+        if m is None:
+            raise RuntimeError("No value of '" + placeholder + "' in '" + fname + "'.")
+        # e.g. '--niter NITER' --> '--niter 10'
+        token = re.split(r'[ =]', placeholder)[-1]
+        values[placeholder] = placeholder[:-len(token)] + m.group(1)
+
+    nodes = int(re.search(r'#SBATCH --nodes=(\d+)', content).group(1))
+    ntasks = int(re.search(r'--ntasks=(\d+)', content).group(1))
+    values['ntasks_per_node'] = ntasks // nodes
+    return values
+
+
+def create_submit_script(template, values, machine, compiler, test_case,
+                         nx, ny, nz, nodes, nrepeat):
+    benchmark, name_tag = get_benchmark(test_case)
+
+    with open(template) as f:
+        content = f.read()
+
+    ntasks = nodes * values['ntasks_per_node']
+
+    known = {
+        'JOBNAME':          machine + '-' + compiler + '-' + benchmark,
+        'COMPILER':         compiler,
+        'MACHINE':          machine,
+        'NAMETAG':          name_tag,
+        'NX':               str(nx),
+        'NY':               str(ny),
+        'NZ':               str(nz),
+        'NREPEAT':          str(nrepeat),
+        'NODES':            str(nodes),
+        '--ntasks=NTASKS':  '--ntasks=' + str(ntasks),
+        '-np NTASKS':       '-np ' + str(ntasks)
+    }
+
+    for placeholder, regex in substitutions[benchmark]:
+        if regex is None:
+            content = content.replace(placeholder, known[placeholder])
+        else:
+            content = content.replace(placeholder, values[placeholder])
+    return content
+
+
+# Least squares fit of T(p) = a + b / p for all rows of t (shape: samples x nodes).
+def fit_amdahl(nodes, t):
+    x = 1.0 / nodes
+    # relative errors, i.e. weight 1 / T
+    w = 1.0 / t
+    s_w = (w ** 2).sum(axis=-1)
+    s_x = (w ** 2 * x).sum(axis=-1)
+    s_xx = (w ** 2 * x * x).sum(axis=-1)
+    s_t = (w ** 2 * t).sum(axis=-1)
+    s_xt = (w ** 2 * x * t).sum(axis=-1)
+    det = s_w * s_xx - s_x ** 2
+    a = (s_xx * s_t - s_x * s_xt) / det
+    b = (s_w * s_xt - s_x * s_t) / det
+    return a, b
+
+
+# Number of nodes where E(p) = threshold, infinite if the efficiency never drops below.
+def get_knee(a, b, p0, threshold):
+    knee = np.full(np.shape(a), np.inf)
+    valid = a > 0.0
+    knee[valid] = ((a[valid] * p0 + b[valid]) / threshold - b[valid]) / a[valid]
+    return np.maximum(knee, p0)
+
+
+def plan(ci, nrepeat, max_nrepeat, threshold, target, max_nodes, nsamples=1000, seed=42):
+    rng = np.random.default_rng(seed)
+
+    keys = ['directory', 'grid', 'nodes']
+
+    proposals = []
+
+    # noisy points
+    report = confidence.sufficiency(ci, target)
+    for (directory, grid, nodes), rows in report.groupby(keys, observed=True):
+        proposals.append({'directory': directory,
+                          'grid':      grid,
+                          'nodes':     int(nodes),
+                          'nrepeat':   min(int(rows['additional'].max()), max_nrepeat),
+                          'reason':    'confidence interval too wide'})
+
+    # uncertain knee
+    for (directory, grid, comm), rows in ci.groupby(['directory', 'grid', 'comm'], observed=True):
+        rows = rows.sort_values('nodes')
+        nodes = rows['nodes'].to_numpy(dtype=np.float64)
+        if len(nodes) < 2:
+            continue
+
+        mean = rows['mean'].to_numpy()
+        sigma = (rows['upper'] - rows['lower']).to_numpy() / (2.0 * 1.96)
+        samples = mean + sigma * rng.standard_normal((nsamples, len(nodes)))
+        samples = np.maximum(samples, 1.0e-3 * mean)
+
+        a, b = fit_amdahl(nodes, samples)
+        knee = np.sort(get_knee(a, b, nodes[0], threshold))
+        lo = knee[int(0.05 * (nsamples - 1))]
+        hi = knee[int(0.95 * (nsamples - 1))]
+
+        candidates = nodes[0] * 2.0 ** np.arange(0, 32)
+        candidates = candidates[candidates <= max_nodes]
+
+        if np.isinf(lo):
+            # the efficiency stays above the threshold: extend by one step
+            candidates = candidates[candidates > nodes[-1]][:1]
+            reason = 'efficiency of ' + comm + ' above ' + str(threshold) + \
+                     ' up to ' + str(int(nodes[-1])) + ' nodes'
+        else:
+            candidates = candidates[(candidates >= 0.5 * lo) & (candidates <= 2.0 * hi)]
+            reason = 'efficiency knee of ' + comm + ' between ' + str(round(lo, 1)) + \
+                     ' and ' + str(round(hi, 1)) + ' nodes'
+
+        for p in candidates:
+            if p in nodes:
+                continue
+            proposals.append({'directory': directory,
+                              'grid':      grid,
+                              'nodes':     int(p),
+                              'nrepeat':   nrepeat,
+                              'reason':    reason})
+
+    if proposals == []:
+        return pd.DataFrame(columns=keys + ['nrepeat', 'reason'])
+
+    # one job runs all communication methods
+    df = pd.DataFrame(proposals)
+    df = df.groupby(keys).agg({'nrepeat': 'max',
+                               'reason': lambda r: '; '.join(sorted(set(r)))})
+    return df.reset_index()
+
+
+if __name__ == '__main__':
+    try:
+        parser = argparse.ArgumentParser(
+                description="Propose the next submissions of a scaling study."
+        )
+
+        parser.add_argument(
+            "--store",
+            type=str,
+            default=timing_store.default_store,
+            help="Store written by timing_store.py. Default: '" + timing_store.default_store + "'",
+        )
+
+        parser.add_argument(
+            "--path",
+            type=str,
+            default='.',
+            help="Root directory of the benchmark data and templates.",
+        )
+
+        parser.add_argument(
+            "--machine",
+            type=str,
+            required=True,
+            help="Computing system, e.g. 'archer2'.",
+        )
+
+        parser.add_argument(
+            "--compiler-suite",
+            type=str,
+            default='cray',
+            help="Compiler environment",
+        )
+
+        parser.add_argument(
+            "--test-case",
+            type=str,
+            default="random",
+            choices=['random', 'read-early', 'read-late'],
+            help="Test case to plan.",
+        )
+
+        parser.add_argument(
+            "--timing",
+            type=str,
+            default='parcel merge (total)',
+            help="Timer used to decide.",
+        )
+
+        parser.add_argument(
+            "--nrepeat",
+            type=int,
+            default=5,
+            help="Number of repetitions of new node counts."
+        )
+
+        parser.add_argument(
+            "--max-nrepeat",
+            type=int,
+            default=20,
+            help="Largest number of additional repetitions of a measured node count."
+        )
+
+        parser.add_argument(
+            "--directory",
+            type=str,
+            default=None,
+            help="Data directory relative to --path. Default: <test case>/<compiler suite>"
+        )
+
+        parser.add_argument(
+            "--efficiency",
+            type=float,
+            default=0.5,
+            help="Parallel efficiency defining the knee of the scaling curve."
+        )
+
+        parser.add_argument(
+            "--target-width",
+            type=float,
+            default=0.05,
+            help="Target width of the confidence interval relative to the mean."
+        )
+
+        parser.add_argument(
+            "--max-nodes",
+            type=int,
+            default=-1,
+            help="Largest number of nodes to propose. Default: -1 (twice the largest measured)"
+        )
+
+        parser.add_argument(
+            "--output-dir",
+            type=str,
+            default="plan",
+            help="Directory of the submission scripts."
+        )
+
+        args = parser.parse_args()
+
+        directory = args.directory
+        if directory is None:
+            directory = os.path.join(args.test_case, args.compiler_suite)
+        directory = os.path.normpath(directory)
+
+        store = timing_store.load(args.store)
+        store = store[store['kind'] == 'timings']
+        directories = discover.get_directories(store, args.test_case, [args.compiler_suite],
+                                               roots=[directory])
+        df = discover.select_runs(store, args.test_case, directories, False)
+
+        # The existing submission scripts are found in the directory of the
+        # run (see below), not in the folded one.
+        df = store.loc[df.index]
+        df = df[(df['machine'] == args.machine) & (df['compiler'] == args.compiler_suite)]
+
+        if len(df) == 0:
+            raise RuntimeError("No timings of " + args.machine + " (" + args.compiler_suite + \
+                               ") for the " + args.test_case + " test case.")
+
+        ci = confidence.bootstrap(df, timers=[args.timing])
+
+        max_nodes = args.max_nodes
+        if max_nodes == -1:
+            max_nodes = 2 * int(ci['nodes'].max())
+
+        proposals = plan(ci,
+                         nrepeat=args.nrepeat,
+                         max_nrepeat=args.max_nrepeat,
+                         threshold=args.efficiency,
+                         target=args.target_width,
+                         max_nodes=max_nodes)
+
+        if len(proposals) == 0:
+            print("All points are converged. Nothing to submit.")
+        else:
+            benchmark, name_tag = get_benchmark(args.test_case)
+            template = os.path.join(args.path, 'template',
+                                    'submit_' + args.machine + '_' + benchmark + '.sh')
+            if not os.path.exists(template):
+                raise RuntimeError("Template '" + template + "' does not exist.")
+
+            for row in proposals.itertuples():
+                nx, ny, nz = (int(n) for n in re.match(r"nx-(\d*)-ny-(\d*)-nz-(\d*)", row.grid).groups())
+
+                # existing script of the same grid with the closest number of nodes
+                measured = df[(df['directory'] == row.directory) & (df['grid'] == row.grid)]
+                measured = np.unique(measured['nodes'].to_numpy())
+                closest = measured[np.argmin(np.abs(np.log2(measured / row.nodes)))]
+                existing = os.path.join(args.path, row.directory, get_submit_fname(args.machine, args.test_case,
+                                                                   nx, ny, nz, closest))
+                if not os.path.exists(existing):
+                    raise RuntimeError("Submission script '" + existing + "' does not exist.")
+
+                values = parse_submit_script(existing, args.test_case)
+                content = create_submit_script(template, values, args.machine, args.compiler_suite,
+                                               args.test_case, nx, ny, nz, row.nodes, row.nrepeat)
+
+                # same layout as the data directory
+                output_dir = os.path.join(args.output_dir, row.directory)
+                if not os.path.exists(output_dir):
+                    os.makedirs(output_dir)
+
+                fname = get_submit_fname(args.machine, args.test_case, nx, ny, nz, row.nodes)
+                with open(os.path.join(output_dir, fname), 'w') as f:
+                    f.write(content)
+
+                print(os.path.join(row.directory, fname) + ":", row.nrepeat,
+                      "repetition(s) --", row.reason)
+
+            proposals.to_csv(os.path.join(args.output_dir, 'plan.csv'), index=False)
+            print("Submit the jobs with 'sbatch' from within the sub-directories of '" + \
+                  args.output_dir + "'.")
+
+    except Exception as ex:
+        print(ex, flush=True)
@@ -3,148 +3,174 @@ import numpy as np
 import os
 import argparse
 from matplotlib.legend_handler import HandlerTuple
-
-try:
-
-    # -------------------------------
-    # Global settings:
-    #
-
-    plt.rcParams['font.family'] = 'serif'
-    plt.rcParams['font.size'] = 15
-
-    linestyles = ['solid', 'dashed']
-    colors = ['tab:blue', 'tab:orange', 'tab:green']
-    markers = ['o', 's', 'D']
-
-    networks = {
-        'archer2': r'AMD Rome / SS10',
-        'hotlum':  r'AMD Milan / SS200',
-        'cirrus':  r'Intel Broadwell / IB'
-    }
-
-    osu_tests = {
-        'osu_allreduce':            r'MPI Allreduce Latency Test',
-        'osu_bw':                   r'MPI P2P Bandwidth Test',
-        'osu_get_bw_flush':         r'MPI-3 RMA Get (flush) Bandwidth Test',
-        'osu_get_bw_lock':          r'MPI-3 RMA Get (lock/unlock) Bandwidth Test',
-        'osu_get_latency_flush':    r'MPI-3 RMA Get (flush) Latency Test',
-        'osu_get_latency_lock':     r'MPI-3 RMA Get (lock/unlock) Latency Test',
-        'osu_latency':              r'MPI P2P Latency Test',
-        'osu_oshm_barrier':         r'OpenSHMEM Barrier Latency Test',
-        'osu_oshm_get':             r'OpenSHMEM Get Latency Test',
-        'osu_oshm_get_bw':          r'OpenSHMEM Get Bandwidth Test',
-        'osu_oshm_put':             r'OpenSHMEM Put Latency Test',
-        'osu_oshm_put_bw':          r'OpenSHMEM Put Bandwidth Test',
-        'osu_put_bw_flush':         r'MPI-3 RMA Put (flush) Bandwidth Test',
-        'osu_put_bw_lock':          r'MPI-3 RMA Put (lock/unlock) Bandwidth Test',
-        'osu_put_latency_flush':    r'MPI-3 RMA Put (flush) Latency Test',
-        'osu_put_latency_lock':     r'MPI-3 RMA Put (lock/unlock) Latency Test'
-    }
-
-    plot_types = {
-        'bandwidth-put':    ['osu_oshm_put_bw', 'osu_put_bw_lock', 'osu_put_bw_flush'],
-        'bandwidth-get':    ['osu_oshm_get_bw', 'osu_get_bw_lock', 'osu_get_bw_flush'],
-        'latency-put':      ['osu_oshm_put', 'osu_put_latency_lock', 'osu_put_latency_flush'],
-        'latency-get':      ['osu_oshm_get', 'osu_get_latency_lock', 'osu_get_latency_flush'],
-        'mpi-p2p':          ['osu_allreduce', 'osu_latency', 'osu_bw']
-    }
-
-    linewidth=1
-    markersize=4
-
-
-    # -------------------------------
-
-    def plot_bandwidth(ax, dset, **kwargs):
-        sizes = dset[:, 0]
-        bw = dset[:, 1]
-
-
-        ax.plot(sizes, bw, **kwargs)
-        ax.set_xscale('log', base=10)
-        ax.set_yscale('log', base=10)
-        ax.set_xlabel(r'message size (B)')
-        ax.set_ylabel(r'bandwidth (MB/s)')
-
-    def plot_latency(ax, dset, **kwargs):
-        sizes = dset[:, 0]
-        lat = dset[:, 1]
-
-        ax.plot(sizes, lat, **kwargs)
-        ax.set_xscale('log', base=10)
-        ax.set_yscale('log', base=10)
-        ax.set_xlabel(r'message size (B)')
-
-        enabled_latex = plt.rcParams['text.usetex']
-
-        if enabled_latex:
-            ax.set_ylabel(r'latency ($\mu$s)')
-        else:
-            ax.set_ylabel(r'latency (us)')
-
-
-    def make_plot(ax, osu_test, machines, dirname):
-        #comm_type = {
-            #'1': r'(intra-node)',
-            #'2': r'(inter-node)'
-        #}
-
-        for j, machine in enumerate(machines):
-            for i, node in enumerate(['1', '2']):
-                directory = os.path.join(dirname, machine + '-osu-runs')
-                fname = os.path.join(directory, machine + '-nodes-' + node + '-' + osu_test)
-
-                dset = np.loadtxt(fname=fname, comments='#')
-
-                is_scalar = (dset.shape == ())
-
-                label = None
-
-                if is_scalar:
-                    print("Not plotting.")
+import osu
+import render
+
+
+# -------------------------------
+# Global settings (applied by main):
+#
+
+rc_params = {
+    'font.family': 'serif',
+    'font.size':   15
+}
+
+linestyles = ['solid', 'dashed']
+colors = ['tab:blue', 'tab:orange', 'tab:green']
+markers = ['o', 's', 'D']
+
+networks = osu.networks
+
+osu_tests = {
+    'osu_allreduce':            r'MPI Allreduce Latency Test',
+    'osu_bw':                   r'MPI P2P Bandwidth Test',
+    'osu_get_bw_flush':         r'MPI-3 RMA Get (flush) Bandwidth Test',
+    'osu_get_bw_lock':          r'MPI-3 RMA Get (lock/unlock) Bandwidth Test',
+    'osu_get_latency_flush':    r'MPI-3 RMA Get (flush) Latency Test',
+    'osu_get_latency_lock':     r'MPI-3 RMA Get (lock/unlock) Latency Test',
+    'osu_latency':              r'MPI P2P Latency Test',
+    'osu_oshm_barrier':         r'OpenSHMEM Barrier Latency Test',
+    'osu_oshm_get':             r'OpenSHMEM Get Latency Test',
+    'osu_oshm_get_bw':          r'OpenSHMEM Get Bandwidth Test',
+    'osu_oshm_put':             r'OpenSHMEM Put Latency Test',
+    'osu_oshm_put_bw':          r'OpenSHMEM Put Bandwidth Test',
+    'osu_put_bw_flush':         r'MPI-3 RMA Put (flush) Bandwidth Test',
+    'osu_put_bw_lock':          r'MPI-3 RMA Put (lock/unlock) Bandwidth Test',
+    'osu_put_latency_flush':    r'MPI-3 RMA Put (flush) Latency Test',
+    'osu_put_latency_lock':     r'MPI-3 RMA Put (lock/unlock) Latency Test'
+}
+
+plot_types = {
+    'bandwidth-put':    ['osu_oshm_put_bw', 'osu_put_bw_lock', 'osu_put_bw_flush'],
+    'bandwidth-get':    ['osu_oshm_get_bw', 'osu_get_bw_lock', 'osu_get_bw_flush'],
+    'latency-put':      ['osu_oshm_put', 'osu_put_latency_lock', 'osu_put_latency_flush'],
+    'latency-get':      ['osu_oshm_get', 'osu_get_latency_lock', 'osu_get_latency_flush'],
+    'mpi-p2p':          ['osu_allreduce', 'osu_latency', 'osu_bw']
+}
+
+linewidth=1
+markersize=4
+
+
+# -------------------------------
+
+def plot_bandwidth(ax, dset, **kwargs):
+    sizes = dset[:, 0]
+    bw = dset[:, 1]
+
+
+    ax.plot(sizes, bw, **kwargs)
+    ax.set_xscale('log', base=10)
+    ax.set_yscale('log', base=10)
+    ax.set_xlabel(r'message size (B)')
+    ax.set_ylabel(r'bandwidth (MB/s)')
+
+def plot_latency(ax, dset, **kwargs):
+    sizes = dset[:, 0]
+    lat = dset[:, 1]
+
+    ax.plot(sizes, lat, **kwargs)
+    ax.set_xscale('log', base=10)
+    ax.set_yscale('log', base=10)
+    ax.set_xlabel(r'message size (B)')
+
+    enabled_latex = plt.rcParams['text.usetex']
+
+    if enabled_latex:
+        ax.set_ylabel(r'latency ($\mu$s)')
+    else:
+        ax.set_ylabel(r'latency (us)')
+
+
+# 'data' is the OSU data of all machines (see osu.load).
+def make_plot(ax, osu_test, machines, data):
+    #comm_type = {
+        #'1': r'(intra-node)',
+        #'2': r'(inter-node)'
+    #}
+
+    for j, machine in enumerate(machines):
+        for i, node in enumerate(['1', '2']):
+            sel = (data['machine'] == machine) & \
+                  (data['nodes'] == int(node)) & \
+                  (data['test'] == osu_test)
+
+            if not sel.any():
+                raise RuntimeError("No OSU data of '" + osu_test + "' for " + machine + \
+                                   " with " + node + " node(s).")
+
+            dset = data.loc[sel, ['size', 'value']].to_numpy()
+
+            if np.isnan(dset[:, 0]).all():
+                raise RuntimeError("OSU test '" + osu_test + "' has no message sizes.")
+            else:
+                if 'bw' in osu_test:
+                    plot_bandwidth(ax,
+                                   dset,
+                                   label=networks[machine], # + ' ' + comm_type[node],
+                                   linestyle=linestyles[i],
+                                   color=colors[j],
+                                   marker=markers[j],
+                                   markersize=markersize,
+                                   linewidth=linewidth)
                 else:
-                    if 'bw' in osu_test:
-                        plot_bandwidth(ax,
-                                       dset,
-                                       label=networks[machine], # + ' ' + comm_type[node],
-                                       linestyle=linestyles[i],
-                                       color=colors[j],
-                                       marker=markers[j],
-                                       markersize=markersize,
-                                       linewidth=linewidth)
-                    else:
-                        plot_latency(ax,
-                                     dset,
-                                     label=networks[machine], # + ' ' + comm_type[node],
-                                     linestyle=linestyles[i],
-                                     color=colors[j],
-                                     marker=markers[j],
-                                     markersize=markersize,
-                                     linewidth=linewidth)
-
-        ax.set_title(osu_tests[osu_test])
-        ax.grid(which='both', zorder=-10, linestyle='dashed', linewidth=0.4)
-
-        loc = 'lower right'
-        if 'Latency' in osu_tests[osu_test]:
-            loc='upper left'
-
-        handles, labels = ax.get_legend_handles_labels()
-        ax.legend(loc=loc, ncols=1,
-                  handles=[[handles[0], handles[1]],
-                           [handles[2], handles[3]],
-                           [handles[4], handles[5]]],
-                  labels=[networks[machines[0]],
-                          networks[machines[1]],
-                          networks[machines[2]]],
-                  handlelength=3,
-                  handler_map={list: HandlerTuple(ndivide=None)})
+                    plot_latency(ax,
+                                 dset,
+                                 label=networks[machine], # + ' ' + comm_type[node],
+                                 linestyle=linestyles[i],
+                                 color=colors[j],
+                                 marker=markers[j],
+                                 markersize=markersize,
+                                 linewidth=linewidth)
+
+    ax.set_title(osu_tests[osu_test])
+    ax.grid(which='both', zorder=-10, linestyle='dashed', linewidth=0.4)
+
+    loc = 'lower right'
+    if 'Latency' in osu_tests[osu_test]:
+        loc='upper left'
+
+    handles, labels = ax.get_legend_handles_labels()
+    ax.legend(loc=loc, ncols=1,
+              handles=[[handles[0], handles[1]],
+                       [handles[2], handles[3]],
+                       [handles[4], handles[5]]],
+              labels=[networks[machines[0]],
+                      networks[machines[1]],
+                      networks[machines[2]]],
+              handlelength=3,
+              handler_map={list: HandlerTuple(ndivide=None)})
+
+
+def plot(plot_type, machines, data, output_dir):
+    tests = plot_types[plot_type]
+
+    n = len(tests)
+
+    sharey = not (plot_type == "mpi-p2p")
+
+    fig, axs = plt.subplots(nrows=1, ncols=n, sharey=sharey, figsize=(5*n, 5), dpi=200)
+
+    for i, osu_test in enumerate(tests):
+        make_plot(axs[i], osu_test, machines, data)
 
         if i > 0 and sharey:
             axs[i].set_ylabel(None)
 
+    plt.tight_layout()
+
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+
+    fname = os.path.join(output_dir, 'osu-' + plot_type + '.pdf')
+    plt.savefig(fname, bbox_inches='tight')
+    plt.close()
+
+    return [fname]
 
+
+def get_parser():
     parser = argparse.ArgumentParser(
             description="Generate OSU micro benchmark plot."
     )
@@ -152,9 +178,10 @@ try:
     parser.add_argument(
         "--plot-type",
         type=str,
-        default="",
+        nargs='+',
+        default=list(plot_types.keys()),
         choices=plot_types.keys(),
-        help="OSU micro benchmark test",
+        help="OSU micro benchmark test(s). Default: all",
     )
 
     parser.add_argument(
@@ -172,6 +199,14 @@ try:
         help="Root directory of OSU micro benchmark data."
     )
 
+    parser.add_argument(
+        "--store",
+        type=str,
+        default=None,
+        help="Cache the parsed OSU data in this store (see osu.py), e.g. '" + \
+             osu.default_store + "'. Default: parse all files"
+    )
+
     parser.add_argument(
         "--output-dir",
         type=str,
@@ -185,31 +220,60 @@ try:
         help="Use LateX for plot labels."
     )
 
+    parser.add_argument(
+        "--nprocs",
+        type=int,
+        default=render.default_nprocs,
+        help="Number of processes rendering the figures. Default: " + \
+             str(render.default_nprocs) + " (number of available cores)"
+    )
 
-    args = parser.parse_args()
+    parser.add_argument(
+        "--rebuild",
+        action='store_true',
+        help="Render all figures, also the unchanged ones of the figure cache."
+    )
 
-    plt.rcParams['text.usetex'] = args.enable_latex
+    return parser
 
-    plot_type = plot_types[args.plot_type]
 
-    n = len(plot_type)
+# One figure (task, see render.py) per plot type, each with the data of its
+# tests only, which is also the key of the figure cache. The OSU data is read
+# once for all plot types. Missing entries (files without valid data) are
+# reported and only raise if a figure needs them.
+def get_tasks(args):
+    entries = osu.load_entries(args.dirname, args.store)
+    entries = entries[entries['machine'].isin(args.machines)]
 
-    sharey = not (args.plot_type == "mpi-p2p")
+    missing = osu.get_missing(entries)
+    for row in missing.itertuples():
+        print("Missing OSU data of '" + row.test + "' for " + row.machine + " with " + \
+              str(row.nodes) + " node(s): " + row.reason)
 
-    fig, axs = plt.subplots(nrows=1, ncols=n, sharey=sharey, figsize=(5*n, 5), dpi=200)
+    for plot_type in args.plot_type:
+        needed = missing[missing['test'].isin(plot_types[plot_type])]
+        if len(needed) > 0:
+            raise RuntimeError("Cannot plot '" + plot_type + "' due to missing OSU data.")
 
-    for i, osu_test in enumerate(plot_type):
-        make_plot(axs[i], osu_test, args.machines, args.dirname)
+    data = osu.to_long(entries, args.machines)
 
-    plt.tight_layout()
+    rc = dict(rc_params, **{'text.usetex': args.enable_latex})
 
-    if not os.path.exists(args.output_dir):
-        os.makedirs(args.output_dir)
+    tasks = []
+    for plot_type in args.plot_type:
+        tests = data[data['test'].isin(plot_types[plot_type])]
+        arguments = (plot_type, args.machines, tests, args.output_dir)
+        tasks.append((rc, plot, arguments, arguments))
+    return tasks
 
-    plt.savefig(os.path.join(args.output_dir, 'osu-' + args.plot_type + '.pdf'),
-                bbox_inches='tight')
-    plt.close()
+
+def main(args):
+    render.render(get_tasks(args), args.nprocs,
+                  os.path.join(args.output_dir, render.default_cache), args.rebuild)
 
 
-except Exception as ex:
-    print(ex, flush=True)
+if __name__ == '__main__':
+    try:
+        main(get_parser().parse_args())
+    except Exception as ex:
+        print(ex, flush=True)
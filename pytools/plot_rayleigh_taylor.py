@@ -3,148 +3,183 @@ import matplotlib.pyplot as plt
 import argparse
 import os
 import re
-import netCDF4 as nc
+from concurrent.futures import ThreadPoolExecutor
 from matplotlib.legend_handler import HandlerTuple
+import parcel_stats
 
 
-try:
+rc_params = {
+    'font.family':     'sans',
+    'font.size':       13,
+    'lines.linewidth': 2
+}
 
-    plt.rcParams['font.family'] = 'sans'
-    plt.rcParams['font.size'] = 13
-    plt.rcParams['lines.linewidth'] = 2
+# run directories rt-<nx>x<ny>x<nz>
+pattern = re.compile(r'rt-(\d+)x(\d+)x(\d+)$')
 
 
-    def plot_parcel_statistics(args):
-        dirnames = ['rt-64x64x64', 'rt-128x128x128', 'rt-256x256x256']
+# Returns all run directories below path, sorted by the number of grid cells.
+def find_dirnames(path):
+    if not os.path.exists(path):
+        raise RuntimeError("Directory '" + path + "' does not exist.")
 
-        main_labels = []
-        pattern = r'rt-(\d*)x(\d*)x(\d*)'
-        for dirname in dirnames:
-            m = re.match(pattern, dirname)
-            if args.enable_latex:
-                main_labels.append(r'$' + m.group(1) + r'\times ' + m.group(2) + r'\times ' + m.group(3) + r'$')
-            else:
-                main_labels.append(m.group(1) + r' x ' + m.group(2) + ' x ' + m.group(3))
+    found = []
+    for entry in os.listdir(path):
+        m = re.match(pattern, entry)
+        if not m is None and os.path.isdir(os.path.join(path, entry)):
+            ncells = int(m.group(1)) * int(m.group(2)) * int(m.group(3))
+            found.append((ncells, entry))
 
-        fig, axs = plt.subplots(nrows=1, ncols=3, figsize=(4.5*3, 4.25), dpi=400, sharex=True)
+    if found == []:
+        raise RuntimeError("No directories rt-<nx>x<ny>x<nz> found in '" + path + "'.")
+    return [dirname for _, dirname in sorted(found)]
 
-        handles = []
-        labels = []
 
-        for i, dirname in enumerate(dirnames):
-            fullpath = os.path.join(args.path, dirname)
-            if not os.path.exists(fullpath):
-                raise RuntimeError("Directory '" + fullpath + "' does not exist.")
+def get_fullpath(path, dirname):
+    fullpath = os.path.join(path, dirname)
+    if not os.path.exists(fullpath):
+        raise RuntimeError("Directory '" + fullpath + "' does not exist.")
+    return fullpath
 
-            s = dirname.replace('-', '_')
-            data = np.loadtxt(fname=os.path.join(fullpath, 'epic_' + s + '_prepare_nearest_subcomm.asc'),
-                            comments='#')
 
-            time = data[:, 0]
-            size = data[:, 1]
-            percentage = data[:, 2]
+# Parcel statistics (see parcel_stats.py) and sub-communicator sizes of a run.
+def read_run(path, dirname, chunk_size, max_points):
+    fullpath = get_fullpath(path, dirname)
+    s = dirname.replace('-', '_')
 
+    stats = parcel_stats.read(os.path.join(fullpath, 'epic_' + s + '_prepare_parcel_stats.nc'),
+                              chunk_size, max_points)
 
-            ncfile = nc.Dataset(os.path.join(fullpath, 'epic_' + s + '_prepare_parcel_stats.nc'),
-                                "r", format="NETCDF4")
+    stats['subcomm'] = np.loadtxt(fname=os.path.join(fullpath, 'epic_' + s + '_prepare_nearest_subcomm.asc'),
+                                  comments='#', ndmin=2)
+    return stats
 
-            n_small_parcels = np.array(ncfile.variables['n_small_parcel'])
-            n_total_parcels = np.array(ncfile.variables['n_parcels'])
 
-            t = np.array(ncfile.variables['t'])
-            ncfile.close()
+# Statistics of all runs, read once for all plots by a pool of threads.
+def read_parcel_statistics(args):
+    dirnames = args.dirnames
+    if dirnames is None:
+        dirnames = find_dirnames(args.path)
 
-            h1, = axs[0].plot(t, n_total_parcels, color=cmap(i), linestyle='dashed')
-            h2, = axs[0].plot(t, n_small_parcels, color=cmap(i))
-            handles.append(h1)
-            handles.append(h2)
+    if args.nthreads < 1:
+        raise RuntimeError("Number of threads must be positive.")
 
-            axs[0].set_yscale('log', base=10)
+    with ThreadPoolExecutor(max_workers=args.nthreads) as executor:
+        futures = [executor.submit(read_run, args.path, dirname, args.chunk_size, args.max_points)
+                   for dirname in dirnames]
+        return dict((dirname, future.result()) for dirname, future in zip(dirnames, futures))
 
-            axs[1].plot(t, n_small_parcels / n_total_parcels * 100.0, color=cmap(i), label=main_labels[i])
-            axs[2].plot(time, percentage, color=cmap(i))
 
-        for i in range(3):
-            axs[i].set_xlim([2.5, None])
-            axs[i].grid(which='both', zorder=10, linestyle='dashed', linewidth=0.25)
-            axs[i].set_xlabel(r'simulation time')
-
-        fig.legend(loc='upper center', ncols=len(main_labels), bbox_to_anchor=(0.5, 1.07))
-
-        axs[0].set_ylabel(r'number of parcels')
+def plot_parcel_statistics(args, stats):
+    cmap = plt.get_cmap(args.colour_map)
 
-        axs[0].legend(loc='lower right',
-                    handles=[(handles[0], handles[2], handles[4]),
-                            (handles[1], handles[3], handles[5])],
-                    labels=['total parcels', 'small parcels'],
-                    ncols=1,
-                    handlelength=4.5,
-                    columnspacing=0.8,
-                    handler_map={tuple: HandlerTuple(ndivide=None)})
+    dirnames = list(stats.keys())
 
+    main_labels = []
+    for dirname in dirnames:
+        m = re.match(pattern, dirname)
         if args.enable_latex:
-            axs[1].set_ylabel(r'fraction of small parcels (\%)')
-            axs[2].set_ylabel(r'MPI sub-communicator size (\%)')
+            main_labels.append(r'$' + m.group(1) + r'\times ' + m.group(2) + r'\times ' + m.group(3) + r'$')
         else:
-            axs[1].set_ylabel(r'fraction of small parcels (%)')
-            axs[2].set_ylabel(r'MPI sub-communicator size (%)')
+            main_labels.append(m.group(1) + r' x ' + m.group(2) + ' x ' + m.group(3))
+
+    fig, axs = plt.subplots(nrows=1, ncols=3, figsize=(4.5*3, 4.25), dpi=400, sharex=True)
 
+    handles = []
+    labels = []
 
-        plt.tight_layout()
-        plt.savefig(os.path.join(args.output_dir, 'rt_subcomm.pdf'), bbox_inches='tight')
-        plt.close()
+    for i, dirname in enumerate(dirnames):
+        data = stats[dirname]['subcomm']
 
+        time = data[:, 0]
+        size = data[:, 1]
+        percentage = data[:, 2]
 
-    def plot_merger_statistics(args):
+        t = stats[dirname]['t']
 
-        dirname = 'rt-256x256x256'
+        h1, = axs[0].plot(t, stats[dirname]['n_parcels'], color=cmap(i), linestyle='dashed')
+        h2, = axs[0].plot(t, stats[dirname]['n_small_parcels'], color=cmap(i))
+        handles.append(h1)
+        handles.append(h2)
 
-        fullpath = os.path.join(args.path, dirname)
-        if not os.path.exists(fullpath):
-            raise RuntimeError("Directory '" + fullpath + "' does not exist.")
+        axs[0].set_yscale('log', base=10)
 
-        s = dirname.replace('-', '_')
-        ncfile = nc.Dataset(os.path.join(fullpath, 'epic_' + s + '_prepare_parcel_stats.nc'),
-                                "r", format="NETCDF4")
+        axs[1].plot(t, stats[dirname]['small_fraction'], color=cmap(i), label=main_labels[i])
+        axs[2].plot(time, percentage, color=cmap(i))
 
-        n_parcel_merges = np.array(ncfile.variables['n_parcel_merges'])
-        n_big_neighbour = np.array(ncfile.variables['n_big_neighbour'])
-        n_way_merging = np.array(ncfile.variables['n_way_merging'])
-        t = np.array(ncfile.variables['t'])
-        ncfile.close()
+    for i in range(3):
+        axs[i].set_xlim([2.5, None])
+        axs[i].grid(which='both', zorder=10, linestyle='dashed', linewidth=0.25)
+        axs[i].set_xlabel(r'simulation time')
 
-        fig, axs = plt.subplots(nrows=1, ncols=2, figsize=(4.5*2, 4.25), dpi=400)
+    fig.legend(loc='upper center', ncols=len(main_labels), bbox_to_anchor=(0.5, 1.07))
 
+    axs[0].set_ylabel(r'number of parcels')
 
-        total = n_way_merging.sum(axis=(0,1))
+    axs[0].legend(loc='lower right',
+                handles=[tuple(handles[0::2]),
+                        tuple(handles[1::2])],
+                labels=['total parcels', 'small parcels'],
+                ncols=1,
+                handlelength=4.5,
+                columnspacing=0.8,
+                handler_map={tuple: HandlerTuple(ndivide=None)})
 
-        # -1 because we do not have any 8-way mergers
-        for i in range(n_way_merging.shape[1]-1):
-            axs[0].plot(t, np.cumsum(n_way_merging[:, i]), label=str(i+2) + '-way')
+    if args.enable_latex:
+        axs[1].set_ylabel(r'fraction of small parcels (\%)')
+        axs[2].set_ylabel(r'MPI sub-communicator size (\%)')
+    else:
+        axs[1].set_ylabel(r'fraction of small parcels (%)')
+        axs[2].set_ylabel(r'MPI sub-communicator size (%)')
 
-            percent = n_way_merging[:, i].sum() / total * 100.0
-            print(str(i+2) + '-way mergers:', round(percent, 8), '%')
-            axs[1].bar(i, percent)
 
-        axs[0].set_xlim([2.5, None])
-        axs[0].set_xlabel(r'simulation time')
-        axs[0].set_yscale('log', base=10)
-        axs[0].set_ylabel(r'cumulative sum of $n$-way mergers')
-        axs[0].legend(loc='upper center', ncols=3, bbox_to_anchor=(0.5, 1.25))
+    plt.tight_layout()
+    plt.savefig(os.path.join(args.output_dir, 'rt_subcomm.pdf'), bbox_inches='tight')
+    plt.close()
+
+
+def plot_merger_statistics(args, stats):
 
-        axs[1].set_yscale('log', base=10)
-        axs[1].set_xticks([0, 1, 2, 3, 4, 5])
-        axs[1].set_xticklabels(['2-way', '3-way', '4-way', '5-way', '6-way', '7-way'])
-        axs[1].set_ylabel(r'fraction of $n$-way mergers (\%)')
+    # largest run by default
+    dirname = args.merger_dirname
+    if dirname is None:
+        dirname = list(stats.keys())[-1]
+    elif not dirname in stats.keys():
+        raise RuntimeError("No run '" + dirname + "' among " + ', '.join(stats.keys()) + ".")
 
-        for i in range(2):
-            axs[i].grid(which='both', zorder=10, linestyle='dashed', linewidth=0.25)
+    t = stats[dirname]['t']
+    n_way_cumsum = stats[dirname]['n_way_cumsum']
 
-        plt.tight_layout()
-        plt.savefig(os.path.join(args.output_dir, 'rt_mergers.pdf'), bbox_inches='tight')
-        plt.close()
+    fig, axs = plt.subplots(nrows=1, ncols=2, figsize=(4.5*2, 4.25), dpi=400)
 
+    # -1 because we do not have any 8-way mergers
+    for i in range(n_way_cumsum.shape[1]-1):
+        axs[0].plot(t, n_way_cumsum[:, i], label=str(i+2) + '-way')
 
+        percent = stats[dirname]['n_way_percent'][i]
+        print(str(i+2) + '-way mergers:', round(percent, 8), '%')
+        axs[1].bar(i, percent)
+
+    axs[0].set_xlim([2.5, None])
+    axs[0].set_xlabel(r'simulation time')
+    axs[0].set_yscale('log', base=10)
+    axs[0].set_ylabel(r'cumulative sum of $n$-way mergers')
+    axs[0].legend(loc='upper center', ncols=3, bbox_to_anchor=(0.5, 1.25))
+
+    axs[1].set_yscale('log', base=10)
+    axs[1].set_xticks([0, 1, 2, 3, 4, 5])
+    axs[1].set_xticklabels(['2-way', '3-way', '4-way', '5-way', '6-way', '7-way'])
+    axs[1].set_ylabel(r'fraction of $n$-way mergers (\%)')
+
+    for i in range(2):
+        axs[i].grid(which='both', zorder=10, linestyle='dashed', linewidth=0.25)
+
+    plt.tight_layout()
+    plt.savefig(os.path.join(args.output_dir, 'rt_mergers.pdf'), bbox_inches='tight')
+    plt.close()
+
+
+def get_parser():
     parser = argparse.ArgumentParser(
             description="Generate Rayleigh-Taylor plots."
     )
@@ -156,6 +191,28 @@ try:
         help="Data directory.",
     )
 
+    parser.add_argument(
+        "--dirnames",
+        type=str,
+        nargs='+',
+        default=None,
+        help="Run directories rt-<nx>x<ny>x<nz> to plot. Default: all found in the data directory",
+    )
+
+    parser.add_argument(
+        "--merger-dirname",
+        type=str,
+        default=None,
+        help="Run directory of the merger statistics. Default: largest run",
+    )
+
+    parser.add_argument(
+        "--nthreads",
+        type=int,
+        default=8,
+        help="Number of threads reading the runs. Default: 8"
+    )
+
     parser.add_argument(
         "--colour-map",
         type=str,
@@ -163,6 +220,22 @@ try:
         help="Colour map for plotting."
     )
 
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=parcel_stats.default_chunk_size,
+        help="Number of time steps of the parcel statistics read at a time. Default: " + \
+             str(parcel_stats.default_chunk_size)
+    )
+
+    parser.add_argument(
+        "--max-points",
+        type=int,
+        default=parcel_stats.default_max_points,
+        help="Maximum number of time steps plotted per series. Default: " + \
+             str(parcel_stats.default_max_points)
+    )
+
     parser.add_argument(
         "--enable-latex",
         action='store_true',
@@ -176,17 +249,23 @@ try:
         help="Figure save directory."
     )
 
-    args = parser.parse_args()
+    return parser
 
-    cmap = plt.get_cmap(args.colour_map)
 
-    plt.rcParams['text.usetex'] = args.enable_latex
+def main(args):
+    if not os.path.exists(args.output_dir):
+        os.makedirs(args.output_dir)
 
+    stats = read_parcel_statistics(args)
 
-    plot_parcel_statistics(args)
+    with plt.rc_context(dict(rc_params, **{'text.usetex': args.enable_latex})):
+        plot_parcel_statistics(args, stats)
 
-    plot_merger_statistics(args)
+        plot_merger_statistics(args, stats)
 
 
-except Exception as ex:
-    print(ex, flush=True)
+if __name__ == '__main__':
+    try:
+        main(get_parser().parse_args())
+    except Exception as ex:
+        print(ex, flush=True)
@@ -4,510 +4,705 @@ import os
 import matplotlib.pyplot as plt
 import re
 import argparse
+import timing_store
+import aggregate
+import confidence
+import efficiency
+import scaling_model
+import comm_volume
+import render
+import discover
 from matplotlib.legend_handler import HandlerTuple
 
 
-try:
-
-    #
-    # Global settings
-    #
-    plt.rcParams['font.family'] = 'sans'
-    plt.rcParams['font.size'] = 12
-
-
-    # :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
-    # Helper functions and classes for parsing and plotting the data:
-    #
-    class DataSet:
-
-        def __init__(self, path, compiler_suites, test_case, use_subcomm = False):
-            self.path = path
-            self.use_subcomm = use_subcomm
-
-            self.titles = {
-                'p2p':   r'MPI P2P + MPI P2P',
-                'rma':   r'MPI P2P + MPI-3 RMA',
-                'shmem': r'MPI P2P + SHMEM'
-            }
-
-            self.ncalls_csv = "-ncalls.csv"
-            self.timing_csv = "-timings.csv"
-            if self.use_subcomm:
-                self.timing_csv = "-subcomm" + self.timing_csv
-                self.ncalls_csv = "-subcomm" + self.ncalls_csv
-
-            tc = '-' + test_case + '-'
-            pattern = re.compile(r"(\w*)-(\w*)-(\w*)" + tc + \
-                r"(nx-\d*-ny-\d*-nz-\d*)-nodes-(\d*)" + self.timing_csv)
-
-            self.configs = {}
-            for compiler_suite in compiler_suites:
-                path = os.path.join(self.path, test_case, compiler_suite)
-                if not os.path.exists(path):
-                    raise RuntimeError("Path '" + path + "' does not exist. Exiting.")
-
-                for fname in os.listdir(path=path):
-                    m = re.match(pattern, fname)
-                    if not m is None:
-                        machine = m.group(1)
-                        group = machine + '-' + m.group(2) + '-' + m.group(3) + tc + m.group(4)
-
-                        if not machine in self.configs.keys():
-                            self.configs[machine] = {}
-                            self.configs[machine]['groups'] = {}
-                            self.configs[machine]['compilers'] = set()
-                            self.configs[machine]['grids'] = set()
-                            self.configs[machine]['comms'] = set()
-
-                        if not group in self.configs[machine]['groups']:
-                            self.configs[machine]['groups'][group] = {
-                                'path':     path,
-                                'basename': group + '-nodes-',
-                                'compiler': m.group(2),
-                                'comm':     m.group(3),
-                                'grid':     m.group(4),
-                                'nodes':    []
-                            }
-                        self.configs[machine]['compilers'].add(m.group(2))
-                        self.configs[machine]['comms'].add(m.group(3))
-                        self.configs[machine]['grids'].add(m.group(4))
-                        self.configs[machine]['groups'][group]['nodes'].append(int(m.group(5)))
-
-                    if "submit" in fname:
-                        with open(os.path.join(path, fname)) as lines:
-                            for line in lines:
-                                result = re.findall(r'--ntasks-per-node=(\d*)', line)
-                                if result == []:
-                                    result = re.findall(r'--tasks-per-node=(\d*)', line)
-                                if not result == []:
-                                    for machine in self.configs.keys():
-                                        if machine in fname:
-                                            self.configs[machine]['ntasks_per_node'] = result[0]
-
-            print("Found", len(self.configs.keys()), "different machines with the following configurations:")
-            for machine in self.configs.keys():
-                print("*", machine + ":")
-                print("\t", len(self.configs[machine]['compilers']),
-                      "compiler(s):", self.configs[machine]['compilers'])
-                print("\t", len(self.configs[machine]['comms']), "comm method(s):",
-                      self.configs[machine]['comms'])
-                print("\t", len(self.configs[machine]['grids']),
-                      "grid configuration(s):", self.configs[machine]['grids'])
-                print("\t", "  number of tasks per node:", self.configs[machine]['ntasks_per_node'])
-                print()
-
-            # sort nodes
-            for machine in self.configs.keys():
-                for group in self.configs[machine]['groups'].keys():
-                    config = self.configs[machine]['groups'][group]
-                    config['nodes'].sort()
-
-        def _get_data(self, config, nodes, what, dtype, csv, measure='mean-std', nruns=-1):
-            measure_1_data = {}
-            measure_2_data = {}
-            for long_name in what:
-                measure_1_data[long_name] = np.zeros(len(nodes))
-                measure_2_data[long_name] = np.zeros(len(nodes))
-
-            for i, node in enumerate(nodes):
-                fname = config['basename'] + str(node) + csv
-
-                df = pd.read_csv(os.path.join(config['path'], fname), dtype=dtype)
-
-                long_names = list(df.columns)
-                for w in what:
-                    if not w in long_names:
-                        raise RuntimeError("Data '" + w + "' not in data set.")
-
-                for long_name in what:
-                    data = np.array(df.loc[:, long_name])
-
-                    if nruns == -1:
-                        # use all data
-                        pass
-                    elif nruns > data.size:
-                        raise RuntimeError("Only " + str(data.size) + " runs available.")
-                    else:
-                        data = data[-nruns:]
-                        if not nruns == data.size:
-                            raise RuntimeError("Something went wrong in obtaining data.")
-
-
-
-                    if measure == 'mean-std':
-                        measure_1_data[long_name][i] = data.mean()
-                        measure_2_data[long_name][i] = data.std()
-                    elif measure == 'min-max':
-                        measure_1_data[long_name][i] = data.min()
-                        measure_2_data[long_name][i] = data.max()
-                    else:
-                        raise RuntimeError("Only 'mean-std' or 'min-max' measure.")
-
-            return measure_1_data, measure_2_data
-
-
-        def get_timing(self, config, nodes, timings, nruns):
-            return self._get_data(config=config,
-                                  nodes=nodes,
-                                  what=timings,
-                                  dtype=np.float64,
-                                  csv=self.timing_csv,
-                                  measure='mean-std',
-                                  nruns=nruns)
-
-        def get_comm_stats(self, config, nodes, stats):
-            return self._get_data(config=config,
-                                  nodes=nodes,
-                                  what=stats,
-                                  dtype=np.int64,
-                                  csv=self.ncalls_csv,
-                                  measure='min-max')
-
-        def get_mesh(self, grid):
-            pat = re.compile(r"nx-(\d*)-ny-(\d*)-nz-(\d*)")
-            g = re.match(pat, grid)
-            return int(g.group(1)), int(g.group(2)), int(g.group(3))
-
-        def get_sorted_grids(self, machine):
-            triples = []
-            for grid in self.configs[machine]['grids']:
-                nx, ny, nz = self.get_mesh(grid)
-                triples.append((nx, ny, nz))
-            triples.sort()
-            grids = []
-            for (nx, ny, nz) in triples:
-                grids.append('nx-' + str(nx) + '-ny-' + str(ny) + '-nz-' + str(nz))
-            return grids
-
-
-    # :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
-
-    def add_to_plot(ax, dset, nruns, config, timings, cmap, marker, add_label=False,
-                    add_ideal_scaling=False):
-        nodes = np.asarray(config['nodes'])
+#
+# Global settings (applied by main)
+#
+rc_params = {
+    'font.family': 'sans',
+    'font.size':   12
+}
+
+
+# :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+# Helper functions and classes for parsing and plotting the data:
+#
+class DataSet:
+
+    def __init__(self, path, compiler_suites, test_case, use_subcomm = False, store=None,
+                 nthreads=timing_store.default_nthreads, data=None, roots=None, index=None):
+        self.path = path
+        self.use_subcomm = use_subcomm
+
+        self.titles = aggregate.comm_titles
+
+        # All directories below the roots (default: the test case directory) with
+        # CSV files of the test case and compiler suites (see discover.py), e.g.
+        # read-early/cray and read-early/cray/archer2-nx-64-ny-64-nz-64-nodes-16.
+        if roots is None:
+            roots = [test_case]
 
-        # switch case:
-        # (see https://docs.python.org/3.10/whatsnew/3.10.html#pep-634-structural-pattern-matching, 28 Jan 2025)
-        method = ''
-        match config['comm']:
-            case 'p2p':
-                method = 'MPI-3 P2P'
-            case 'rma':
-                method = 'MPI-3 RMA'
-            case 'shmem':
-                method = 'SHMEM'
+        if index is None:
+            index, _ = discover.update(self.path, roots, nthreads=nthreads)
+        else:
+            index = discover.select(index, roots)
+
+        csv = index[(index['artefact'] == 'csv') &
+                    (index['test_case'] == test_case) &
+                    (index['compiler'].isin(compiler_suites))]
+        directories = list(csv['directory'].unique())
+
+        # All files are read once at this point, the plots only query self.data.
+        if not data is None:
+            df = data
+        elif store is None:
+            df = timing_store.to_frame(timing_store.read_files(self.path, discover.get_files(csv),
+                                                               nthreads))
+        else:
+            df = timing_store.load(store)
+
+        # The same runs as the analyses (e.g. efficiency.py): without duplicates
+        # and with nested directories (e.g. random/gnu/cirrus-72-144-32) in the
+        # series of the enclosing directory, e.g. of a fit.
+        df = discover.select_runs(df, test_case, directories, self.use_subcomm)
+
+        self.data = df
+        self.summaries = {}
+        self.confidences = {}
+        self.fits = {}
+        self.volumes = {}
+
+        tc = '-' + test_case + '-'
+
+        self.configs = {}
+        runs = df[df['kind'] == 'timings']
+        runs = runs.drop_duplicates(['machine', 'compiler', 'comm', 'grid', 'nodes'])
+        runs = runs.sort_values(['machine', 'compiler', 'comm', 'nx', 'ny', 'nz', 'nodes'])
+        for row in runs.itertuples():
+            machine = row.machine
+            group = machine + '-' + row.compiler + '-' + row.comm + tc + row.grid
+
+            if not machine in self.configs.keys():
+                self.configs[machine] = {}
+                self.configs[machine]['groups'] = {}
+                self.configs[machine]['compilers'] = set()
+                self.configs[machine]['grids'] = set()
+                self.configs[machine]['comms'] = set()
+
+            if not group in self.configs[machine]['groups']:
+                self.configs[machine]['groups'][group] = {
+                    'machine':  machine,
+                    'compiler': row.compiler,
+                    'comm':     row.comm,
+                    'grid':     row.grid,
+                    'nodes':    []
+                }
+            self.configs[machine]['compilers'].add(row.compiler)
+            self.configs[machine]['comms'].add(row.comm)
+            self.configs[machine]['grids'].add(row.grid)
+            self.configs[machine]['groups'][group]['nodes'].append(int(row.nodes))
+
+        ntasks_per_node = discover.get_ntasks_per_node(index, directories)
+        for machine in self.configs.keys():
+            if not machine in ntasks_per_node.keys():
+                raise RuntimeError("No submission script found for " + machine + ".")
+            self.configs[machine]['ntasks_per_node'] = str(ntasks_per_node[machine])
+
+        print("Found", len(self.configs.keys()), "different machines with the following configurations:")
+        for machine in self.configs.keys():
+            print("*", machine + ":")
+            print("\t", len(self.configs[machine]['compilers']),
+                  "compiler(s):", self.configs[machine]['compilers'])
+            print("\t", len(self.configs[machine]['comms']), "comm method(s):",
+                  self.configs[machine]['comms'])
+            print("\t", len(self.configs[machine]['grids']),
+                  "grid configuration(s):", self.configs[machine]['grids'])
+            print("\t", "  number of tasks per node:", self.configs[machine]['ntasks_per_node'])
+            print()
+
+    # Summary statistics of all configurations, computed once per
+    # kind ('timings' or 'ncalls') and number of runs.
+    def get_summary(self, kind, nruns=-1):
+        key = (kind, nruns)
+        if not key in self.summaries.keys():
+            df = self.data[self.data['kind'] == kind]
+            summary = aggregate.summarise(df, nruns=nruns, quantiles=[])
+            summary = summary.set_index(['machine', 'compiler', 'comm', 'grid', 'timer', 'nodes'])
+            self.summaries[key] = summary.sort_index()
+        return self.summaries[key]
+
+    def _get_data(self, config, nodes, what, kind, measure='mean-std', nruns=-1):
+        match measure:
+            case 'mean-std':
+                stats = ['mean', 'std']
+            case 'min-max':
+                stats = ['min', 'max']
             case _:
-                raise RuntimeError("No method called '" + config['comm'] + "'.")
-        # done
-
-        timer_labels = {
-            'parcel merge (total)': "parcel merge",
-            'find nearest':         "NNS",
-            'build graphs':         "DG construction",
-            'resolve graphs':       "DG pruning"
-        }
-
-        avg_data, std_data = dset.get_timing(config, nodes, timings, nruns)
-
-        if add_ideal_scaling:
-            label = None
-            if add_label:
-                label = 'ideal scaling'
-
-            ax.plot(nodes,
-                    avg_data[timings[0]][0] / nodes * nodes[0],
-                    color='black',
-                    linestyle='dashed',
+                raise RuntimeError("Only 'mean-std' or 'min-max' measure.")
+
+        summary = self.get_summary(kind, nruns)
+
+        measure_1_data = {}
+        measure_2_data = {}
+        for long_name in what:
+            key = (config['machine'], config['compiler'], config['comm'], config['grid'], long_name)
+            if not key in summary.index.droplevel('nodes'):
+                raise RuntimeError("Data '" + long_name + "' not in data set.")
+
+            data = summary.loc[key].reindex(nodes)
+            if data[stats[0]].isna().any():
+                raise RuntimeError("Data '" + long_name + "' not available for all nodes.")
+
+            measure_1_data[long_name] = data[stats[0]].to_numpy(dtype=np.float64)
+            measure_2_data[long_name] = data[stats[1]].to_numpy(dtype=np.float64)
+
+        return measure_1_data, measure_2_data
+
+
+    def get_timing(self, config, nodes, timings, nruns):
+        return self._get_data(config=config,
+                              nodes=nodes,
+                              what=timings,
+                              kind='timings',
+                              measure='mean-std',
+                              nruns=nruns)
+
+    # Bootstrap confidence interval of the mean (see confidence.py).
+    def get_confidence(self, timings, nruns):
+        key = (nruns, tuple(timings))
+        if not key in self.confidences.keys():
+            df = self.data[self.data['kind'] == 'timings']
+            ci = confidence.bootstrap(df, timers=timings, nruns=nruns)
+            ci = ci.set_index(['machine', 'compiler', 'comm', 'grid', 'timer', 'nodes'])
+            self.confidences[key] = ci.sort_index()
+        return self.confidences[key]
+
+    # Mean and distance of the mean to the lower and upper bound of
+    # the bootstrap confidence interval (see confidence.py).
+    def get_timing_ci(self, config, nodes, timings, nruns):
+        ci = self.get_confidence(timings, nruns)
+
+        avg_data = {}
+        err_data = {}
+        for long_name in timings:
+            key = (config['machine'], config['compiler'], config['comm'], config['grid'], long_name)
+            data = ci.loc[key].reindex(nodes)
+            if data['mean'].isna().any():
+                raise RuntimeError("Data '" + long_name + "' not available for all nodes.")
+
+            avg_data[long_name] = data['mean'].to_numpy()
+            err_data[long_name] = np.array([data['mean'] - data['lower'],
+                                            data['upper'] - data['mean']])
+        return avg_data, err_data
+
+    # Scaling model (see scaling_model.py) fitted to the
+    # mean run time of all configurations.
+    def get_fits(self, model, nruns):
+        key = (model, nruns)
+        if not key in self.fits.keys():
+            summary = self.get_summary('timings', nruns).reset_index()
+            self.fits[key] = scaling_model.fit(summary, model)
+        return self.fits[key]
+
+    # Run time of a scaling model (see scaling_model.py) fitted
+    # to the mean run time of all configurations.
+    def get_fit(self, config, nodes, timings, nruns, model, level=0.95):
+        fits = self.get_fits(model, nruns)
+
+        # all series columns apart from the machine, compiler, comm and grid are unique
+        sel = (fits['machine'] == config['machine']) & \
+              (fits['compiler'] == config['compiler']) & \
+              (fits['comm'] == config['comm']) & \
+              (fits['timer'].isin(timings))
+        fits = fits[sel]
+
+        nx, ny, nz = self.get_mesh(config['grid'])
+        points = fits[scaling_model.get_series_columns(model)].copy()
+        points = points.assign(grid=config['grid'], nx=nx, ny=ny, nz=nz)
+        points = points.drop_duplicates().merge(pd.DataFrame({'nodes': nodes}), how='cross')
+
+        pred = scaling_model.predict(fits, points, level)
+
+        avg_data = {}
+        err_data = {}
+        for long_name in timings:
+            data = pred[pred['timer'] == long_name].set_index('nodes').reindex(nodes)
+            avg_data[long_name] = data['predicted'].to_numpy()
+            err_data[long_name] = np.array([data['predicted'] - data['lower'],
+                                            data['upper'] - data['predicted']])
+        return avg_data, err_data
+
+    def get_comm_stats(self, config, nodes, stats):
+        return self._get_data(config=config,
+                              nodes=nodes,
+                              what=stats,
+                              kind='ncalls',
+                              measure='min-max')
+
+    # Call counts per rank, in total and per merge (see comm_volume.py).
+    def get_comm_volume(self, nruns=-1):
+        if not nruns in self.volumes.keys():
+            ntasks_per_node = {}
+            for machine in self.configs.keys():
+                ntasks_per_node[machine] = int(self.configs[machine]['ntasks_per_node'])
+            summary = self.get_summary('ncalls', nruns).reset_index()
+            self.volumes[nruns] = comm_volume.volume(summary, ntasks_per_node)
+        return self.volumes[nruns]
+
+    # Computes the statistics the plot of args.plot queries such that
+    # the figures can be rendered without the raw data (see render.py).
+    def prepare(self, args):
+        match args.plot:
+            case 'weak-strong-scaling':
+                if args.error_bars == 'ci':
+                    self.get_confidence(args.timings, args.nruns)
+                else:
+                    self.get_summary('timings', args.nruns)
+                if not args.fit_model is None:
+                    self.get_fits(args.fit_model, args.nruns)
+            case 'strong-efficiency':
+                self.get_summary('timings', args.nruns)
+            case 'comm-stats':
+                self.get_comm_volume(args.nruns)
+
+    # The raw data is not sent to the processes rendering the figures.
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['data'] = None
+        return state
+
+    # Statistics of a machine and compiler suite computed so far, i.e. the
+    # data a figure depends on (key of the figure cache, see render.py).
+    def get_slice(self, machine, compiler_suite):
+        tables = []
+        for cache in [self.summaries, self.confidences, self.fits, self.volumes]:
+            for key in sorted(cache.keys(), key=str):
+                df = cache[key].reset_index()
+                sel = (df['machine'] == machine) & (df['compiler'] == compiler_suite)
+                tables.append((key, df[sel]))
+        return [self.titles, self.use_subcomm, self.configs[machine], tables]
+
+    def get_mesh(self, grid):
+        pat = re.compile(r"nx-(\d*)-ny-(\d*)-nz-(\d*)")
+        g = re.match(pat, grid)
+        return int(g.group(1)), int(g.group(2)), int(g.group(3))
+
+    def get_sorted_grids(self, machine):
+        triples = []
+        for grid in self.configs[machine]['grids']:
+            nx, ny, nz = self.get_mesh(grid)
+            triples.append((nx, ny, nz))
+        triples.sort()
+        grids = []
+        for (nx, ny, nz) in triples:
+            grids.append('nx-' + str(nx) + '-ny-' + str(ny) + '-nz-' + str(nz))
+        return grids
+
+
+# :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+
+def add_to_plot(ax, dset, nruns, config, timings, cmap, marker, add_label=False,
+                add_ideal_scaling=False, error_bars='std', fit_model=None, predict_nodes=[]):
+    nodes = np.asarray(config['nodes'])
+
+    # switch case:
+    # (see https://docs.python.org/3.10/whatsnew/3.10.html#pep-634-structural-pattern-matching, 28 Jan 2025)
+    method = ''
+    match config['comm']:
+        case 'p2p':
+            method = 'MPI-3 P2P'
+        case 'rma':
+            method = 'MPI-3 RMA'
+        case 'shmem':
+            method = 'SHMEM'
+        case _:
+            raise RuntimeError("No method called '" + config['comm'] + "'.")
+    # done
+
+    timer_labels = {
+        'parcel merge (total)': "parcel merge",
+        'find nearest':         "NNS",
+        'build graphs':         "DG construction",
+        'resolve graphs':       "DG pruning"
+    }
+
+    if error_bars == 'ci':
+        avg_data, err_data = dset.get_timing_ci(config, nodes, timings, nruns)
+    else:
+        avg_data, err_data = dset.get_timing(config, nodes, timings, nruns)
+
+    if add_ideal_scaling:
+        label = None
+        if add_label:
+            label = 'ideal scaling'
+
+        ax.plot(nodes,
+                avg_data[timings[0]][0] / nodes * nodes[0],
+                color='black',
+                linestyle='dashed',
+                linewidth=1,
+                label=label)
+
+    for i, long_name in enumerate(timings):
+        label = None
+        if add_label:
+            if long_name in timer_labels.keys():
+                label = timer_labels[long_name]
+
+        ax.errorbar(x=nodes,
+                    y=avg_data[long_name],
+                    yerr=err_data[long_name],
+                    #yerr=abs(avg_data[long_name]-std_data[long_name]),
+                    label=label,
+                    color=cmap(i),
                     linewidth=1,
-                    label=label)
-
-        for i, long_name in enumerate(timings):
-            label = None
-            if add_label:
-                if long_name in timer_labels.keys():
-                    label = timer_labels[long_name]
-
-            ax.errorbar(x=nodes,
-                        y=avg_data[long_name],
-                        yerr=std_data[long_name],
-                        #yerr=abs(avg_data[long_name]-std_data[long_name]),
-                        label=label,
-                        color=cmap(i),
-                        linewidth=1,
-                        marker=marker,
-                        markersize=5,
-                        capsize=3)
-
-    # :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
-
-    # Create legend where markers share a single legend entry:
-    def add_legend(ax, add_ideal_scaling, **kwargs):
-        handles, labels = ax.get_legend_handles_labels()
-
-        arg = {}
-        if add_ideal_scaling:
-            arg['ideal scaling'] = None
-        for t in labels:
-            arg[t] = []
-
-        for i in range(len(labels)):
-            if labels[i] == 'ideal scaling':
-                arg['ideal scaling'] = handles[i]
-            else:
-                arg[labels[i]].append(handles[i])
+                    marker=marker,
+                    markersize=5,
+                    capsize=3)
+
+    if not fit_model is None:
+        add_fit_to_plot(ax, dset, nruns, config, timings, cmap, marker,
+                        fit_model, predict_nodes)
+
+# :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+
+# Fitted run time (dotted) up to the largest number of nodes and
+# the predictions at the requested number of nodes (open markers).
+def add_fit_to_plot(ax, dset, nruns, config, timings, cmap, marker, fit_model, predict_nodes):
+    nodes = np.asarray(config['nodes'])
+
+    nmax = max([nodes[-1]] + list(predict_nodes))
+    fit_nodes = np.geomspace(nodes[0], nmax, 50)
+    fit_data, _ = dset.get_fit(config, fit_nodes, timings, nruns, fit_model)
+
+    for i, long_name in enumerate(timings):
+        ax.plot(fit_nodes,
+                fit_data[long_name],
+                color=cmap(i),
+                linestyle='dotted',
+                linewidth=1)
+
+    if len(predict_nodes) == 0:
+        return
+
+    predict_nodes = np.asarray(predict_nodes)
+    avg_data, err_data = dset.get_fit(config, predict_nodes, timings, nruns, fit_model)
+    for i, long_name in enumerate(timings):
+        ax.errorbar(x=predict_nodes,
+                    y=avg_data[long_name],
+                    yerr=err_data[long_name],
+                    color=cmap(i),
+                    linestyle='none',
+                    marker=marker,
+                    markersize=5,
+                    markerfacecolor='none',
+                    capsize=3)
+
+# :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+
+# Create legend where markers share a single legend entry:
+def add_legend(ax, add_ideal_scaling, **kwargs):
+    handles, labels = ax.get_legend_handles_labels()
+
+    arg = {}
+    if add_ideal_scaling:
+        arg['ideal scaling'] = None
+    for t in labels:
+        arg[t] = []
+
+    for i in range(len(labels)):
+        if labels[i] == 'ideal scaling':
+            arg['ideal scaling'] = handles[i]
+        else:
+            arg[labels[i]].append(handles[i])
 
-        h_ = []
-        for l in arg.keys():
-            h_.append(arg[l])
+    h_ = []
+    for l in arg.keys():
+        h_.append(arg[l])
 
-        # 23 Jan 2025
-        # https://matplotlib.org/stable/gallery/text_labels_and_annotations/legend_demo.html
-        ax.legend(loc='lower left', handles=h_, labels=arg.keys(),
-                  ncols=2,
-                  columnspacing=0.8,
-                  handler_map={list: HandlerTuple(ndivide=None)},
-                  **kwargs)
+    # 23 Jan 2025
+    # https://matplotlib.org/stable/gallery/text_labels_and_annotations/legend_demo.html
+    ax.legend(loc='lower left', handles=h_, labels=arg.keys(),
+              ncols=2,
+              columnspacing=0.8,
+              handler_map={list: HandlerTuple(ndivide=None)},
+              **kwargs)
 
-    # :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+# :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
 
-    def generate_stats_plot(dset, machine, args):
+def generate_stats_plot(dset, machine, args):
 
-        print("Generating a " + args.plot + " plot for " + machine + ".")
+    print("Generating a " + args.plot + " plot for " + machine + ".")
 
-        for compiler_suite in args.compiler_suites:
+    fnames = []
 
-            if not compiler_suite in dset.configs[machine]['compilers']:
-                continue
+    ylabels = {
+        'rank':  'number of calls per rank',
+        'total': 'total number of calls',
+        'merge': 'number of calls per rank and merge'
+    }
 
-            grids = dset.get_sorted_grids(machine)
-            n = len(grids)
-            nrows = int(np.sqrt(n))
-            ncols = int(n / nrows + 0.5)
+    columns = {
+        'rank':  'per_rank',
+        'total': 'total',
+        'merge': 'per_merge'
+    }
 
-            sharex = (nrows > 1)
+    column = columns[args.comm_stats]
 
-            fig, axs = plt.subplots(nrows=nrows,
-                                    ncols=ncols,
-                                    sharey=True,
-                                    sharex=sharex,
-                                    figsize=(4.5*ncols, 4.25*nrows),
-                                    dpi=400)
-            axs_fl = axs.flatten()
+    volume = dset.get_comm_volume(args.nruns)
+    volume = volume[volume['machine'] == machine]
 
-            stats = {
-                'p2p': ['MPI P2P put', 'MPI P2P get'],
-                'rma': ['MPI RMA put', 'MPI RMA get'],
-                'shmem': ['SHMEM put', 'SHMEM get']
-            }
+    n = len(dset.configs[machine]['comms'])
+    nrows = int(np.sqrt(n))
+    ncols = int(n / nrows + 0.5)
 
-            cmap = plt.get_cmap(args.colour_map)
+    sharex = (nrows > 1)
 
-            comms = dset.configs[machine]['comms']
-            for i, comm in enumerate(comms):
+    comms = sorted(dset.configs[machine]['comms'])
 
-                axs_fl[i].grid(which='both', linestyle='dashed', linewidth=0.25)
+    grids = dset.get_sorted_grids(machine)
 
-                stat = stats[comm]
+    if len(grids) > len(args.markers):
+        raise RuntimeError('Not enough markers. ' + \
+            'Please add more to the command line with --markers')
 
-                for j, grid in enumerate(grids):
+    cmap = plt.get_cmap(args.colour_map)
 
+    for compiler_suite in args.compiler_suites:
 
-                    #axs_fl[i].set_title(dset.titles[comm])
-                    # -----------------------------------------------------------
-                    # Add bar to figure:
-                    tag = machine + '-' + compiler_suite + '-' + comm + '-' + args.test_case + '-' + grid
+        if not compiler_suite in dset.configs[machine]['compilers']:
+            continue
 
-                    configs = dset.configs[machine]
+        fig, axs = plt.subplots(nrows=nrows,
+                                ncols=ncols,
+                                sharey=True,
+                                sharex=sharex,
+                                figsize=(4.5*ncols, 4.25*nrows),
+                                dpi=400,
+                                squeeze=False)
+        axs_fl = axs.flatten()
 
-                    groups = list(configs['groups'].keys())
+        data = volume[volume['compiler'] == compiler_suite]
+
+        for i, comm in enumerate(comms):
+
+            axs_fl[i].grid(which='both', linestyle='dashed', linewidth=0.25)
+
+            axs_fl[i].set_title(dset.titles[comm])
+
+            for j, grid in enumerate(grids):
+                for k, op in enumerate(comm_volume.operations):
+                    sel = (data['comm'] == comm) & (data['grid'] == grid) & \
+                          (data['operation'] == op)
+                    # e.g. the MPI allreduce call counts are not split by layer
+                    for call, d in data[sel].groupby('timer', observed=True):
+                        label = None
+                        if j == 0:
+                            label = op
+
+                        axs_fl[i].plot(d['nodes'],
+                                       d[column],
+                                       color=cmap(k),
+                                       linewidth=1,
+                                       marker=args.markers[j],
+                                       markersize=5,
+                                       label=label)
+
+                        # superlinear growth of the total number of calls
+                        flagged = d[d['superlinear']]
+                        axs_fl[i].plot(flagged['nodes'],
+                                       flagged[column],
+                                       color='red',
+                                       linestyle='none',
+                                       marker=args.markers[j],
+                                       markersize=9,
+                                       markerfacecolor='none')
 
-                    n_conf = sum(tag in group for group in groups)
+            # -----------------------------------------------------------
+            # Create legend where markers share a single legend entry:
+            add_legend(axs_fl[i],
+                       add_ideal_scaling=False,
+                       alignment='left')
 
-                    for group in groups:
+            axs_fl[i].set_yscale('log', base=10)
+            axs_fl[i].set_xscale('log', base=2)
 
-                        if not tag in group:
-                            continue
+            if i >= (nrows - 1) * ncols:
+                axs_fl[i].set_xlabel('number of nodes (1 node = ' + \
+                    str(dset.configs[machine]['ntasks_per_node']) + ' cores)')
 
-                        config = configs['groups'][group]
+        for i in range(nrows):
+            axs[i, 0].set_ylabel(ylabels[args.comm_stats])
 
-                        nodes = np.asarray(config['nodes'])
-                        min_data, max_data = dset.get_comm_stats(config, nodes, stat)
+        # -----------------------------------------------------------
+        # Save figure:
+        plt.tight_layout()
 
-                        print(stat[0], "\tmin:", min(min_data[stat[0]]), "\tmax:", max(max_data[stat[0]]))
-                        print(stat[1], "\tmin:", min(min_data[stat[1]]), "\tmax:", max(max_data[stat[1]]))
+        if not os.path.exists(args.output_dir):
+            os.makedirs(args.output_dir)
 
-                        #axs_fl[i].plot(nodes, max_data[stat[0]],
-                                       #color=cmap(0),
-                                       #linewidth=1,
-                                       #marker=args.markers[0],
-                                       #markersize=5)
+        tag = ''
+        if dset.use_subcomm:
+            tag = '-subcomm'
 
-                        #axs_fl[i].plot(nodes, max_data[stat[1]],
-                                       #color=cmap(1),
-                                       #linewidth=1,
-                                       #marker=args.markers[1],
-                                       #markersize=5)
+        fname = os.path.join(args.output_dir, machine + '-' + compiler_suite + \
+            '-' + args.test_case + tag + '-comm-stats')
+        plt.savefig(fname + '.pdf', bbox_inches='tight')
+        plt.close()
 
-                    # -----------------------------------------------------------
-                    # Create legend where markers share a single legend entry:
-                    #add_legend(axs_fl[i],
-                            ##title=r'\bfseries{' + dset.titles[comm] + r'}',
-                            #alignment='left')
+        data.to_csv(fname + '.csv', index=False)
+        fnames += [fname + '.pdf', fname + '.csv']
 
-                    #axs_fl[i].set_yscale('log', base=10)
-                    #axs_fl[i].set_xscale('log', base=2)
+        flagged = data[data['superlinear']]
+        if len(flagged) > 0:
+            print("Superlinear growth of the total number of calls (" + compiler_suite + "):")
+            print(flagged[['comm', 'grid', 'timer', 'nodes', 'ranks', 'per_rank',
+                           'growth']].to_string(index=False))
 
-                    #if i >= (nrows - 1) * ncols:
-                        #axs_fl[i].set_xlabel('number of nodes (1 node = ' + \
-                            #str(dset.configs[machine]['ntasks_per_node']) + ' cores)')
+    return fnames
 
-                #if nrows > 1:
-                    #for i in range(nrows):
-                        #axs[i, 0].set_ylabel('number of calls')
-                #else:
-                    #axs[0].set_ylabel('number of calls')
+# :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
 
-            ## -----------------------------------------------------------
-            ## Save figure:
-            #plt.tight_layout()
+def generate_scaling_plot(dset, machine, args):
 
-            #if not os.path.exists(args.output_dir):
-                #os.makedirs(args.output_dir)
+    print("Generating a " + args.plot + " plot for " + machine + ".")
 
-            #tag = ''
-            #if dset.use_subcomm:
-                #tag = '-subcomm'
+    fnames = []
 
-            #plt.savefig(os.path.join(args.output_dir, machine + '-' + compiler_suite + \
-                #'-' + args.test_case + tag + '-comm-stats.pdf'), bbox_inches='tight')
-            #plt.close()
+    n = len(dset.configs[machine]['comms'])
+    nrows = int(np.sqrt(n))
+    ncols = int(n / nrows + 0.5)
 
-    # :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+    sharex = (nrows > 1)
 
-    def generate_scaling_plot(dset, machine, args):
+    comms = sorted(dset.configs[machine]['comms'])
 
-        print("Generating a " + args.plot + " plot for " + machine + ".")
+    for compiler_suite in args.compiler_suites:
 
-        n = len(dset.configs[machine]['comms'])
-        nrows = int(np.sqrt(n))
-        ncols = int(n / nrows + 0.5)
+        if not compiler_suite in dset.configs[machine]['compilers']:
+            continue
 
-        sharex = (nrows > 1)
+        fig, axs = plt.subplots(nrows=nrows,
+                                ncols=ncols,
+                                sharey=True,
+                                sharex=sharex,
+                                figsize=(4.5*ncols, 4.25*nrows),
+                                dpi=400)
+        axs_fl = axs.flatten()
 
-        comms = sorted(dset.configs[machine]['comms'])
+        for i, comm in enumerate(comms):
+            axs_fl[i].grid(which='both', linestyle='dashed', linewidth=0.25)
 
-        for compiler_suite in args.compiler_suites:
+            axs_fl[i].set_title(dset.titles[comm])
+            # -----------------------------------------------------------
+            # Add individual scaling:
+            tag = machine + '-' + compiler_suite + '-' + comm + '-' + args.test_case
 
-            if not compiler_suite in dset.configs[machine]['compilers']:
-                continue
+            configs = dset.configs[machine]
 
-            fig, axs = plt.subplots(nrows=nrows,
-                                    ncols=ncols,
-                                    sharey=True,
-                                    sharex=sharex,
-                                    figsize=(4.5*ncols, 4.25*nrows),
-                                    dpi=400)
-            axs_fl = axs.flatten()
+            cmap = plt.get_cmap(args.colour_map)
 
-            for i, comm in enumerate(comms):
-                axs_fl[i].grid(which='both', linestyle='dashed', linewidth=0.25)
+            markers = args.markers
 
-                axs_fl[i].set_title(dset.titles[comm])
-                # -----------------------------------------------------------
-                # Add individual scaling:
-                tag = machine + '-' + compiler_suite + '-' + comm + '-' + args.test_case
+            groups = list(configs['groups'].keys())
 
-                configs = dset.configs[machine]
+            n_conf = sum(tag in group for group in groups)
 
-                cmap = plt.get_cmap(args.colour_map)
+            if n_conf > len(markers):
+                raise RuntimeError('Not enough markers. ' + \
+                    'Please add more to the command line with --markers')
 
-                markers = args.markers
+            found = True
+            j = 0
+            for group in groups:
 
-                groups = list(configs['groups'].keys())
+                if not tag in group:
+                    continue
 
-                n_conf = sum(tag in group for group in groups)
+                config = configs['groups'][group]
 
-                if n_conf > len(markers):
-                    raise RuntimeError('Not enough markers. ' + \
-                        'Please add more to the command line with --markers')
+                add_to_plot(axs_fl[i],
+                            dset,
+                            nruns=args.nruns,
+                            config=config,
+                            timings=args.timings,
+                            cmap=cmap,
+                            marker=markers[j],
+                            add_label=True,
+                            add_ideal_scaling=args.add_ideal_scaling,
+                            error_bars=args.error_bars,
+                            fit_model=args.fit_model,
+                            predict_nodes=args.predict_nodes)
 
-                found = True
-                j = 0
-                for group in groups:
+                j = j + 1
+                found = False
 
-                    if not tag in group:
-                        continue
+            # -----------------------------------------------------------
+            # Create legend where markers share a single legend entry:
+            add_legend(axs_fl[i],
+                       add_ideal_scaling=args.add_ideal_scaling,
+                        ##title=r'\bfseries{' + dset.titles[comm] + r'}',
+                       alignment='left')
 
-                    config = configs['groups'][group]
+            axs_fl[i].set_yscale('log', base=10)
+            axs_fl[i].set_xscale('log', base=2)
 
-                    add_to_plot(axs_fl[i],
-                                dset,
-                                nruns=args.nruns,
-                                config=config,
-                                timings=args.timings,
-                                cmap=cmap,
-                                marker=markers[j],
-                                add_label=True,
-                                add_ideal_scaling=args.add_ideal_scaling)
+            if i >= (nrows - 1) * ncols:
+                axs_fl[i].set_xlabel('number of nodes (1 node = ' + \
+                    str(dset.configs[machine]['ntasks_per_node']) + ' cores)')
 
-                    j = j + 1
-                    found = False
+        if nrows > 1:
+            for i in range(nrows):
+                axs[i, 0].set_ylabel('run time (s)')
+        else:
+            axs[0].set_ylabel('run time (s)')
 
-                # -----------------------------------------------------------
-                # Create legend where markers share a single legend entry:
-                add_legend(axs_fl[i],
-                           add_ideal_scaling=args.add_ideal_scaling,
-                            ##title=r'\bfseries{' + dset.titles[comm] + r'}',
-                           alignment='left')
+        # -----------------------------------------------------------
+        # Save figure:
+        plt.tight_layout()
 
-                axs_fl[i].set_yscale('log', base=10)
-                axs_fl[i].set_xscale('log', base=2)
+        if not os.path.exists(args.output_dir):
+            os.makedirs(args.output_dir)
 
-                if i >= (nrows - 1) * ncols:
-                    axs_fl[i].set_xlabel('number of nodes (1 node = ' + \
-                        str(dset.configs[machine]['ntasks_per_node']) + ' cores)')
+        tag = ''
+        if dset.use_subcomm:
+            tag = '-subcomm'
 
-            if nrows > 1:
-                for i in range(nrows):
-                    axs[i, 0].set_ylabel('run time (s)')
-            else:
-                axs[0].set_ylabel('run time (s)')
+        fname = os.path.join(args.output_dir, machine + '-' + compiler_suite + \
+            '-' + args.test_case + tag + '-scaling.pdf')
+        plt.savefig(fname, bbox_inches='tight')
+        plt.close()
+        fnames.append(fname)
 
-            # -----------------------------------------------------------
-            # Save figure:
-            plt.tight_layout()
+    return fnames
 
-            if not os.path.exists(args.output_dir):
-                os.makedirs(args.output_dir)
+# :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
 
-            tag = ''
-            if dset.use_subcomm:
-                tag = '-subcomm'
+def generate_strong_efficiency_plot(dset, machine, args):
 
-            plt.savefig(os.path.join(args.output_dir, machine + '-' + compiler_suite + \
-                '-' + args.test_case + tag + '-scaling.pdf'), bbox_inches='tight')
-            plt.close()
+    timing = args.timings[0]
 
-    # :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+    print("Generating a " + args.plot + " plot of " + timing + " for " + machine + ".")
 
-    def generate_strong_efficiency_plot(dset, machine, args):
+    fnames = []
 
-        timing = args.timings[0]
+    tf = timing.replace(' ', '-')
+    for c in ['(', ')']:
+        tf = tf.replace(c, '')
 
-        print("Generating a " + args.plot + " plot of " + timing + " for " + machine + ".")
+    cmap = plt.get_cmap(args.colour_map)
 
-        tf = timing.replace(' ', '-')
-        for c in ['(', ')']:
-            tf = tf.replace(c, '')
+    grids = dset.get_sorted_grids(machine)
 
-        cmap = plt.get_cmap(args.colour_map)
+    n = len(grids)
+    nrows = int(np.sqrt(n))
+    ncols = int(n / nrows + 0.5)
 
-        grids = dset.get_sorted_grids(machine)
+    for compiler_suite in args.compiler_suites:
 
-        n = len(grids)
-        nrows = int(np.sqrt(n))
-        ncols = int(n / nrows + 0.5)
+        if not compiler_suite in dset.configs[machine]['compilers']:
+            continue
 
         # -----------------------------------------------------------
         # Create figure:
@@ -516,7 +711,8 @@ try:
                                 sharey=True,
                                 sharex=False,
                                 figsize=(5*ncols, 5*nrows),
-                                dpi=400)
+                                dpi=400,
+                                squeeze=False)
         axs_fl = axs.flatten()
         for j, grid in enumerate(grids):
 
@@ -530,27 +726,27 @@ try:
                         r') x (ny = ' + str(ny) + \
                         r') x (nz = ' + str(nz) + r')'
 
-            axs[j].set_title(title)
+            axs_fl[j].set_title(title)
+
+            axs_fl[j].grid(which='both', linestyle='dashed', linewidth=0.25, axis='y')
 
-            axs[j].grid(which='both', linestyle='dashed', linewidth=0.25, axis='y')
+            axs_fl[j].axhline(y=1, linestyle='solid', color='black', linewidth=0.75)
 
             # -----------------------------------------------------------
             # Add individual scaling:
-            comms = sorted(args.comm)
+            comms = sorted(dset.configs[machine]['comms'].intersection(args.comm))
             n_comms = len(comms)
-            width= 0.4 / n_comms
+            width = 0.8 / n_comms
             for i, comm in enumerate(comms):
-                tag = args.compiler_suite + '-' + comm + '-' + args.test_case + '-' + grid
-
-                axs[j].axhline(y=1, linestyle='solid', color='black', linewidth=0.75)
+                tag = machine + '-' + compiler_suite + '-' + comm + '-' + args.test_case + '-' + grid
 
                 label = dset.titles[comm]
                 offset = width * (i - 0.5*n_comms)
-                add_bar(axs[j],
+                add_bar(axs_fl[j],
                         dset,
+                        machine,
                         tag,
                         timing,
-                        comm,
                         args,
                         offset=offset,
                         width=width,
@@ -559,76 +755,71 @@ try:
                         hatch=args.hatches[i],
                         label=label)
 
-                axs[j].legend(loc='upper left', ncols=int((n_comms+1) / 2))
+            axs_fl[j].legend(loc='upper left', ncols=int((n_comms+1) / 2))
 
-                axs[j].set_xlabel('number of nodes (1 node = 128 cores)')
-                axs[j].set_ylim([0, 1.6])
+            axs_fl[j].set_xlabel('number of nodes (1 node = ' + \
+                str(dset.configs[machine]['ntasks_per_node']) + ' cores)')
+            axs_fl[j].set_ylim(bottom=0)
 
-        if nrows > 1:
-            for i in range(nrows):
-                axs[i, 0].set_ylabel('strong parallel efficiency')
-        else:
-            axs[0].set_ylabel('strong parallel efficiency')
+        for i in range(nrows):
+            axs[i, 0].set_ylabel('strong parallel efficiency')
 
 
         # -----------------------------------------------------------
         # Save figure:
         plt.tight_layout()
-        fname = args.compiler_suite + '-' + tf + '-' + args.plot + '.pdf'
 
         if not os.path.exists(args.output_dir):
             os.makedirs(args.output_dir)
 
+        tag = ''
+        if dset.use_subcomm:
+            tag = '-subcomm'
+
+        fname = os.path.join(args.output_dir, machine + '-' + compiler_suite + \
+            '-' + args.test_case + tag + '-' + tf + '-' + args.plot + '.pdf')
         plt.savefig(fname, bbox_inches='tight')
         plt.close()
+        fnames.append(fname)
 
+    return fnames
 
-    # :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
 
-    def add_bar(ax, dset, machine, tag, timing, comm, args, offset, **kwargs):
+# :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
 
-        configs = dset.configs[machine]
+def add_bar(ax, dset, machine, tag, timing, args, offset, **kwargs):
 
-        markers = args.markers
+    configs = dset.configs[machine]['groups']
 
-        groups = list(configs.keys())
+    for group in configs.keys():
 
-        n_conf = sum(tag in group for group in groups)
+        if not tag == group:
+            continue
 
-        if n_conf > len(markers):
-            raise RuntimeError('Not enough markers. ' + \
-                'Please add more to the command line with --markers')
+        config = configs[group]
 
-        for group in groups:
-
-            if not tag in group:
-                continue
-
-            config = configs[group]
-
-            nodes = np.asarray(config['nodes'])
+        nodes = np.asarray(config['nodes'])
 
-            avg_data, std_data = dset.get_timing(config, nodes, args.timings)
+        avg_data, std_data = dset.get_timing(config, nodes, [timing], args.nruns)
 
-            # Calculate strong parallel efficiency:
-            #   S(p) = T(1) / T(p)
-            #   E(p) = S(p) / p
-            speedup = avg_data[timing][0] / avg_data[timing]
-            p = nodes / nodes[0]
-            eff = speedup / p
+        # Calculate strong parallel efficiency (see efficiency.py):
+        #   S(p) = T(1) / T(p)
+        #   E(p) = S(p) / p
+        speedup, eff, serial_fraction = efficiency.strong_efficiency(nodes, avg_data[timing])
 
-            x = np.arange(len(eff))
-            ax.bar(x=x+offset,
-                   height=eff,
-                   align='edge',
-                   **kwargs)
+        x = np.arange(len(eff))
+        ax.bar(x=x+offset,
+               height=eff,
+               align='edge',
+               **kwargs)
 
-            ax.set_xticks(x, nodes)
+        ax.set_xticks(x, nodes)
 
-    # :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
-    # Actual 'main':
-    #
 
+# :::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::
+# Actual 'main':
+#
+def get_parser():
     parser = argparse.ArgumentParser(
             description="Generate benchmark plots."
     )
@@ -684,7 +875,7 @@ try:
         "--markers",
         type=str,
         nargs='+',
-        default=['o', 's', 'D'],
+        default=['o', 's', 'D', '^'],
         help="Markers for line plot."
     )
 
@@ -717,6 +908,52 @@ try:
         help="Use sub-communicator data."
     )
 
+    parser.add_argument(
+        "--roots",
+        type=str,
+        nargs='+',
+        default=None,
+        help="Sub-directories of the data directory to search for the data of the test case " + \
+             "(in order of precedence). Default: the test case directory"
+    )
+
+    parser.add_argument(
+        "--index",
+        type=str,
+        default=None,
+        help="Index of the run artefacts written by discover.py, updated by this script."
+    )
+
+    parser.add_argument(
+        "--store",
+        type=str,
+        default=None,
+        help="Read the data from the store written by timing_store.py " + \
+             "instead of the data directory."
+    )
+
+    parser.add_argument(
+        "--nthreads",
+        type=int,
+        default=timing_store.default_nthreads,
+        help="Number of threads reading the CSV files. Default: " + \
+             str(timing_store.default_nthreads)
+    )
+
+    parser.add_argument(
+        "--nprocs",
+        type=int,
+        default=render.default_nprocs,
+        help="Number of processes rendering the figures. Default: " + \
+             str(render.default_nprocs) + " (number of available cores)"
+    )
+
+    parser.add_argument(
+        "--rebuild",
+        action='store_true',
+        help="Render all figures, also the unchanged ones of the figure cache."
+    )
+
     parser.add_argument(
         "--output-dir",
         type=str,
@@ -737,30 +974,115 @@ try:
         help="Add ideal scaling line to plot."
     )
 
-    args = parser.parse_args()
+    parser.add_argument(
+        "--error-bars",
+        type=str,
+        default='std',
+        choices=['std', 'ci'],
+        help="Error bars of the run time: standard deviation or " + \
+             "95%% bootstrap confidence interval of the mean."
+    )
+
+    parser.add_argument(
+        "--comm-stats",
+        type=str,
+        default='rank',
+        choices=['rank', 'total', 'merge'],
+        help="Normalisation of the number of calls of the comm-stats plot."
+    )
+
+    parser.add_argument(
+        "--fit-model",
+        type=str,
+        default=None,
+        choices=list(scaling_model.models.keys()),
+        help="Overlay the run time of a scaling model (see scaling_model.py)."
+    )
+
+    parser.add_argument(
+        "--predict-nodes",
+        type=int,
+        nargs='*',
+        default=[],
+        help="Number of nodes to show the predicted run time of --fit-model for."
+    )
+
+    return parser
+
+
+# Index of the run artefacts (see discover.py), updated and saved if --index is given.
+def get_index(args):
+    if args.index is None:
+        return None
 
+    index = None
+    if os.path.exists(args.index):
+        index = discover.load(args.index)
+    index, _ = discover.update(args.path, ['.'], index, args.nthreads)
+    discover.save(index, args.index)
+    return index
+
+
+# One figure (task, see render.py) per machine and compiler suite. The data of
+# the store (or of the data directory) and the index are read once unless they
+# are passed, e.g. by the pytools command 'all'.
+def get_tasks(args, data=None, index=None):
     if args.nruns == -1:
         print("Use all available timing data for plotting.")
     else:
         print("Use " + str(args.nruns) + " timing data for plotting.")
 
-    plt.rcParams['text.usetex'] = args.enable_latex
+    match args.plot:
+        case 'weak-strong-scaling':
+            generate_plot = generate_scaling_plot
+        case 'strong-efficiency':
+            generate_plot = generate_strong_efficiency_plot
+        case 'comm-stats':
+            generate_plot = generate_stats_plot
+        case _:
+            # raise error even though it is impossible to land here
+            raise RuntimeError("No plotting functionality '" + args.plot + "'.")
+    # done match
+
+    if index is None:
+        index = get_index(args)
+
+    dset = DataSet(args.path, args.compiler_suites, args.test_case, args.use_subcomm,
+                   args.store, args.nthreads, data, args.roots, index)
 
-    dset = DataSet(args.path, args.compiler_suites, args.test_case, args.use_subcomm)
+    # e.g. no sub-communicator runs of the test case
+    if dset.configs == {}:
+        tag = ''
+        if args.use_subcomm:
+            tag = ' with sub-communicator'
+        print("No benchmark data of '" + args.test_case + "'" + tag + " found. No figures created.")
+        return []
 
+    dset.prepare(args)
+
+    rc = dict(rc_params, **{'text.usetex': args.enable_latex})
+
+    # arguments that do not change the figures
+    ignored = ['path', 'store', 'nthreads', 'nprocs', 'rebuild', 'roots', 'index']
+
+    tasks = []
     for machine in dset.configs.keys():
-        match args.plot:
-            case 'weak-strong-scaling':
-                generate_scaling_plot(dset, machine, args=args)
-            case 'strong-efficiency':
-                generate_strong_efficiency_plot(dset, machine, args=args)
-            case 'comm-stats':
-                generate_stats_plot(dset, machine, args=args)
-            case _:
-                # raise error even though it is impossible to land here
-                raise RuntimeError("No plotting functionality '" + args.plot + "'.")
-        # done match
+        for compiler_suite in args.compiler_suites:
+            if compiler_suite in dset.configs[machine]['compilers']:
+                task_args = argparse.Namespace(**dict(vars(args), compiler_suites=[compiler_suite]))
+                key = [dict((k, v) for k, v in vars(task_args).items() if not k in ignored),
+                       machine, dset.get_slice(machine, compiler_suite)]
+                tasks.append((rc, generate_plot, (dset, machine, task_args), key))
+    return tasks
+
+
+def main(args, data=None):
+    render.render(get_tasks(args, data), args.nprocs,
+                  os.path.join(args.output_dir, render.default_cache), args.rebuild)
 
-except Exception as ex:
-    print(ex, flush=True)
 
+if __name__ == '__main__':
+    try:
+        main(get_parser().parse_args())
+    except Exception as ex:
+        print(ex, flush=True)
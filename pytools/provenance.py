@@ -0,0 +1,199 @@
+import pandas as pd
+import numpy as np
+import os
+import argparse
+from scipy.stats import mannwhitneyu, false_discovery_control
+import timing_store
+import aggregate
+import job_log
+
+#
+# Toolchain provenance of every run: the modules loaded by its job (see
+# job_log.py) joined to the timing store. Runs of the same configuration
+# (all columns of aggregate.group_columns apart from the directory) that were
+# measured with different module stacks are compared timer by timer with a
+# Mann-Whitney U test of the run times. The p-values of all comparisons are
+# adjusted for the false discovery rate (Benjamini-Hochberg).
+#
+
+default_timers = ['parcel merge (total)', 'find nearest', 'build graphs', 'resolve graphs']
+
+# modules that do not affect the run time
+ignored_modules = ['bolt', 'epcc-setup-env', 'load-epcc-module', 'epcc/utils', 'git', 'libtool']
+
+
+def get_name(module):
+    return module.rsplit('/', 1)[0]
+
+
+def get_stack(modules):
+    if not isinstance(modules, str):
+        return ''
+    return ' '.join([m for m in modules.split() if not get_name(m) in ignored_modules])
+
+
+# Modules of stack b that are not in stack a, e.g. 'cce/15.0.0 -> cce/16.0.1'.
+def diff_stacks(a, b):
+    a = dict((get_name(m), m) for m in a.split())
+    b = dict((get_name(m), m) for m in b.split())
+
+    changes = []
+    for name in sorted(set(a.keys()) | set(b.keys())):
+        old = a.get(name, '-')
+        new = b.get(name, '-')
+        if not old == new:
+            changes.append(old + ' -> ' + new)
+    return '; '.join(changes)
+
+
+# Runs of the store with the module stack of their job.
+def join(runs, logs, df):
+    logs = logs.assign(stack=logs['modules'].map(get_stack))
+    runs = runs.merge(logs[['directory', 'jobid', 'stack']], on=['directory', 'jobid'])
+    return job_log.match_runs(runs, df, ['jobid', 'stack'])
+
+
+# Compares the runs of consecutive module stacks (ordered by job id) of
+# each configuration that was measured with more than one stack.
+def compare(df, timers=default_timers, min_runs=3, alpha=0.05):
+    keys = [c for c in aggregate.group_columns if not c in ['directory', 'kind']]
+
+    nstacks = df.groupby(keys, observed=True)['stack'].transform('nunique')
+    df = df[nstacks > 1]
+
+    rows = []
+    for key, group in df.groupby(keys, observed=True):
+        order = group.groupby('stack')['jobid'].min().sort_values().index
+        for old, new in zip(order[:-1], order[1:]):
+            a = group[group['stack'] == old]
+            b = group[group['stack'] == new]
+            if len(a) < min_runs or len(b) < min_runs:
+                continue
+
+            for timer in timers:
+                x = a[timer].dropna().to_numpy()
+                y = b[timer].dropna().to_numpy()
+                if len(x) < min_runs or len(y) < min_runs:
+                    continue
+
+                row = dict(zip(keys, key))
+                row['timer'] = timer
+                row['changes'] = diff_stacks(old, new)
+                row['n_old'] = len(x)
+                row['n_new'] = len(y)
+                row['median_old'] = np.median(x)
+                row['median_new'] = np.median(y)
+                row['pvalue'] = mannwhitneyu(x, y, alternative='two-sided').pvalue
+                rows.append(row)
+
+    if rows == []:
+        return pd.DataFrame(columns=keys + ['timer', 'changes', 'n_old', 'n_new', 'median_old',
+                                            'median_new', 'rel_change', 'pvalue', 'qvalue',
+                                            'significant'])
+
+    result = pd.DataFrame(rows)
+    result['rel_change'] = result['median_new'] / result['median_old'] - 1.0
+    result['qvalue'] = false_discovery_control(result['pvalue'].to_numpy())
+    result['significant'] = result['qvalue'] < alpha
+    return result
+
+
+if __name__ == '__main__':
+    try:
+        parser = argparse.ArgumentParser(
+                description="Join the module versions of the jobs to the timing store " + \
+                            "and compare the timers of runs with different module versions."
+        )
+
+        parser.add_argument(
+            "--path",
+            type=str,
+            default='.',
+            help="Data directory.",
+        )
+
+        parser.add_argument(
+            "--subdirs",
+            type=str,
+            nargs='+',
+            default=['.'],
+            help="Sub-directories of the data directory to search for logs.",
+        )
+
+        parser.add_argument(
+            "--store",
+            type=str,
+            default=timing_store.default_store,
+            help="Store written by timing_store.py. Default: '" + timing_store.default_store + "'",
+        )
+
+        parser.add_argument(
+            "--timings",
+            type=str,
+            nargs='+',
+            default=default_timers,
+            help="Timer data to compare.",
+        )
+
+        parser.add_argument(
+            "--min-runs",
+            type=int,
+            default=3,
+            help="Minimum number of runs per module stack.",
+        )
+
+        parser.add_argument(
+            "--alpha",
+            type=float,
+            default=0.05,
+            help="False discovery rate.",
+        )
+
+        parser.add_argument(
+            "--nthreads",
+            type=int,
+            default=timing_store.default_nthreads,
+            help="Number of threads reading the logs. Default: " + str(timing_store.default_nthreads),
+        )
+
+        parser.add_argument(
+            "--output-dir",
+            type=str,
+            default=".",
+            help="Output directory of the tables."
+        )
+
+        args = parser.parse_args()
+
+        runs, steps, logs = job_log.ingest(args.path, args.subdirs, args.nthreads)
+        df = join(runs, logs, timing_store.load(args.store))
+
+        if not os.path.exists(args.output_dir):
+            os.makedirs(args.output_dir)
+
+        columns = [c for c in timing_store.index_columns if not c == 'kind'] + ['jobid', 'stack']
+        fname = os.path.join(args.output_dir, 'provenance.csv')
+        df[columns].to_csv(fname, index=False)
+        print("Wrote the module stack of", len(df), "runs to '" + fname + "'.")
+
+        stacks = df.groupby(['machine', 'compiler'], observed=True)['stack'].nunique()
+        print()
+        print("Number of module stacks per machine and compiler:")
+        print(stacks.to_string())
+
+        result = compare(df, args.timings, args.min_runs, args.alpha)
+        fname = os.path.join(args.output_dir, 'provenance-comparison.csv')
+        result.to_csv(fname, index=False)
+
+        print()
+        if len(result) == 0:
+            print("No configuration was run with more than one module stack.")
+        else:
+            print("Wrote", len(result), "comparisons to '" + fname + "'.")
+            significant = result[result['significant']]
+            print(len(significant), "timer(s) changed significantly with the module versions:")
+            print(significant[['machine', 'compiler', 'comm', 'test_case', 'grid', 'nodes',
+                               'subcomm', 'timer', 'rel_change', 'qvalue', 'changes']].to_string(index=False))
+
+    except Exception as ex:
+        print(ex, flush=True)
@@ -0,0 +1,136 @@
+import pandas as pd
+import os
+import glob
+import json
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+import matplotlib.pyplot as plt
+
+#
+# Renders independent figures in a pool of processes. A task is a tuple
+#   (rc, function, arguments, key)
+# where 'rc' are the matplotlib settings of the figure and 'function' (a
+# module-level function) creates the figure and returns the names of the files
+# it wrote. The arguments are pickled and sent to the worker, hence they should
+# hold the aggregated data of the figure (e.g. the summary statistics) and not
+# the raw data.
+#
+# The 'key' holds everything the figure depends on (its slice of the data and
+# the relevant command line arguments). Its hash, together with the settings,
+# the name of the function and the hash of the pytools sources, addresses the
+# figure in the cache (a JSON file mapping each hash to the files written). A
+# task is skipped if its hash is in the cache and all its files exist.
+#
+
+# cores this process may run on
+if hasattr(os, 'sched_getaffinity'):
+    default_nprocs = len(os.sched_getaffinity(0))
+else:
+    default_nprocs = os.cpu_count()
+
+default_cache = '.figure-cache.json'
+
+
+def _update(h, obj):
+    if isinstance(obj, (pd.DataFrame, pd.Series)):
+        h.update(obj.to_csv().encode())
+    elif isinstance(obj, dict):
+        h.update(b'{')
+        for k in sorted(obj.keys(), key=str):
+            _update(h, k)
+            _update(h, obj[k])
+        h.update(b'}')
+    elif isinstance(obj, (list, tuple)):
+        h.update(b'[')
+        for item in obj:
+            _update(h, item)
+        h.update(b']')
+    elif isinstance(obj, (set, frozenset)):
+        _update(h, sorted(obj, key=str))
+    else:
+        h.update(repr(obj).encode())
+        h.update(b';')
+
+
+def get_hash(obj):
+    h = hashlib.sha256()
+    _update(h, obj)
+    return h.hexdigest()
+
+
+# Hash of all pytools sources, i.e. any change of the code renders all figures again.
+def get_version():
+    h = hashlib.sha256()
+    for fname in sorted(glob.glob(os.path.join(os.path.dirname(os.path.abspath(__file__)), '*.py'))):
+        with open(fname, 'rb') as f:
+            h.update(f.read())
+    return h.hexdigest()
+
+
+def get_task_hash(task, version):
+    rc, function, arguments, key = task
+    return get_hash([version, rc, function.__qualname__, key])
+
+
+def load_cache(fname):
+    if not os.path.exists(fname):
+        return {}
+    with open(fname) as f:
+        return json.load(f)
+
+
+def save_cache(fname, entries):
+    directory = os.path.dirname(fname)
+    if not directory == '' and not os.path.exists(directory):
+        os.makedirs(directory)
+    with open(fname, 'w') as f:
+        json.dump(entries, f, indent=1, sort_keys=True)
+
+
+def run_task(rc, function, arguments):
+    with plt.rc_context(rc):
+        return function(*arguments)
+
+
+def _run(tasks, nprocs):
+    nprocs = min(nprocs, len(tasks))
+
+    if nprocs <= 1:
+        return [run_task(*task[:3]) for task in tasks]
+
+    with ProcessPoolExecutor(max_workers=nprocs) as executor:
+        futures = [executor.submit(run_task, *task[:3]) for task in tasks]
+        return [future.result() for future in futures]
+
+
+# Runs all tasks that are not in the cache and raises the error of the first
+# failing task. With one process (or a single task) the tasks run in this
+# process. Without cache (or with 'rebuild') all tasks are run.
+def render(tasks, nprocs=default_nprocs, cache=None, rebuild=False):
+    if cache is None:
+        _run(tasks, nprocs)
+        return
+
+    entries = load_cache(cache)
+    version = get_version()
+
+    todo = []
+    hashes = []
+    for task in tasks:
+        h = get_task_hash(task, version)
+        if not rebuild and h in entries.keys() and \
+           all(os.path.exists(fname) for fname in entries[h]):
+            continue
+        todo.append(task)
+        hashes.append(h)
+
+    for h, fnames in zip(hashes, _run(todo, nprocs)):
+        # remove the entries of previous versions of the same files
+        for old in [k for k, v in entries.items() if not set(v).isdisjoint(fnames)]:
+            del entries[old]
+        entries[h] = sorted(fnames)
+
+    save_cache(cache, entries)
+
+    print("Rendered", len(todo), "figure(s), skipped", len(tasks) - len(todo),
+          "unchanged figure(s) (cache '" + cache + "').")
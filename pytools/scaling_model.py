@@ -0,0 +1,272 @@
+import pandas as pd
+import numpy as np
+import os
+import argparse
+import json
+from scipy.optimize import least_squares
+from scipy.sparse import csr_matrix
+from scipy.special import ndtri
+import timing_store
+import aggregate
+import discover
+
+#
+# Fit scaling models to the mean run time of the timers (see aggregate.py) and
+# predict the run time at node counts that were not measured. With p the number
+# of nodes, w = nx * ny * nz / p the number of cells per node and h = sqrt(w * nz)
+# the number of halo cells per node (the domain is decomposed in x and y):
+#
+#   amdahl:      T = a + b / p                      (fixed grid, one fit per grid)
+#   linear-work: T = a + b * w                      (all grids of a configuration)
+#   comm:        T = b * w + c * h + d * log2(p)    (all grids of a configuration)
+#
+# where 'linear-work' is linear in the number of cells per node (constant under
+# weak scaling) and 'comm' splits the run time into computation, a bandwidth
+# term and a latency term of the collective operations. All parameters are
+# non-negative.
+#
+# All models are linear in the parameters, hence the fits of all configurations
+# and timers are a single (sparse) least squares problem. The residuals are
+# relative to the measured run time, such that fast and slow timers have the
+# same weight. The uncertainty of a prediction follows from the covariance of the
+# parameters of its configuration.
+#
+
+models = {
+    'amdahl':      ['a', 'b'],
+    'linear-work': ['a', 'b'],
+    'comm':        ['b', 'c', 'd']
+}
+
+# columns identifying the data of one fit
+series_columns = [c for c in aggregate.group_columns if not c in ['grid', 'nx', 'ny', 'nz', 'nodes']] + ['timer']
+
+
+def get_series_columns(model):
+    if model == 'amdahl':
+        return series_columns + ['grid']
+    return series_columns
+
+
+def get_features(model, nodes, nx, ny, nz):
+    p = np.asarray(nodes, dtype=np.float64)
+    w = np.asarray(nx, dtype=np.float64) * np.asarray(ny, dtype=np.float64) * \
+        np.asarray(nz, dtype=np.float64) / p
+
+    match model:
+        case 'amdahl':
+            return np.column_stack([np.ones(len(p)), 1.0 / p])
+        case 'linear-work':
+            return np.column_stack([np.ones(len(p)), w])
+        case 'comm':
+            h = np.sqrt(w * np.asarray(nz, dtype=np.float64))
+            return np.column_stack([w, h, np.log2(p)])
+        case _:
+            raise RuntimeError("No scaling model called '" + model + "'.")
+
+
+def fit(summary, model):
+    if not model in models.keys():
+        raise RuntimeError("No scaling model called '" + model + "'.")
+
+    keys = get_series_columns(model)
+    params = models[model]
+    k = len(params)
+
+    # timers that are never active cannot be weighted
+    df = summary[summary['mean'] > 0.0]
+    df = df.sort_values(keys + ['nodes']).reset_index(drop=True)
+    group = df.groupby(keys, observed=True, sort=False).ngroup().to_numpy()
+    ngroups = group.max() + 1
+
+    t = df['mean'].to_numpy(dtype=np.float64)
+    X = get_features(model, df['nodes'], df['nx'], df['ny'], df['nz']) / t[:, None]
+
+    # Jacobian of the relative residuals: block-diagonal
+    rows = np.repeat(np.arange(len(t)), k)
+    cols = (group[:, None] * k + np.arange(k)[None, :]).ravel()
+    jac = csr_matrix((X.ravel(), (rows, cols)), shape=(len(t), ngroups * k))
+
+    def residuals(theta):
+        return jac @ theta - 1.0
+
+    # start from the average of each feature
+    x0 = np.zeros((ngroups, k))
+    np.add.at(x0, group, X)
+    x0 = 1.0 / (k * x0)
+    x0[~np.isfinite(x0)] = 0.0
+
+    result = least_squares(residuals,
+                           x0.ravel(),
+                           jac=lambda theta: jac,
+                           bounds=(0.0, np.inf),
+                           method='trf',
+                           tr_solver='lsmr',
+                           x_scale='jac')
+
+    theta = result.x.reshape(ngroups, k)
+    r = result.fun
+
+    # covariance of the parameters of each group
+    nobs = np.bincount(group, minlength=ngroups)
+    rss = np.bincount(group, weights=r ** 2, minlength=ngroups)
+    dof = nobs - k
+    s2 = np.full(ngroups, np.nan)
+    np.divide(rss, dof, out=s2, where=(dof > 0))
+
+    jtj = np.zeros((ngroups, k, k))
+    np.add.at(jtj, group, X[:, :, None] * X[:, None, :])
+    cov = np.linalg.pinv(jtj) * s2[:, None, None]
+
+    fits = df.drop_duplicates(keys)[keys].reset_index(drop=True)
+    fits['model'] = model
+    fits['nobs'] = nobs
+    fits['rmse'] = np.sqrt(rss / nobs)
+    for i, name in enumerate(params):
+        fits[name] = theta[:, i]
+        fits[name + '_std'] = np.sqrt(cov[:, i, i])
+    fits['cov'] = cov.tolist()
+    return fits
+
+
+# Predicted run time and its uncertainty at the configurations of 'points', which
+# need the series columns of the model and the columns 'nodes', 'nx', 'ny' and 'nz'.
+def predict(fits, points, level=0.95):
+    model = fits['model'].iloc[0]
+    keys = get_series_columns(model)
+    params = models[model]
+
+    df = points.merge(fits, on=keys, how='inner')
+
+    X = get_features(model, df['nodes'], df['nx'], df['ny'], df['nz'])
+    theta = df[params].to_numpy(dtype=np.float64)
+    cov = np.array(df['cov'].tolist(), dtype=np.float64).reshape(len(df), len(params), len(params))
+
+    z = ndtri(0.5 * (1.0 + level))
+    mean = (X * theta).sum(axis=1)
+    std = np.sqrt(np.einsum('ni,nij,nj->n', X, cov, X))
+
+    df = df.drop(columns=['cov'] + [c for c in df.columns if c.endswith('_std')])
+    df['predicted'] = mean
+    df['std'] = std
+    df['lower'] = mean - z * std
+    df['upper'] = mean + z * std
+    return df
+
+
+# All measured grids of each series at the given number of nodes.
+def get_points(summary, model, nodes):
+    keys = get_series_columns(model)
+    columns = keys + [c for c in ['grid', 'nx', 'ny', 'nz'] if not c in keys]
+    grids = summary.drop_duplicates(columns)[columns]
+    return grids.merge(pd.DataFrame({'nodes': nodes}), how='cross')
+
+
+def to_json(fits, predictions, fname):
+    data = {
+        'fits':        json.loads(fits.to_json(orient='records')),
+        'predictions': json.loads(predictions.to_json(orient='records'))
+    }
+    with open(fname, 'w') as f:
+        json.dump(data, f, indent=2)
+
+
+if __name__ == '__main__':
+    try:
+        parser = argparse.ArgumentParser(
+                description="Fit scaling models to the timers and predict the run time " + \
+                            "at other numbers of nodes."
+        )
+
+        parser.add_argument(
+            "--store",
+            type=str,
+            default=timing_store.default_store,
+            help="Store written by timing_store.py. Default: '" + timing_store.default_store + "'",
+        )
+
+        parser.add_argument(
+            "--test-case",
+            type=str,
+            default="random",
+            choices=['random', 'read-early', 'read-late'],
+            help="Test case to analyse.",
+        )
+
+        parser.add_argument(
+            "--compiler-suites",
+            type=str,
+            nargs='+',
+            default=['cray', 'gnu'],
+            help="Compiler environment",
+        )
+
+        parser.add_argument(
+            "--timings",
+            type=str,
+            nargs='+',
+            default=['parcel merge (total)', 'find nearest', 'build graphs', 'resolve graphs'],
+            help="Timer data to fit.",
+        )
+
+        parser.add_argument(
+            "--model",
+            type=str,
+            default='comm',
+            choices=list(models.keys()),
+            help="Scaling model.",
+        )
+
+        parser.add_argument(
+            "--nodes",
+            type=int,
+            nargs='+',
+            required=True,
+            help="Number of nodes to predict the run time for.",
+        )
+
+        parser.add_argument(
+            "--nruns",
+            type=int,
+            default=-1,
+            help="Number of runs to use. Default: -1 (use all available)"
+        )
+
+        parser.add_argument(
+            "--level",
+            type=float,
+            default=0.95,
+            help="Confidence level of the prediction."
+        )
+
+        parser.add_argument(
+            "--output",
+            type=str,
+            default='predictions.json',
+            help="Output JSON file of the fits and predictions."
+        )
+
+        args = parser.parse_args()
+
+        # the same runs as plot_scaling.py --fit-model
+        df = timing_store.load(args.store)
+        df = df[df['kind'] == 'timings']
+        directories = discover.get_directories(df, args.test_case, args.compiler_suites)
+        df = discover.select_runs(df, args.test_case, directories)
+
+        if len(df) == 0:
+            raise RuntimeError("No benchmark data of '" + args.test_case + "' found.")
+
+        summary = aggregate.summarise(df, timers=args.timings, nruns=args.nruns, quantiles=[])
+        fits = fit(summary, args.model)
+        predictions = predict(fits, get_points(summary, args.model, args.nodes), args.level)
+
+        to_json(fits, predictions, args.output)
+        print("Wrote", len(fits), "fits and", len(predictions), "predictions to '" + args.output + "'.")
+
+        columns = ['machine', 'compiler', 'comm', 'subcomm', 'grid', 'timer', 'nodes',
+                   'predicted', 'lower', 'upper']
+        print(predictions[columns].to_string(index=False))
+
+    except Exception as ex:
+        print(ex, flush=True)
@@ -0,0 +1,300 @@
+import pandas as pd
+import numpy as np
+import os
+import matplotlib.pyplot as plt
+import argparse
+from scipy.stats import spearmanr
+import timing_store
+import aggregate
+import discover
+import confidence
+
+#
+# Benefit of the sub-communicator: the runs with and without sub-communicator
+# (*-subcomm-timings.csv and *-timings.csv) of the same machine, compiler,
+# communication layer, grid and number of nodes are paired and the speedup
+#
+#       S = T(full communicator) / T(sub-communicator)
+#
+# of the mean run time is computed with a bootstrap confidence interval (see
+# confidence.bootstrap_ratio). The sub-communicator pays off if the lower bound
+# is above 1 and costs if the upper bound is below 1. A configuration with a
+# single run of either variant has no confidence interval and is undecided.
+#
+# The speedup is correlated (Spearman) with the cost of creating the
+# sub-communicator ('create comm' relative to the run time) and with the size
+# of the sub-communicator (% of all ranks) of the Rayleigh-Taylor run the
+# parcels were read from (*_prepare_nearest_subcomm.asc). The read-early and
+# read-late test cases restart from the parcels written at 3 s and 6 s of the
+# prepare run (see rayleigh_taylor/rt-template), hence the size at the step
+# closest to that time is used.
+#
+
+pair_columns = ['machine', 'compiler', 'comm', 'test_case', 'grid', 'nx', 'ny', 'nz', 'nodes']
+
+restart_times = {
+    'read-early': 3.0,
+    'read-late':  6.0
+}
+
+
+# Size (% of all ranks) of the sub-communicator of the prepare run of the grid
+# at the restart time of the test case, NaN if the run is not available.
+def get_subcomm_size(rt_path, nx, ny, nz, test_case):
+    dirname = 'rt-' + str(nx) + 'x' + str(ny) + 'x' + str(nz)
+    fname = os.path.join(rt_path, dirname, 'epic_' + dirname.replace('-', '_') + \
+                         '_prepare_nearest_subcomm.asc')
+    if not os.path.exists(fname):
+        return np.nan
+
+    data = np.loadtxt(fname=fname, comments='#', ndmin=2)
+    i = np.argmin(np.abs(data[:, 0] - restart_times[test_case]))
+    return data[i, 2]
+
+
+# One row per pair of configurations with the speedup of the timer and its
+# confidence interval, and the cost of creating the sub-communicator.
+def pair(df, timer, nruns=-1, nboot=10000, level=0.95, seed=42):
+    df = aggregate.trim_runs(df, nruns)
+
+    rng = np.random.default_rng(seed)
+
+    rows = []
+    for key, group in df.groupby(pair_columns, observed=True):
+        full = group.loc[~group['subcomm'], timer].dropna().to_numpy()
+        sub = group.loc[group['subcomm'], timer].dropna().to_numpy()
+        if len(full) == 0 or len(sub) == 0:
+            continue
+
+        if len(full) < 2 or len(sub) < 2:
+            speedup, lower, upper = full.mean() / sub.mean(), np.nan, np.nan
+        else:
+            speedup, lower, upper = confidence.bootstrap_ratio(full, sub, nboot, level, rng)
+
+        create = group.loc[group['subcomm'], 'create comm'].mean()
+
+        row = dict(zip(pair_columns, key))
+        row.update({'nfull':         len(full),
+                    'nsub':          len(sub),
+                    'full':          full.mean(),
+                    'sub':           sub.mean(),
+                    'speedup':       speedup,
+                    'lower':         lower,
+                    'upper':         upper,
+                    'create_comm':   create,
+                    'create_share':  create / sub.mean()})
+        rows.append(row)
+
+    if rows == []:
+        raise RuntimeError("No configurations with and without sub-communicator found.")
+
+    table = pd.DataFrame(rows)
+    table['verdict'] = np.where(table['lower'] > 1.0, 'pays off',
+                                np.where(table['upper'] < 1.0, 'costs', 'undecided'))
+    return table
+
+
+# Spearman correlation of the speedup with the other columns per machine and
+# over all machines (at least 3 pairs).
+def correlate(table, columns=['create_share', 'subcomm_size', 'nodes']):
+    rows = []
+    groups = [('all', table)] + [(m, d) for m, d in table.groupby('machine', observed=True)]
+    for machine, data in groups:
+        for column in columns:
+            sel = data[['speedup', column]].dropna()
+            rho, pvalue = np.nan, np.nan
+            if len(sel) >= 3 and sel[column].nunique() > 1:
+                rho, pvalue = spearmanr(sel['speedup'], sel[column])
+            rows.append({'machine': machine, 'column': column, 'n': len(sel),
+                         'rho': rho, 'pvalue': pvalue})
+    return pd.DataFrame(rows)
+
+
+# Speedup with confidence interval per number of nodes, one panel per machine.
+def plot_speedup(table, fname, args):
+    titles = aggregate.comm_titles
+    cmap = plt.get_cmap(args.colour_map)
+
+    machines = sorted(table['machine'].unique())
+    comms = [c for c in titles.keys() if c in table['comm'].unique()]
+
+    fig, axs = plt.subplots(nrows=1, ncols=len(machines), squeeze=False,
+                            figsize=(4.5*len(machines), 4.25), dpi=400)
+
+    for ax, machine in zip(axs[0], machines):
+        data = table[table['machine'] == machine]
+        grids = sorted(data['grid'].unique(), key=lambda g: data[data['grid'] == g]['nodes'].min())
+        if len(grids) > len(args.markers):
+            raise RuntimeError('Not enough markers. ' + \
+                'Please add more to the command line with --markers')
+
+        for i, comm in enumerate(comms):
+            for j, grid in enumerate(grids):
+                d = data[(data['comm'] == comm) & (data['grid'] == grid)].sort_values('nodes')
+                if len(d) == 0:
+                    continue
+
+                label = None
+                if j == 0:
+                    label = titles[comm]
+
+                ax.errorbar(d['nodes'],
+                            d['speedup'],
+                            yerr=[d['speedup'] - d['lower'], d['upper'] - d['speedup']],
+                            color=cmap(i),
+                            marker=args.markers[j],
+                            markersize=5,
+                            linewidth=1,
+                            capsize=3,
+                            label=label)
+
+        ax.axhline(y=1, linestyle='solid', color='black', linewidth=0.75)
+        ax.set_xscale('log', base=2)
+        ax.grid(which='both', linestyle='dashed', linewidth=0.25)
+        ax.set_title(machine)
+        ax.set_xlabel('number of nodes')
+
+    axs[0, 0].set_ylabel('speedup with sub-communicator')
+    axs[0, 0].legend(loc='best')
+
+    plt.tight_layout()
+    plt.savefig(fname, bbox_inches='tight')
+    plt.close()
+
+
+if __name__ == '__main__':
+    try:
+        parser = argparse.ArgumentParser(
+                description="Speedup of the sub-communicator from paired runs with " + \
+                            "and without sub-communicator."
+        )
+
+        parser.add_argument(
+            "--store",
+            type=str,
+            default=timing_store.default_store,
+            help="Store written by timing_store.py. Default: '" + timing_store.default_store + "'",
+        )
+
+        parser.add_argument(
+            "--compiler-suites",
+            type=str,
+            nargs='+',
+            default=['cray', 'gnu'],
+            help="Compiler environment",
+        )
+
+        parser.add_argument(
+            "--test-case",
+            type=str,
+            default="read-early",
+            choices=['read-early', 'read-late'],
+            help="Test case to analyse.",
+        )
+
+        parser.add_argument(
+            "--timing",
+            type=str,
+            default='parcel merge (total)',
+            help="Timer data to analyse.",
+        )
+
+        parser.add_argument(
+            "--nruns",
+            type=int,
+            default=-1,
+            help="Number of runs to use. Default: -1 (use all available)"
+        )
+
+        parser.add_argument(
+            "--nboot",
+            type=int,
+            default=10000,
+            help="Number of bootstrap samples. Default: 10000"
+        )
+
+        parser.add_argument(
+            "--level",
+            type=float,
+            default=0.95,
+            help="Confidence level. Default: 0.95"
+        )
+
+        parser.add_argument(
+            "--rt-path",
+            type=str,
+            default='rayleigh_taylor',
+            help="Data directory of the Rayleigh-Taylor runs."
+        )
+
+        parser.add_argument(
+            "--colour-map",
+            type=str,
+            default='tab10',
+            help="Colour map for plotting."
+        )
+
+        parser.add_argument(
+            "--markers",
+            type=str,
+            nargs='+',
+            default=['o', 's', 'D', '^', 'v', 'P', 'X'],
+            help="Markers for line plot."
+        )
+
+        parser.add_argument(
+            "--enable-latex",
+            action='store_true',
+            help="Use LateX for plot labels."
+        )
+
+        parser.add_argument(
+            "--output-dir",
+            type=str,
+            default=".",
+            help="Table and figure save directory."
+        )
+
+        args = parser.parse_args()
+
+        plt.rcParams['font.family'] = 'sans'
+        plt.rcParams['font.size'] = 12
+        plt.rcParams['text.usetex'] = args.enable_latex
+
+        df = timing_store.load(args.store)
+        df = df[df['kind'] == 'timings']
+        directories = discover.get_directories(df, args.test_case, args.compiler_suites)
+        df = discover.select_runs(df, args.test_case, directories)
+
+        if len(df) == 0:
+            raise RuntimeError("No benchmark data of '" + args.test_case + "' found.")
+
+        table = pair(df, args.timing, args.nruns, args.nboot, args.level)
+        table['subcomm_size'] = [get_subcomm_size(args.rt_path, nx, ny, nz, args.test_case)
+                                 for nx, ny, nz in zip(table['nx'], table['ny'], table['nz'])]
+
+        if table['subcomm_size'].isna().all():
+            print("No sub-communicator sizes found in '" + args.rt_path + "'.")
+
+        if not os.path.exists(args.output_dir):
+            os.makedirs(args.output_dir)
+
+        fname = os.path.join(args.output_dir, args.test_case + '-subcomm-benefit.csv')
+        table.to_csv(fname, index=False)
+        print("Wrote", len(table), "rows to '" + fname + "'.")
+
+        fname = os.path.join(args.output_dir, args.test_case + '-subcomm-benefit.pdf')
+        plot_speedup(table, fname, args)
+        print("Created '" + fname + "'.")
+
+        print()
+        print("Number of configurations where the sub-communicator pays off or costs:")
+        counts = table.groupby(['machine', 'comm', 'verdict'], observed=True).size()
+        print(counts.unstack('verdict').fillna(0).astype(int).to_string())
+
+        print()
+        print("Spearman correlation of the speedup:")
+        print(correlate(table).round(3).to_string(index=False))
+
+    except Exception as ex:
+        print(ex, flush=True)
@@ -0,0 +1,268 @@
+import pandas as pd
+import numpy as np
+import os
+import re
+import argparse
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pyarrow as pa
+import pyarrow.feather as feather
+
+#
+# Columnar store of all benchmark timings and call counts. Each row is one run
+# (one line of a *-timings.csv or *-ncalls.csv file) and each timer is a column.
+# The store is written as an uncompressed Arrow IPC (feather) file such that it
+# can be memory-mapped when loading. The size and modification time of every
+# ingested file are kept in the schema metadata of the store (the manifest) so
+# that an update only parses files that were added or changed since.
+#
+
+# e.g. archer2-cray-p2p-read-early-nx-64-ny-64-nz-64-nodes-16-subcomm-timings.csv
+pattern = re.compile(r"(\w*)-(\w*)-(\w*)-(random|read-early|read-late)-" + \
+                     r"(nx-(\d*)-ny-(\d*)-nz-(\d*))-nodes-(\d*)(-subcomm)?-(timings|ncalls)\.csv$")
+
+index_columns = ['machine', 'compiler', 'comm', 'test_case', 'grid', 'nx', 'ny', 'nz',
+                 'nodes', 'subcomm', 'kind', 'run', 'directory', 'fname']
+
+category_columns = ['machine', 'compiler', 'comm', 'test_case', 'grid', 'kind', 'directory',
+                    'fname']
+
+default_store = 'timings.feather'
+
+# Opening a file on a parallel file system has a high latency, hence
+# the files are read by a pool of threads.
+default_nthreads = 8
+
+
+def parse_fname(fname):
+    m = re.match(pattern, fname)
+    if m is None:
+        return None
+
+    return {
+        'machine':   m.group(1),
+        'compiler':  m.group(2),
+        'comm':      m.group(3),
+        'test_case': m.group(4),
+        'grid':      m.group(5),
+        'nx':        int(m.group(6)),
+        'ny':        int(m.group(7)),
+        'nz':        int(m.group(8)),
+        'nodes':     int(m.group(9)),
+        'subcomm':   not m.group(10) is None,
+        'kind':      m.group(11)
+    }
+
+
+# Returns a sorted list of (directory, fname, meta) of all benchmark CSV files
+# in the sub-directories of root. The directory is relative to root.
+def find_files(root, subdirs=['.'], recursive=True):
+    found = []
+    for subdir in subdirs:
+        path = os.path.join(root, subdir)
+        if not os.path.exists(path):
+            raise RuntimeError("Path '" + path + "' does not exist. Exiting.")
+
+        for dirpath, dirnames, fnames in os.walk(path):
+            directory = os.path.normpath(os.path.relpath(dirpath, root))
+            for fname in fnames:
+                meta = parse_fname(fname)
+                if not meta is None:
+                    found.append((directory, fname, meta))
+
+            if not recursive:
+                break
+
+    found.sort()
+    return found
+
+
+def read_file(root, directory, fname, meta):
+    dtype = np.float64
+    if meta['kind'] == 'ncalls':
+        dtype = np.int64
+
+    df = pd.read_csv(os.path.join(root, directory, fname), dtype=dtype)
+
+    n = len(df)
+    columns = {}
+    for key in meta.keys():
+        columns[key] = [meta[key]] * n
+    columns['run'] = np.arange(n, dtype=np.int64)
+    columns['directory'] = [directory] * n
+    columns['fname'] = [fname] * n
+    return pd.concat([pd.DataFrame(columns), df], axis=1)
+
+
+def to_frame(frames):
+    if frames == []:
+        raise RuntimeError("No benchmark data found.")
+
+    # categories of different frames may differ
+    for frame in frames:
+        for c in category_columns:
+            if isinstance(frame[c].dtype, pd.CategoricalDtype):
+                frame[c] = frame[c].astype(str)
+
+    df = pd.concat(frames, ignore_index=True)
+
+    # index columns first, then one column per timer
+    timers = [c for c in df.columns if not c in index_columns]
+    df = df[index_columns + timers]
+    for c in category_columns:
+        df[c] = df[c].astype('category')
+    return df
+
+
+def read_files(root, files, nthreads=default_nthreads):
+    if nthreads < 1:
+        raise RuntimeError("Number of threads must be positive.")
+
+    with ThreadPoolExecutor(max_workers=nthreads) as executor:
+        frames = executor.map(lambda f: read_file(root, *f), files)
+        return list(frames)
+
+
+def ingest(root, subdirs=['.'], recursive=True, nthreads=default_nthreads):
+    files = find_files(root, subdirs, recursive)
+    return to_frame(read_files(root, files, nthreads))
+
+
+def get_timers(df):
+    return [c for c in df.columns if not c in index_columns]
+
+
+def get_manifest_key(directory, fname):
+    return os.path.join(directory, fname)
+
+
+def stat_files(root, files):
+    manifest = {}
+    for directory, fname, meta in files:
+        st = os.stat(os.path.join(root, directory, fname))
+        manifest[get_manifest_key(directory, fname)] = [st.st_size, st.st_mtime_ns]
+    return manifest
+
+
+# Returns the updated store and the number of added, changed, removed
+# and unchanged files. Only added or changed files are parsed.
+def update(root, df, manifest, subdirs=['.'], recursive=True, nthreads=default_nthreads):
+    files = find_files(root, subdirs, recursive)
+    current = stat_files(root, files)
+
+    counts = {'added': 0, 'changed': 0, 'removed': 0, 'unchanged': 0}
+
+    to_read = []
+    for directory, fname, meta in files:
+        key = get_manifest_key(directory, fname)
+        if not key in manifest.keys():
+            counts['added'] += 1
+        elif not manifest[key] == current[key]:
+            counts['changed'] += 1
+        else:
+            counts['unchanged'] += 1
+            continue
+        to_read.append((directory, fname, meta))
+
+    frames = read_files(root, to_read, nthreads)
+
+    for key in manifest.keys():
+        if not key in current.keys():
+            counts['removed'] += 1
+
+    if df is None or (counts['unchanged'] == 0):
+        return to_frame(frames), current, counts
+
+    if len(frames) == 0 and counts['removed'] == 0:
+        return df, current, counts
+
+    keys = df['directory'].astype(str) + os.sep + df['fname'].astype(str)
+    unchanged = [key for key in current.keys() if manifest.get(key) == current[key]]
+    old = df[keys.isin(unchanged)].copy()
+    return to_frame([old] + frames), current, counts
+
+
+def save(df, fname, manifest={}):
+    table = pa.Table.from_pandas(df.reset_index(drop=True), preserve_index=False)
+    metadata = dict(table.schema.metadata)
+    metadata[b'manifest'] = json.dumps(manifest).encode()
+    table = table.replace_schema_metadata(metadata)
+    feather.write_feather(table, fname, compression='uncompressed')
+
+
+def load(fname):
+    if not os.path.exists(fname):
+        raise RuntimeError("Store '" + fname + "' does not exist. " + \
+                           "Please run 'python pytools/timing_store.py' first.")
+    # The timer columns without missing values are views of the memory-mapped
+    # file (read-only), only the columns with missing values and the
+    # categories are copied.
+    table = feather.read_table(fname, memory_map=True)
+    return table.to_pandas(split_blocks=True, self_destruct=True)
+
+
+def load_manifest(fname):
+    schema = pa.ipc.open_file(pa.memory_map(fname)).schema
+    if schema.metadata is None or not b'manifest' in schema.metadata:
+        return {}
+    return json.loads(schema.metadata[b'manifest'])
+
+
+if __name__ == '__main__':
+    try:
+        parser = argparse.ArgumentParser(
+                description="Collect all benchmark timings and call counts into a single store."
+        )
+
+        parser.add_argument(
+            "--path",
+            type=str,
+            default='.',
+            help="Data directory.",
+        )
+
+        parser.add_argument(
+            "--store",
+            type=str,
+            default=default_store,
+            help="Output file of the store. Default: '" + default_store + "'",
+        )
+
+        parser.add_argument(
+            "--nthreads",
+            type=int,
+            default=default_nthreads,
+            help="Number of threads reading the files. Default: " + str(default_nthreads),
+        )
+
+        parser.add_argument(
+            "--rebuild",
+            action='store_true',
+            help="Parse all files again instead of only new or changed files.",
+        )
+
+        args = parser.parse_args()
+
+        df = None
+        manifest = {}
+        if os.path.exists(args.store) and not args.rebuild:
+            df = load(args.store)
+            manifest = load_manifest(args.store)
+
+        start = time.perf_counter()
+        df, manifest, counts = update(args.path, df, manifest, nthreads=args.nthreads)
+        elapsed = time.perf_counter() - start
+
+        print("Files added:", counts['added'], "\tchanged:", counts['changed'],
+              "\tremoved:", counts['removed'], "\tunchanged:", counts['unchanged'])
+        print("Update took", round(elapsed, 3), "s using", args.nthreads, "thread(s).")
+
+        if counts['added'] + counts['changed'] + counts['removed'] > 0:
+            save(df, args.store, manifest)
+            print("Wrote", len(df), "runs from", len(manifest), "files to '" + args.store + "'.")
+        else:
+            print("Store '" + args.store + "' is up to date.")
+
+    except Exception as ex:
+        print(ex, flush=True)
@@ -9,150 +9,281 @@
 #       h(x, y) = cos(4x) * cos(2y + pi/6) + sin(2x + pi/6) * sin(4y)
 #
 # in the domain [-pi/2, pi/2]^3.
+#
+# With --slab-size the buoyancy is computed and written in slabs of z-levels to
+# a chunked netCDF variable (one chunk per z-level), such that the memory is
+# bounded by the slab size instead of the full (nz+1) x ny x nx field. With
+# --nprocs the slabs are computed by a pool of processes while this process
+# writes them in order (at most 2 slabs per process are in flight).
 from tools.nc_fields import nc_fields
+import netCDF4 as nc
 import numpy as np
 import argparse
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 import matplotlib.pyplot as plt
 import colorcet as cc
 import matplotlib as mpl
 from tools.mpl_style import *
 
-try:
-    parser = argparse.ArgumentParser(
-        description="Create Rayleigh-Taylor flow"
-    )
-
-    parser.add_argument(
-        "--nx",
-        type=int,
-        required=False,
-        default=64,
-        help="number of cells in x",
-    )
-
-    parser.add_argument(
-        "--ny",
-        type=int,
-        required=False,
-        default=64,
-        help="number of cells in y",
-    )
-
-    parser.add_argument(
-        "--nz",
-        type=int,
-        required=False,
-        default=64,
-        help="number of cells in z",
-    )
-
-    parser.add_argument(
-        "--epsilon",
-        type=float,
-        required=False,
-        default=0.1,
-        help="perturbation amplitude",
-    )
-
-    parser.add_argument(
-        "--plot",
-        type=bool,
-        required=False,
-        default=False,
-        help='plot the horizontal perturbation'
-    )
-
-    parser.add_argument(
-        "--ape-calculation",
-        type=str,
-        default='none',
-        choices=['none', 'sorting', 'ape density'],
-        help="Option to calculate the available potential energy; " + \
-             "ensure src/utils/ape_density.f90 is implemented when enabled"
-    )
-
-    args = parser.parse_args()
-
-    # number of cells
-    nx = args.nx
-    ny = args.ny
-    nz = args.nz
-
-
-    # perturbation amplitude
-    eps = args.epsilon
-
-    ncf = nc_fields()
-
-    ncf.open('rt_' + str(nx) + 'x' + str(ny) + 'x' + str(nz) + '.nc')
-
-    # domain origin
-    origin = (-0.5 * np.pi, -0.5 * np.pi, -0.5 * np.pi)
-
-    # domain extent
-    extent = (np.pi, np.pi, np.pi)
-
-
-    # mesh spacings
-    dx = extent[0] / nx
-    dy = extent[1] / ny
-    dz = extent[2] / nz
-
-    buoy = np.zeros((nz+1, ny, nx))
-
-    h = np.zeros((ny, nx))
-
-    # ranges from 0 to nx-1
-    for i in range(nx):
-        for j in range(ny):
-            x = origin[0] + i * dx
-            y = origin[1] + j * dy
-
-            h[j, i] = np.cos(4.0*x) * np.cos(2.0*y + np.pi/6.0) + np.sin(2.0*x + np.pi/6.0) * np.sin(4.0*y)
-
-    # ranges from 0 to nz
-    for k in range(nz+1):
-        z = origin[2] + k * dz
-        buoy[k, :, :] = -np.sin(z) + eps * np.cos(z) ** 2 * h[:, :]
-
-    # write all provided fields
-    ncf.add_field('buoyancy', buoy, unit='m/s^2', long_name='buoyancy')
-
-    ncf.add_box(origin, extent, [nx, ny, nz])
-
-    ncf.add_axis('t', [0.0])
-
-    ncf.add_physical_quantity('l_planetary_vorticity', 'true')
-    ncf.add_physical_quantity('planetary_angular_velocity', 0.5)
-    ncf.add_physical_quantity('latitude_degrees', 90)
-    ncf.add_physical_quantity('ape_calculation', args.ape_calculation)
-
-    ncf.close()
-
-    if args.plot:
-        mpl.rcParams['font.size'] = 16
-        plt.figure(figsize=(7, 4), dpi=200)
-
-        im = plt.imshow(h,
-                        origin='lower',
-                        interpolation='bilinear',
-                        cmap=cc.cm['rainbow4'],
-                        extent=[origin[0], origin[0]+extent[0],
-                                origin[1], origin[1]+extent[1]])
+# perturbation and z-levels of the workers (see init_worker)
+_h = None
+_z = None
+_eps = None
+
+
+def get_buoyancy(z, h, eps):
+    zz = z[:, None, None]
+    return -np.sin(zz) + eps * np.cos(zz) ** 2 * h[None, :, :]
+
+
+def init_worker(h, z, eps):
+    global _h, _z, _eps
+    _h = h
+    _z = z
+    _eps = eps
+
+
+# Returns the buoyancy of the z-levels k0 <= k < k1 and the time to compute it.
+def compute_slab(k0, k1):
+    start = time.perf_counter()
+    buoy = get_buoyancy(_z[k0:k1], _h, _eps)
+    return buoy, time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    try:
+        parser = argparse.ArgumentParser(
+            description="Create Rayleigh-Taylor flow"
+        )
+
+        parser.add_argument(
+            "--nx",
+            type=int,
+            required=False,
+            default=64,
+            help="number of cells in x",
+        )
+
+        parser.add_argument(
+            "--ny",
+            type=int,
+            required=False,
+            default=64,
+            help="number of cells in y",
+        )
+
+        parser.add_argument(
+            "--nz",
+            type=int,
+            required=False,
+            default=64,
+            help="number of cells in z",
+        )
+
+        parser.add_argument(
+            "--epsilon",
+            type=float,
+            required=False,
+            default=0.1,
+            help="perturbation amplitude",
+        )
+
+        parser.add_argument(
+            "--slab-size",
+            type=int,
+            required=False,
+            default=None,
+            help="number of z-levels computed and written at a time; " + \
+                 "default: the whole field at once",
+        )
+
+        parser.add_argument(
+            "--nprocs",
+            type=int,
+            required=False,
+            default=1,
+            help="number of processes computing the slabs (requires --slab-size)",
+        )
+
+        parser.add_argument(
+            "--plot",
+            type=bool,
+            required=False,
+            default=False,
+            help='plot the horizontal perturbation'
+        )
+
+        parser.add_argument(
+            "--ape-calculation",
+            type=str,
+            default='none',
+            choices=['none', 'sorting', 'ape density'],
+            help="Option to calculate the available potential energy; " + \
+                 "ensure src/utils/ape_density.f90 is implemented when enabled"
+        )
+
+        args = parser.parse_args()
+
+        if args.nprocs < 1:
+            raise RuntimeError("Number of processes must be positive.")
+
+        if args.nprocs > 1 and args.slab_size is None:
+            raise RuntimeError("Multiple processes require --slab-size.")
+
+        if not args.slab_size is None and args.slab_size < 1:
+            raise RuntimeError("Slab size must be positive.")
+
+        # time (s) of each stage
+        timings = {}
+        start = time.perf_counter()
+
+        # number of cells
+        nx = args.nx
+        ny = args.ny
+        nz = args.nz
+
+
+        # perturbation amplitude
+        eps = args.epsilon
+
+        ncf = nc_fields()
+
+        fname = 'rt_' + str(nx) + 'x' + str(ny) + 'x' + str(nz) + '.nc'
+
+        ncf.open(fname)
+
+        # domain origin
+        origin = (-0.5 * np.pi, -0.5 * np.pi, -0.5 * np.pi)
+
+        # domain extent
+        extent = (np.pi, np.pi, np.pi)
+
+
+        # mesh spacings
+        dx = extent[0] / nx
+        dy = extent[1] / ny
+        dz = extent[2] / nz
+
+        # ranges from 0 to nx-1 and 0 to ny-1
+        t0 = time.perf_counter()
+        x = origin[0] + np.arange(nx) * dx
+        y = origin[1] + np.arange(ny) * dy
+
+        h = np.cos(4.0*x[None, :]) * np.cos(2.0*y[:, None] + np.pi/6.0) + \
+            np.sin(2.0*x[None, :] + np.pi/6.0) * np.sin(4.0*y[:, None])
+
+        # ranges from 0 to nz
+        z = origin[2] + np.arange(nz+1) * dz
+        timings['perturbation'] = time.perf_counter() - t0
+
+        if args.slab_size is None:
+            t0 = time.perf_counter()
+            buoy = get_buoyancy(z, h, eps)
+            timings['buoyancy (compute)'] = time.perf_counter() - t0
+
+            # write all provided fields
+            t0 = time.perf_counter()
+            ncf.add_field('buoyancy', buoy, unit='m/s^2', long_name='buoyancy')
+            timings['buoyancy (write)'] = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+
+        ncf.add_box(origin, extent, [nx, ny, nz])
+
+        ncf.add_axis('t', [0.0])
+
+        ncf.add_physical_quantity('l_planetary_vorticity', 'true')
+        ncf.add_physical_quantity('planetary_angular_velocity', 0.5)
+        ncf.add_physical_quantity('latitude_degrees', 90)
+        ncf.add_physical_quantity('ape_calculation', args.ape_calculation)
+
+        ncf.close()
+        timings['metadata'] = time.perf_counter() - t0
+
+        if not args.slab_size is None:
+            # append the buoyancy slab by slab
+            ncfile = nc.Dataset(fname, 'a', format='NETCDF4')
+
+            for dimname, size in [('t', None), ('z', nz+1), ('y', ny), ('x', nx)]:
+                if not dimname in ncfile.dimensions.keys():
+                    ncfile.createDimension(dimname=dimname, size=size)
+                elif not size is None and not len(ncfile.dimensions[dimname]) == size:
+                    raise RuntimeError("Dimension '" + dimname + "' of '" + fname + "' has size " + \
+                                       str(len(ncfile.dimensions[dimname])) + " instead of " + str(size) + ".")
 
-        cbar = plt.colorbar(im, pad=0.03, ticks=[-1.5, -1.0, -0.5, 0.0, 0.5, 1.0, 1.5])
-        cbar.set_label(r'$h(x, y)$')
+            var = ncfile.createVariable(varname='buoyancy',
+                                        datatype='f8',
+                                        dimensions=('t', 'z', 'y', 'x'),
+                                        chunksizes=(1, 1, ny, nx))
+            var.unit = 'm/s^2'
+            var.long_name = 'buoyancy'
 
-        ticks = np.pi * np.array([-0.5, -0.25, 0.0, 0.25, 0.5])
-        tlabs = [r'$-\pi/2$', r'$-\pi/4$', r'$0$', r'$\pi/4$', r'$\pi/2$']
+            slabs = [(k, min(k + args.slab_size, nz+1)) for k in range(0, nz+1, args.slab_size)]
 
-        plt.xticks(ticks, tlabs)
-        plt.yticks(ticks, tlabs)
-        plt.xlabel(r'$x$')
-        plt.ylabel(r'$y$')
+            # compute time summed over all processes, write time of this process
+            timings['buoyancy (compute)'] = 0.0
+            timings['buoyancy (write)'] = 0.0
 
-        plt.savefig('horizontal_perturbation.pdf', bbox_inches='tight')
-        plt.close()
+            def write_slab(k0, k1, buoy, elapsed):
+                t0 = time.perf_counter()
+                var[0, k0:k1, :, :] = buoy
+                timings['buoyancy (write)'] += time.perf_counter() - t0
+                timings['buoyancy (compute)'] += elapsed
 
-except Exception as err:
-    print(err)
+            t0 = time.perf_counter()
+            if args.nprocs == 1:
+                init_worker(h, z, eps)
+                for k0, k1 in slabs:
+                    write_slab(k0, k1, *compute_slab(k0, k1))
+            else:
+                with ProcessPoolExecutor(max_workers=args.nprocs,
+                                         initializer=init_worker,
+                                         initargs=(h, z, eps)) as executor:
+                    pending = deque()
+                    for k0, k1 in slabs:
+                        pending.append((k0, k1, executor.submit(compute_slab, k0, k1)))
+                        if len(pending) >= 2 * args.nprocs:
+                            k0, k1, future = pending.popleft()
+                            write_slab(k0, k1, *future.result())
+                    while pending:
+                        k0, k1, future = pending.popleft()
+                        write_slab(k0, k1, *future.result())
+
+            ncfile.close()
+            timings['buoyancy (wall)'] = time.perf_counter() - t0
+
+        timings['total'] = time.perf_counter() - start
+
+        print("Wrote '" + fname + "' with", args.nprocs, "process(es):")
+        for stage, elapsed in timings.items():
+            print("    " + stage.ljust(20), round(elapsed, 3), "s")
+
+        if args.plot:
+            mpl.rcParams['font.size'] = 16
+            plt.figure(figsize=(7, 4), dpi=200)
+
+            im = plt.imshow(h,
+                            origin='lower',
+                            interpolation='bilinear',
+                            cmap=cc.cm['rainbow4'],
+                            extent=[origin[0], origin[0]+extent[0],
+                                    origin[1], origin[1]+extent[1]])
+
+            cbar = plt.colorbar(im, pad=0.03, ticks=[-1.5, -1.0, -0.5, 0.0, 0.5, 1.0, 1.5])
+            cbar.set_label(r'$h(x, y)$')
+
+            ticks = np.pi * np.array([-0.5, -0.25, 0.0, 0.25, 0.5])
+            tlabs = [r'$-\pi/2$', r'$-\pi/4$', r'$0$', r'$\pi/4$', r'$\pi/2$']
+
+            plt.xticks(ticks, tlabs)
+            plt.yticks(ticks, tlabs)
+            plt.xlabel(r'$x$')
+            plt.ylabel(r'$y$')
+
+            plt.savefig('horizontal_perturbation.pdf', bbox_inches='tight')
+            plt.close()
+
+    except Exception as err:
+        print(err)
@@ -57,7 +57,7 @@ ntasks=$((128*$nodes))
 
 echo "Prepare RT simulation with mesh ${nx}x${ny}x${nz}."
 
-python rayleigh_taylor.py --nx ${nx} --ny ${ny} --nz ${nz} --epsilon 0.1 --ape-calculation "none"
+python rayleigh_taylor.py --nx ${nx} --ny ${ny} --nz ${nz} --epsilon 0.1 --ape-calculation "none" --slab-size 32
 
 sim_dir="rt-${nx}x${ny}x${nz}"
 mkdir -p "${sim_dir}"